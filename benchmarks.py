@@ -0,0 +1,353 @@
+"""Benchmarks for the estimation hot paths.
+Each benchmark is timed on synthetic projects of a given number of walls, and compared against a stored baseline.
+The run fails (exit code 1) if any benchmark is slower than its baseline by more than the allowed percentage.
+
+    python benchmarks.py                          Run, and compare against the stored baseline. Fails (exit code 2) if there is no baseline yet
+    python benchmarks.py --save                   Run, and store the results as the new baseline
+    python benchmarks.py --sizes 1000 10000000    Run at other sizes. 1e7 walls is only run by the columnar benchmarks.
+    python benchmarks.py --only startup           Only time how long a new interpreter takes to import the core and produce a quote
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import timeit
+
+import paint_calc_core as core
+import paint_calc_report
+import paint_calc_rooms
+import paint_calc_table
+
+# Timings depend on the machine, so each machine keeps its own baseline next to this file, made with --save
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_SIZES = (1000, 100000)
+
+# Benchmarks which build a Python object per wall are not run above this many walls
+OBJECT_LIMIT = 100000
+
+#########################################################################################
+############################## Synthetic Projects #######################################
+#########################################################################################
+
+def generate_surfaces(num_of_surfaces, seed=0):
+    '''Returns a list of random shapes, and a list of dimensions to match.
+    '''
+    rand = random.Random(seed)
+    # Polygons are left out, as their dimensions are a list of vertices
+    fixed_shapes = [shape for shape in core.Shape if shape is not core.Shape.POLYGON]
+    shapes = [rand.choice(fixed_shapes) for i in range(num_of_surfaces)]
+    rows = [tuple(rand.uniform(0.5, 12) for i in range(shape.num_of_dimensions())) for shape in shapes]
+
+    return shapes, rows
+
+def generate_polygons(num_of_polygons, seed=0):
+    '''Returns a list of random polygons, such as gable ends, as the flat coordinates of 3 to 12 vertices going around each outline.
+    '''
+    rand = random.Random(seed)
+    polygons = []
+    for i in range(num_of_polygons):
+        num_of_vertices = rand.randint(3, 12)
+        radius = rand.uniform(1, 6)
+        polygon = []
+        for index in range(num_of_vertices):
+            angle = 2 * math.pi * index / num_of_vertices
+            polygon.extend((radius * math.cos(angle), radius * math.sin(angle)))
+        polygons.append(tuple(polygon))
+
+    return polygons
+
+def generate_document(num_of_walls, seed=0, walls_per_room=20):
+    '''Returns a project document with the given number of random walls, split into rooms.
+    Roughly one wall in three has a door or window.
+    '''
+    rand = random.Random(seed)
+    shapes, rows = generate_surfaces(num_of_walls, seed)
+    paints = [paint.name.lower() for paint in core.Paint]
+
+    rooms = []
+    for start in range(0, num_of_walls, walls_per_room):
+        walls = []
+        for shape, row in zip(shapes[start:start + walls_per_room], rows[start:start + walls_per_room]):
+            wall = {"shape": shape.name.lower(), "dimensions": list(row), "paint": rand.choice(paints), "coats": rand.randint(1, 3)}
+            if rand.random() < 0.33:
+                wall["obstacles"] = [{"shape": "rectangle", "dimensions": [rand.uniform(0.5, 1), rand.uniform(1, 2)]}]
+            walls.append(wall)
+        rooms.append({"name": "Room %d" % len(rooms), "walls": walls})
+
+    return {"rooms": rooms}
+
+def generate_table(num_of_walls, seed=0, walls_per_room=20):
+    '''Returns a WallTable() with the given number of random walls, without building a Wall() for each.
+    NumPy is used to generate the columns when it is installed.
+    '''
+    table = paint_calc_table.WallTable()
+    num_of_rooms = max(1, num_of_walls // walls_per_room)
+    for index in range(num_of_rooms):
+        table.add_room("Room %d" % index)
+
+    if core.np is not None:
+        rand = core.np.random.default_rng(seed)
+        table.extend(rand.integers(0, num_of_rooms, num_of_walls), rand.uniform(1, 30, num_of_walls),
+                     rand.integers(0, len(core.Paint), num_of_walls), rand.integers(1, 4, num_of_walls))
+    else:
+        rand = random.Random(seed)
+        table.extend([rand.randrange(num_of_rooms) for i in range(num_of_walls)], [rand.uniform(1, 30) for i in range(num_of_walls)],
+                     [rand.randrange(len(core.Paint)) for i in range(num_of_walls)], [rand.randint(1, 3) for i in range(num_of_walls)])
+
+    return table
+
+def generate_plans(num_of_rooms, seed=0):
+    '''Returns a list of random room plans: mostly rectangular rooms, with an L shaped room every third room, each with a door and some windows.
+    '''
+    rand = random.Random(seed)
+    plans = []
+    for index in range(num_of_rooms):
+        options = {"height": rand.uniform(2.3, 3), "paint": rand.choice(list(core.Paint)), "coats": rand.randint(1, 3),
+                   "ceiling": core.Paint.WHITE if index % 2 else None, "doors": 1, "windows": rand.randint(0, 3)}
+        if index % 3 == 0:
+            length, width = rand.uniform(4, 8), rand.uniform(4, 8)
+            outline = [(0, 0), (length, 0), (length, width / 2), (length / 2, width / 2), (length / 2, width), (0, width)]
+            plans.append(paint_calc_rooms.RoomPlan("Room %d" % index, outline, **options))
+        else:
+            plans.append(paint_calc_rooms.RoomPlan.rectangle("Room %d" % index, rand.uniform(2, 6), rand.uniform(2, 6), **options))
+
+    return plans
+
+#########################################################################################
+################################## Benchmarks ###########################################
+#########################################################################################
+# Each benchmark is given a number of walls, and returns the function to be timed, or None if it cannot run at that size.
+
+def bench_shape_area(size):
+    if size > OBJECT_LIMIT:
+        return None
+    surfaces = list(zip(*generate_surfaces(size)))
+
+    def run():
+        for shape, row in surfaces:
+            shape(*row)
+    return run
+
+def bench_calc_area_scalar(size):
+    if size > OBJECT_LIMIT:
+        return None
+    wall = core.Wall()
+    surfaces = list(zip(*generate_surfaces(size)))
+
+    def run():
+        for shape, row in surfaces:
+            wall._calc_area(shape, row)
+    return run
+
+def bench_calc_area_batch(size):
+    if size > OBJECT_LIMIT and core.np is None:
+        return None
+    if size > OBJECT_LIMIT:
+        rand = core.np.random.default_rng(0)
+        codes = rand.integers(0, core.Shape.POLYGON.code(), size)
+        columns = [rand.uniform(0.5, 12, size) for i in range(3)]
+    else:
+        shapes, rows = generate_surfaces(size)
+        codes = [shape.code() for shape in shapes]
+        columns = core.dimension_columns(rows)
+    return lambda: core.calc_areas(codes, columns)
+
+def bench_polygon_areas(size):
+    if size > OBJECT_LIMIT and core.np is None:
+        return None
+    if size > OBJECT_LIMIT:
+        rand = core.np.random.default_rng(0)
+        offsets = core.np.concatenate(([0], core.np.cumsum(rand.integers(3, 13, size))))
+        coordinates = rand.uniform(0, 12, 2 * int(offsets[-1]))
+    else:
+        offsets, coordinates = core.pack_polygons(generate_polygons(size))
+    return lambda: core.polygon_areas(offsets, coordinates)
+
+def bench_required_buckets(size):
+    if size > OBJECT_LIMIT:
+        return None
+    walls = [wall for room in core.load_project(generate_document(size)) for wall in room.get_walls()]
+
+    def run():
+        for wall in walls:
+            wall.required_buckets()
+    return run
+
+def bench_room_get_cost(size):
+    if size > OBJECT_LIMIT:
+        return None
+    rooms = core.load_project(generate_document(size))
+
+    def run():
+        for room in rooms:
+            room.get_cost()
+    return run
+
+def bench_project_build(size):
+    '''Building a project from a document, including every running total.
+    '''
+    if size > OBJECT_LIMIT:
+        return None
+    document = generate_document(size)
+    return lambda: core.Project(core.load_project(document))
+
+def bench_project_estimate(size):
+    if size > OBJECT_LIMIT:
+        return None
+    project = core.Project(core.load_project(generate_document(size)))
+    return lambda: core.estimate(project)
+
+def bench_table_aggregate(size):
+    table = generate_table(size)
+    return table.aggregate
+
+def bench_room_plans(size):
+    '''Generating and pricing rooms from plans, with about five walls each. 
+    '''
+    if size > OBJECT_LIMIT:
+        return None
+    plans = generate_plans(size // 5)
+    return lambda: paint_calc_rooms.generate_table(plans).aggregate()
+
+def bench_report_export(size):
+    '''Writing a CSV report on a table, with a row for every wall, to a file which throws it away. 
+    '''
+    table = generate_table(size)
+    def export():
+        with open(os.devnull, "w", newline="") as stream:
+            paint_calc_report.write_csv(stream, table)
+    return export
+
+BENCHMARKS = {
+    "shape_area": bench_shape_area,
+    "calc_area_scalar": bench_calc_area_scalar,
+    "calc_area_batch": bench_calc_area_batch,
+    "polygon_areas": bench_polygon_areas,
+    "required_buckets": bench_required_buckets,
+    "room_get_cost": bench_room_get_cost,
+    "project_build": bench_project_build,
+    "project_estimate": bench_project_estimate,
+    "table_aggregate": bench_table_aggregate,
+    "room_plans": bench_room_plans,
+    "report_export": bench_report_export
+}
+
+#########################################################################################
+################################### Running #############################################
+#########################################################################################
+
+# Run in a new interpreter, so that nothing has already been imported
+STARTUP_CODE = """
+import time
+start = time.perf_counter()
+import paint_calc_core as core
+core.estimate({"rooms": [{"name": "Hall", "walls": [{"shape": "rectangle", "dimensions": [4, 2.5], "paint": "white", "coats": 2}]}]})
+print(time.perf_counter() - start)
+"""
+
+def measure_startup(repeat=3):
+    '''Returns the best time taken by a new interpreter to import the core and produce its first quote, in seconds. 
+    The time taken to start the interpreter itself is not included. 
+    '''
+    times = []
+    for i in range(repeat):
+        result = subprocess.run([sys.executable, "-c", STARTUP_CODE], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+        times.append(float(result.stdout))
+
+    return min(times)
+
+def run_benchmarks(sizes, names=None, repeat=3):
+    '''Runs every benchmark at every size, and returns a dict = {"name@size" : best time in seconds}
+    Start up time does not depend on size, so it is stored under "startup".
+    Quick benchmarks are looped until each run takes at least 0.2 seconds, so that they can be timed accurately. 
+    The best of several runs is used, as it is the least affected by anything else running on the machine.
+    '''
+    results = {}
+    for size in sizes:
+        for name, benchmark in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            run = benchmark(size)
+            if run is None:
+                continue
+            timer = timeit.Timer(run)
+            number = timer.autorange()[0]
+            results["%s@%d" % (name, size)] = min(timer.repeat(repeat, number)) / number
+
+    if not names or "startup" in names:
+        results["startup"] = measure_startup(repeat)
+
+    return results
+
+def compare(results, baseline, threshold):
+    '''Compares results against a baseline. Returns the lines of a report, and a list of the benchmarks which regressed.
+    A benchmark regresses if it is more than threshold percent slower than the baseline.
+    '''
+    lines = ["%-28s %12s %12s %10s" % ("benchmark", "time (s)", "baseline (s)", "change")]
+    regressions = []
+    for key, seconds in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            lines.append("%-28s %12.6f %12s %10s" % (key, seconds, "-", "new"))
+            continue
+
+        change = (seconds - previous) / previous * 100 if previous else 0
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        lines.append("%-28s %12.6f %12.6f %+9.1f%%%s" % (key, seconds, previous, change, flag))
+
+    return lines, regressions
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Benchmark the estimation hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of walls to benchmark with.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS) + ["startup"], help="Only run these benchmarks.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of times each benchmark is run. The best time is used.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="File the baseline is stored in.")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Percentage slowdown allowed before a benchmark fails.")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline, instead of comparing.")
+    args = parser.parse_args(args)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    # Without a baseline every benchmark would be new, and nothing could regress, so comparing is an error rather than a pass
+    if not args.save and not os.path.exists(args.baseline):
+        print("Error: No baseline at %s. Run with --save on a reference build to make one." % args.baseline, file=sys.stderr)
+        return 2
+
+    results = run_benchmarks(args.sizes, args.only, args.repeat)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, "w") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print("Saved %d results to %s" % (len(results), args.baseline))
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    lines, regressions = compare(results, baseline, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print("%d benchmark(s) regressed by more than %.1f%%: %s" % (len(regressions), args.threshold, ", ".join(regressions)))
+        return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,154 @@
+"""A cache of results worked out for each room, so that re-quoting a mostly unchanged project only works out the rooms which have changed.
+Rooms are keyed by a hash of their content: the shape, dimensions, paint and coats of every wall, and the shape, dimensions and position of every obstacle.
+The name of a room is not part of its key, so a renamed room is still found. Paints are hashed by their price, size and coverage as well as their key,
+so a change of price never returns a stale result.
+
+A RoomCache keeps the most recently used results in memory, and can also keep them in an SQLite file so that they last between sessions.
+Results must be JSON serialisable, as that is how they are written to the file.
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+
+import paint_calc_core as core
+from paint_calc_profile import count
+
+# The default number of results kept, both in memory and on disk
+DEFAULT_SIZE = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results(used);
+"""
+
+#########################################################################################
+##################################### Keys ##############################################
+#########################################################################################
+
+def room_key(room):
+    '''Returns the content hash of a Room(), as a hex string. Rooms with the same walls, in the same order, have the same key.
+    '''
+    walls = []
+    for wall in room.get_walls():
+        paint = wall.get_paint()
+        obstacles = [[obstacle.get_shape().code(), list(obstacle.get_dimensions()), obstacle.get_position()] for obstacle in wall.get_obstacles()]
+        walls.append([wall.get_shape().code(), list(wall.get_dimensions()), core.paint_key(paint), [paint(0), paint(1), paint(2)], wall.get_coats(), obstacles])
+
+    # Floats are written out exactly by JSON, so only identical values share a key
+    return hashlib.blake2b(json.dumps(walls, separators=(",", ":")).encode(), digest_size=16).hexdigest()
+
+#########################################################################################
+################################### Classes #############################################
+#########################################################################################
+
+class RoomCache():
+    '''A least recently used cache of results, keyed by strings such as those from room_key().
+    Up to max_size results are kept in memory. If a path is given, results are also kept in an SQLite file, which holds up to max_size results of its own,
+    so results missing from memory are read back from the file. The cache can be shared between threads.
+    Can be used in a with statement, which closes the file at the end.
+    '''
+    def __init__(self, max_size=DEFAULT_SIZE, path=None):
+        self.__max_size = max_size
+        self.__results = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+        self.__used = 0
+        self.__lock = threading.Lock()
+        self.__connection = None
+        if path is not None:
+            # Results are put by whichever thread works them out, so the connection is guarded by the lock instead
+            self.__connection = sqlite3.connect(path, check_same_thread=False)
+            self.__connection.executescript(SCHEMA)
+            self.__used = self.__connection.execute("SELECT COALESCE(MAX(used), 0) FROM results").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self.__results)
+
+    def close(self):
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
+
+    def get_stats(self):
+        '''Returns a dict of the number of hits and misses since the cache was created.
+        '''
+        return {"hits": self.__hits, "misses": self.__misses}
+
+    def get(self, key):
+        '''Returns the result kept under a key, or None if there is not one.
+        '''
+        with self.__lock:
+            value = self.__results.get(key)
+            if value is not None:
+                self.__results.move_to_end(key)
+            elif self.__connection is not None:
+                row = self.__connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self.__remember(key, value)
+                    self.__touch(key)
+
+            if value is None:
+                self.__misses += 1
+                count("cache.misses")
+            else:
+                self.__hits += 1
+                count("cache.hits")
+            return value
+
+    def put(self, key, value):
+        '''Keeps a result under a key, replacing any result already kept under it. The least recently used results are dropped once the cache is full.
+        '''
+        with self.__lock:
+            self.__remember(key, value)
+            if self.__connection is not None:
+                self.__used += 1
+                with self.__connection:
+                    self.__connection.execute("INSERT OR REPLACE INTO results (key, value, used) VALUES (?, ?, ?)", (key, json.dumps(value), self.__used))
+                    self.__connection.execute("DELETE FROM results WHERE used <= (SELECT used FROM results ORDER BY used DESC LIMIT 1 OFFSET ?)", (self.__max_size,))
+
+    def lookup(self, key, compute):
+        '''Returns the result kept under a key, or works it out with compute() and keeps it if there is not one.
+        '''
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.__lock:
+            self.__results.clear()
+            if self.__connection is not None:
+                with self.__connection:
+                    self.__connection.execute("DELETE FROM results")
+
+    def __remember(self, key, value):
+        self.__results[key] = value
+        self.__results.move_to_end(key)
+        while len(self.__results) > self.__max_size:
+            self.__results.popitem(last=False)
+
+    def __touch(self, key):
+        # Marks a result in the file as used, so it is not the next to be dropped
+        self.__used += 1
+        with self.__connection:
+            self.__connection.execute("UPDATE results SET used = ? WHERE key = ?", (self.__used, key))
@@ -0,0 +1,175 @@
+"""A catalogue of paints loaded from a CSV or JSON file.
+Paints are indexed by SKU, name and colour family, so any of them can be looked up without searching the whole catalogue.
+The catalogue can be reloaded while the program is running. Paints already used on walls are updated in place, so existing projects pick up the new values.
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import csv
+import json
+import os
+
+import paint_calc_core as core
+
+# Columns (or keys) expected for each paint in a catalogue file
+FIELDS = ("sku", "name", "family", "price", "litres", "coverage")
+
+#########################################################################################
+################################### Classes #############################################
+#########################################################################################
+
+class PaintEntry():
+    '''A single paint within a catalogue.
+    Entries can be used anywhere a Paint can: calling an entry with 0, 1 or 2 returns its price per bucket (GBP), litres per bucket and coverage per litre (m^2).
+    Two entries with the same SKU are treated as the same paint.
+    '''
+    __slots__ = ("sku", "name", "family", "value")
+
+    def __init__(self, sku, name, family, value):
+        self.sku = sku
+        self.name = name
+        self.family = family
+        self.value = value
+
+    def __call__(self, args):
+        return self.value[args]
+
+    def __eq__(self, other):
+        return isinstance(other, PaintEntry) and other.sku == self.sku
+
+    def __hash__(self):
+        return hash(self.sku)
+
+    def __repr__(self):
+        return "<PaintEntry %s: %s %r>" % (self.sku, self.name, self.value)
+
+    def code(self):
+        """Returns the number used to store the paint in an array.
+        """
+        return core.register_paint(self)
+
+class Catalogue():
+    '''A collection of PaintEntry() objects, loaded from a file.
+    '''
+    def __init__(self, path=None):
+        self.__path = path
+        self.__modified = None
+        self.__by_sku = {}
+        self.__by_name = {}
+        self.__by_family = {}
+
+        if path is not None:
+            self.reload()
+
+    def __len__(self):
+        return len(self.__by_sku)
+
+    def __iter__(self):
+        return iter(list(self.__by_sku.values()))
+
+    def get(self, key):
+        '''Returns the paint with the given SKU or, failing that, name. If there is no match, then None is returned.
+        '''
+        paint = self.__by_sku.get(key)
+        if paint is None:
+            paint = self.__by_name.get(key.lower())
+
+        return paint
+
+    def by_sku(self, sku):
+        return self.__by_sku.get(sku)
+
+    def by_name(self, name):
+        '''Returns the paint with the given name, ignoring case. If more than one paint shares a name, then the first in the file is returned.
+        '''
+        return self.__by_name.get(name.lower())
+
+    def by_family(self, family):
+        '''Returns a list of every paint in a colour family.
+        '''
+        return list(self.__by_family.get(family.lower(), ()))
+
+    def reload(self):
+        '''Reads the catalogue file again.
+        Paints whose SKU is already in the catalogue are updated in place, so walls using them do not need to be rebuilt.
+        The new indexes are only swapped in once the whole file has been read, so an invalid file leaves the catalogue unchanged.
+        '''
+        modified = os.stat(self.__path).st_mtime_ns
+        rows = read_catalogue(self.__path)
+
+        # Every row is checked before any paint is changed
+        skus = set()
+        for row in rows:
+            if row["sku"] in skus:
+                raise ValueError("Duplicate SKU in catalogue: %r" % row["sku"])
+            skus.add(row["sku"])
+
+        by_sku = {}
+        by_name = {}
+        by_family = {}
+        changed = False
+        for row in rows:
+            sku = row["sku"]
+            paint = self.__by_sku.get(sku)
+            if paint is None:
+                paint = PaintEntry(sku, row["name"], row["family"], row["value"])
+            else:
+                changed = changed or paint.value != row["value"]
+                paint.name = row["name"]
+                paint.family = row["family"]
+                paint.value = row["value"]
+
+            by_sku[sku] = paint
+            by_name.setdefault(paint.name.lower(), paint)
+            by_family.setdefault(paint.family.lower(), []).append(paint)
+
+        self.__by_sku = by_sku
+        self.__by_name = by_name
+        self.__by_family = by_family
+        self.__modified = modified
+
+        # Running totals only need rebuilding if a paint that may already be in use has new values
+        if changed:
+            core.paints_changed()
+
+    def reload_if_changed(self):
+        '''Reloads the catalogue if its file has been modified since it was last read.
+        Returns True if the catalogue was reloaded.
+        '''
+        if os.stat(self.__path).st_mtime_ns == self.__modified:
+            return False
+
+        self.reload()
+        return True
+
+#########################################################################################
+################################# Catalogue Files #######################################
+#########################################################################################
+
+def read_catalogue(path):
+    '''Reads a catalogue file, and returns a list of dicts with the sku, name, family and value (price, litres, coverage) of each paint.
+    Files ending in .json hold a list of objects. Any other file is read as a CSV with a header row.
+    '''
+    with open(path, newline="") as file:
+        if path.lower().endswith(".json"):
+            records = json.load(file)
+        else:
+            records = list(csv.DictReader(file))
+
+    rows = []
+    for number, record in enumerate(records, 1):
+        try:
+            value = (float(record["price"]), float(record["litres"]), float(record["coverage"]))
+            if value[1] <= 0 or value[2] <= 0 or value[0] < 0:
+                raise ValueError("price must be positive, and litres and coverage non zero")
+            rows.append({
+                "sku": str(record["sku"]),
+                "name": str(record["name"]),
+                "family": str(record.get("family") or ""),
+                "value": value
+            })
+        except (KeyError, TypeError, ValueError) as error:
+            raise ValueError("Invalid paint %d in %s: %s" % (number, path, error))
+
+    return rows
@@ -0,0 +1,1414 @@
+"""The headless core of the paint calculator.
+Walls, obstacles and rooms are built from plain values (shape, dimensions, paint and coats), so a quote can be produced without any user input.
+Both the console (paint_calculator.py) and GUI (paint_calc_gui.py) front ends sit on top of the classes and functions defined here.
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+from array import array
+from enum import Enum
+import math
+import weakref
+
+import paint_calc_geometry as geometry
+from paint_calc_profile import count, timed
+
+# NumPy is optional. Without it, batches of surfaces are calculated one surface at a time. 
+# It is only imported the first time a batch is calculated (or core.np is used), so that quoting a few walls starts quickly. 
+def _numpy():
+    '''Imports NumPy if it has not been already, and returns it. None is returned if it is not installed. 
+    '''
+    global np
+    if "np" not in globals():
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+    
+    return np
+
+def __getattr__(name):
+    # Called for module attributes which do not exist yet, so that core.np and "from paint_calc_core import np" import NumPy on first use
+    if name == "np":
+        return _numpy()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+#########################################################################################
+##################################### Enums #############################################
+#########################################################################################
+
+class Shape(Enum):
+    """Shapes store a lambda function used to evaluate their area
+    Each lambda is wrapped in a tuple, so that it is stored as a member of the enum rather than being treated as a method.
+    A polygon can have any number of vertices. Its dimensions are the x and y of each vertex in turn, going around the outline: (x1, y1, x2, y2, ...).
+    """
+    SQUARE = (lambda b: pow(b, 2),)
+    RECTANGLE = (lambda b, h: b * h,)
+    PARALLELOGRAM = (lambda b, h: b * h,)
+    TRAPEZOID = (lambda b, h, a: ((a + b) / 2) * h,)
+    TRIANGLE = (lambda b, h: 0.5 * (b * h),)
+    ELLIPSE = (lambda b, a: math.pi * (a*b),)
+    CIRCLE = (lambda r: math.pi * pow(r, 2),)
+    SEMICIRCLE = (lambda r: (math.pi * pow(r, 2)) / 2,)
+    POLYGON = (lambda *coordinates: _shoelace(coordinates),)
+
+    def __call__(self, *args):
+        """Override the usual call method to instead allow for the supplying of a variety of multiple args.
+        These args are then passed to the matching lambda function to calculate the respective area.
+        """
+        return self.value[0](*args)
+
+    def num_of_dimensions(self):
+        """Returns the number of dimensions needed to calculate the area of the shape.
+        Polygons take any number of dimensions, so None is returned for them. This means dimensions[:shape.num_of_dimensions()] is always the dimensions the shape uses. 
+        """
+        if self is Shape.POLYGON:
+            return None
+        return self.value[0].__code__.co_argcount
+
+    def code(self):
+        """Returns the number used to store the shape in an array. 
+        The code is the position of the shape within the enum, so shapes must only ever be added to the end. 
+        """
+        return _SHAPE_CODES[self]
+
+    @classmethod
+    def from_code(self, code):
+        """Returns the shape stored under the given code. 
+        """
+        return _SHAPES[code]
+
+    def outline(self, dimensions):
+        """Returns the vertices going around the shape, measured from the bottom left corner of its bounding box. 
+        Parallelograms are drawn upright, triangles and trapezoids with their top centred over their base, and semicircles with their flat side down. 
+        Curves are drawn with CURVE_SEGMENTS straight edges. 
+        """
+        outline = _SHAPE_OUTLINES[self](*dimensions[:self.num_of_dimensions()])
+        return geometry.translate(outline, (0, 0))
+
+    @classmethod
+    def to_shape(self, shape_name):
+        """This is a class method, meaning it does not need to be called on a Shape object.
+        The method is passed a lower case string, which it will then attempt to return a matching shape for.
+        If no match is found, then None is returned.
+        """
+        return _SHAPE_NAMES.get(shape_name)
+
+# Lookup tables between shapes, their codes and their names. 
+_SHAPES = tuple(Shape)
+_SHAPE_CODES = {shape: code for code, shape in enumerate(_SHAPES)}
+_SHAPE_NAMES = {shape.name.lower(): shape for shape in _SHAPES}
+
+# The number of straight edges used to draw the outline of a curved shape
+CURVE_SEGMENTS = 64
+
+def _curve(centre_x, centre_y, radius_x, radius_y, start=0, end=2 * math.pi):
+    segments = CURVE_SEGMENTS if end - start >= 2 * math.pi else CURVE_SEGMENTS // 2
+    points = [(centre_x + radius_x * math.cos(start + (end - start) * index / segments), 
+               centre_y + radius_y * math.sin(start + (end - start) * index / segments)) for index in range(segments + 1)]
+    # A full curve ends where it started
+    return points[:-1] if end - start >= 2 * math.pi else points
+
+_SHAPE_OUTLINES = {
+    Shape.SQUARE: lambda b: [(0, 0), (b, 0), (b, b), (0, b)],
+    Shape.RECTANGLE: lambda b, h: [(0, 0), (b, 0), (b, h), (0, h)],
+    Shape.PARALLELOGRAM: lambda b, h: [(0, 0), (b, 0), (b, h), (0, h)],
+    Shape.TRAPEZOID: lambda b, h, a: [(0, 0), (b, 0), ((b + a) / 2, h), ((b - a) / 2, h)],
+    Shape.TRIANGLE: lambda b, h: [(0, 0), (b, 0), (b / 2, h)],
+    Shape.ELLIPSE: lambda b, a: _curve(b, a, b, a),
+    Shape.CIRCLE: lambda r: _curve(r, r, r, r),
+    Shape.SEMICIRCLE: lambda r: _curve(r, 0, r, r, 0, math.pi),
+    Shape.POLYGON: lambda *coordinates: list(zip(coordinates[0::2], coordinates[1::2]))
+}
+
+def _shoelace(coordinates):
+    '''Returns the area of a polygon from the flat coordinates of its vertices, using the shoelace formula. 
+    The terms are added in order, so the result is identical to that of polygon_areas(). 
+    '''
+    xs = coordinates[0::2]
+    ys = coordinates[1::2]
+    total = 0
+    for index in range(len(xs)):
+        following = index + 1 if index + 1 < len(xs) else 0
+        total += xs[index] * ys[following] - xs[following] * ys[index]
+
+    return abs(total) / 2
+
+class Paint(Enum):
+    """Paints are stored by their colour, with the value being the:
+    (Price per bucke (GBP), litres per bucket, coverage per litre (m^2))
+    Values used here come from https://www.wickes.co.uk : A random assortment of paints were selected to ensure variety of values
+    """
+    EMERALD = (24, 2.5, 13)
+    SAPPHIRE = (20, 2.5, 13)
+    WHITE = (45, 2.5, 12)
+    BLACK = (20, 2.5, 13)
+    BERRY = (20, 2.5, 13)
+    COTTON = (10, 0.75, 16)
+    PEBBLE = (32, 5, 13)
+    IVORY = (10, 5, 13)
+
+    def __call__(self, args):
+        """Override the usual call method.
+        The method can be passed an argument, which will be used to return one element from the list value of the paint.
+        """
+        return self.value[args]
+
+    @classmethod
+    def to_paint(self, paint_name):
+        """This is a class method, meaning it does not need to be called on a Paint object.
+        The method is passed a string, which it will then attempt to return a matching paint for.
+        """
+        #if no match is found, then return white as a default value.
+        return _PAINT_NAMES.get(paint_name.lower(), Paint.WHITE)
+
+    def code(self):
+        """Returns the number used to store the paint in an array. 
+        Like shapes, the built in paints are coded by their position within the enum. 
+        """
+        return _PAINT_CODES[self]
+
+    @classmethod
+    def from_code(self, code):
+        """Returns the paint stored under the given code. This may be a paint loaded from a catalogue. 
+        """
+        return _PAINTS[code]
+
+# Lookup tables between paints, their codes and their names. 
+# Paints loaded from a catalogue are given the next free code when they are first stored in an array. 
+_PAINTS = list(Paint)
+_PAINT_CODES = {paint: code for code, paint in enumerate(_PAINTS)}
+_PAINT_NAMES = {paint.name.lower(): paint for paint in _PAINTS}
+
+def register_paint(paint):
+    '''Returns the code of a paint, giving it a new code if it does not already have one. 
+    '''
+    code = _PAINT_CODES.get(paint)
+    if code is None:
+        code = len(_PAINTS)
+        _PAINTS.append(paint)
+        _PAINT_CODES[paint] = code
+
+    return code
+
+def registered_paints():
+    '''Returns a list of every paint with a code, in the order of their codes. 
+    '''
+    return list(_PAINTS)
+
+def paint_values():
+    '''Returns the current (price, litres per bucket, coverage per litre) of every paint with a code, in the order of their codes. 
+    '''
+    return [(paint(0), paint(1), paint(2)) for paint in _PAINTS]
+
+#########################################################################################
+################################### Classes #############################################
+#########################################################################################
+
+class Architecture():
+    """The parent class of Wall() and Obstacle().
+    An architecture object has a shape and the dimensions of that shape, from which its area is calculated.
+    """
+    def __init__(self, shape=Shape.SQUARE, dimensions=(0,)):
+        self.__shape = shape
+        self.__dimensions = tuple(dimensions)
+        self.__surface_area = self._calc_area(shape, self.__dimensions)
+
+    def _area(self):
+        return self.__surface_area
+
+    def get_shape(self):
+        return self.__shape
+
+    def get_dimensions(self):
+        return self.__dimensions
+
+    def get_outline(self):
+        """Returns the vertices going around the object, measured from the bottom left corner of its bounding box. See Shape.outline(). 
+        """
+        return self.__shape.outline(self.__dimensions)
+
+    def set_area(self, shape, dimensions):
+        """Replaces the shape and dimensions of the object, and recalculates its area.
+        This is used by the front ends once the user has entered the details of the object.
+        """
+        self.__shape = shape
+        self.__dimensions = tuple(dimensions)
+        self.__surface_area = self._calc_area(shape, self.__dimensions)
+
+    @timed("core.calc_area")
+    def _calc_area(self, shape, dimensions):
+        """This area is used to calculate the area of an Architecture object.  
+        It takes a provided shape (the shape of the architecture object), and its dimensions. 
+        If it is instead given a list of shapes and a list of dimensions, then all of the areas are calculated at once by surface_areas(). 
+        """
+        if isinstance(shape, (list, tuple)):
+            if len(shape) > 1:
+                return surface_areas(shape, dimensions)
+            return [self._calc_area(shape[0], dimensions[0])] if shape else []
+        
+        if shape is None:
+            return 0
+        
+        # It uses the provided shape to call the lambda function assigned with it to calculate area. 
+        return shape(*dimensions[:shape.num_of_dimensions()])
+
+class Obstacle(Architecture):
+    """Obstacle is a child of the Architecture() class.
+    Obstacles would be anything on the wall that cannot be painted. Such as doors or windows.
+    An obstacle can be given a position: the (x, y) of the bottom left corner of its bounding box, measured in metres from the bottom left corner of the wall's. 
+    Only the part of a positioned obstacle within the wall is removed from its area, and where positioned obstacles overlap, the overlap is only removed once. 
+    Obstacles without a position are simply subtracted from the wall, as they always have been. 
+    """
+    def __init__(self, shape=Shape.SQUARE, dimensions=(0,), position=None):
+        super().__init__(shape, dimensions)
+        self.__walls = []
+        self.__position = None if position is None else tuple(position)
+
+    def get_position(self):
+        return self.__position
+
+    def get_outline(self):
+        """Returns the vertices going around the obstacle, measured from the bottom left corner of the wall. 
+        The obstacle must have a position. 
+        """
+        return geometry.translate(super().get_outline(), self.__position)
+
+    def get_walls(self):
+        """Returns the walls the obstacle is on. 
+        The same obstacle can be placed on more than one wall, such as a standard door used throughout a building. 
+        """
+        return self.__walls
+
+    def set_area(self, shape, dimensions):
+        """Replaces the shape and dimensions of the obstacle. 
+        The totals of the rooms of every wall the obstacle is on are updated to match. 
+        """
+        # An obstacle can be on the same wall more than once, but each wall must only be updated once
+        walls = list(dict.fromkeys(self.__walls))
+        for wall in walls:
+            wall._detach()
+        super().set_area(shape, dimensions)
+        for wall in walls:
+            wall._attach()
+
+    def set_position(self, position):
+        """Moves the obstacle, or removes its position if None is given. 
+        The totals of the rooms of every wall the obstacle is on are updated to match. 
+        """
+        walls = list(dict.fromkeys(self.__walls))
+        for wall in walls:
+            wall._detach()
+        self.__position = None if position is None else tuple(position)
+        for wall in walls:
+            wall._attach()
+
+    def _add_wall(self, wall):
+        self.__walls.append(wall)
+
+    def _remove_wall(self, wall):
+        self.__walls.remove(wall)
+
+class Wall(Architecture):
+    """A wall is a child class of Architecture.
+    Walls have additional methods to find the required number of buckets and the cost to paint the wall.
+    Any change made to a wall is passed on to the room it is in, so that the room's totals never need to be recalculated. 
+    """
+    def __init__(self, shape=Shape.SQUARE, dimensions=(0,), paint=Paint.WHITE, coats=1, obstacles=()):
+        super().__init__(shape, dimensions)
+        self.__paint = paint
+        self.__coats = coats
+        self.__obstacles = []
+        self.__room = None
+        self.__covered = None
+        
+        for obstacle in obstacles:
+            self.add_obstacle(obstacle)
+
+    def area(self):
+        """Returns the area of the wall when accounting for obstacles.
+        The area can never drop below zero, even if the obstacles are larger than the wall.
+        Positioned obstacles only remove the part of the wall they cover, which is kept until the wall or one of its obstacles changes. 
+        """
+        surface_area = self._area()
+        positioned = False
+        for obstacle in self.__obstacles:
+            if obstacle.get_position() is None:
+                surface_area -= obstacle._area()
+            else:
+                positioned = True
+
+        if positioned:
+            surface_area -= self.__covered_area()
+
+        return max(surface_area, 0)
+
+    @timed("core.covered_area")
+    def __covered_area(self):
+        if self.__covered is None:
+            obstacles = [(obstacle.get_outline(), obstacle._area()) for obstacle in self.__obstacles if obstacle.get_position() is not None]
+            count("core.positioned_obstacles", len(obstacles))
+            self.__covered = geometry.covered_area(self.get_outline(), obstacles)
+
+        return self.__covered
+
+    def required_buckets(self):
+        """Returns the amount of paint required to cover the wall.
+        """
+        return required_buckets(self.area(), self.__coats, self.__paint)
+
+    def get_cost(self):
+        """Returns the cost of covering the wall.
+        """
+        return self.required_buckets() * self.__paint(0)
+
+    def get_paint(self):
+        """Returns the paint used on the wall.
+        """
+        return self.__paint
+
+    def get_coats(self):
+        return self.__coats
+
+    def get_obstacles(self):
+        return self.__obstacles
+
+    def get_room(self):
+        return self.__room
+
+    def set_area(self, shape, dimensions):
+        self._detach()
+        super().set_area(shape, dimensions)
+        self._attach()
+
+    def set_paint(self, paint, coats):
+        self._detach()
+        self.__paint = paint
+        self.__coats = coats
+        self._attach()
+
+    def add_obstacle(self, obstacle):
+        self._detach()
+        self.__obstacles.append(obstacle)
+        obstacle._add_wall(self)
+        self._attach()
+
+    def remove_obstacle(self, obstacle):
+        self._detach()
+        self.__obstacles.remove(obstacle)
+        obstacle._remove_wall(self)
+        self._attach()
+
+    def _set_room(self, room):
+        self.__room = room
+
+    def _detach(self):
+        """Removes the wall from the totals of its room. This is called before the wall is changed. 
+        """
+        if self.__room is not None:
+            self.__room._wall_removed(self)
+
+    def _attach(self):
+        """Adds the wall back to the totals of its room, once it has been changed. 
+        """
+        self.__covered = None
+        if self.__room is not None:
+            self.__room._wall_added(self)
+
+class Room():
+    '''Rooms do not inherit from Architecture as they do not share enough with how they have been defined.
+    Instead, a room is functionally a collection of Wall() objects, with its own methods.
+    The totals of the room are kept up to date as walls are added, changed or removed, so they are never recalculated. 
+    '''
+    def __init__(self, name="default room", walls=()):
+        self.__name = name
+        self.__walls = []
+        self.__subtotal = Subtotal()
+        self.__index = PaintIndex()
+        self.__parent = None
+        _rooms.add(self)
+        
+        for wall in walls:
+            self.add_wall(wall)
+
+    def get_walls(self):
+        return self.__walls
+
+    def get_name(self):
+        return self.__name
+
+    def get_parent(self):
+        """Returns the Floor(), Building() or Project() the room is directly within, or None.
+        """
+        return self.__parent
+
+    def get_project(self):
+        """Returns the Project() the room is within, at any level, or None.
+        """
+        parent = self.__parent
+        while parent is not None and not isinstance(parent, Project):
+            parent = parent.get_parent()
+        return parent
+
+    def get_cost(self):
+        """Returns the total cost to paint the room. 
+        """
+        return self.__subtotal.get_cost()
+
+    def get_area(self):
+        """Returns the total area to be painted in the room. 
+        """
+        return self.__subtotal.get_area()
+
+    def get_paint(self):
+        """Returns the total number of buckets required for each paint used in the room.
+        This is returned as a dict = {Paint : Total buckets}
+        """
+        return self.__subtotal.get_paint()
+
+    def get_subtotal(self):
+        """Returns a copy of the running totals of the room. 
+        """
+        return Subtotal().merge(self.__subtotal)
+
+    def get_walls_by_paint(self, paint):
+        """Returns every wall in the room which uses a paint. 
+        """
+        return self.__index.get_walls(paint)
+
+    def get_paint_costs(self):
+        """Returns the cost of each paint used in the room, as a dict = {Paint : cost}
+        """
+        return self.__index.get_costs()
+
+    def get_paint_areas(self):
+        """Returns the area covered by each paint in the room, as a dict = {Paint : area}
+        """
+        return self.__index.get_areas()
+
+    def get_litres(self):
+        """Returns the litres of each paint needed in the room, before rounding up to whole buckets, as a dict = {Paint : litres}
+        """
+        return self.__index.get_litres()
+
+    def replace_paint(self, old, new):
+        """Paints every wall which uses the old paint with the new paint instead, keeping their coats. 
+        """
+        for wall in self.__index.get_walls(old):
+            wall.set_paint(new, wall.get_coats())
+
+    def add_wall(self, wall):
+        if wall.get_room() is not None:
+            raise ValueError("This wall already belongs to a room")
+        
+        self.__walls.append(wall)
+        wall._set_room(self)
+        self._wall_added(wall)
+
+    def remove_wall(self, wall):
+        self._wall_removed(wall)
+        self.__walls.remove(wall)
+        wall._set_room(None)
+
+    def set_name(self, name):
+        self.__name = name
+
+    def _set_parent(self, parent):
+        self.__parent = parent
+
+    def _get_index(self):
+        return self.__index
+
+    def _rebuild(self):
+        self.__subtotal = Subtotal()
+        self.__index = PaintIndex()
+        for wall in self.__walls:
+            self.__subtotal.add_wall(wall)
+            self.__index.add_wall(wall)
+
+    def _wall_added(self, wall):
+        self.__subtotal.add_wall(wall)
+        self.__index.add_wall(wall)
+        if self.__parent is not None:
+            self.__parent._wall_added(wall)
+
+    def _wall_removed(self, wall):
+        self.__subtotal.remove_wall(wall)
+        self.__index.remove_wall(wall)
+        if self.__parent is not None:
+            self.__parent._wall_removed(wall)
+
+class Group():
+    '''A level of the hierarchy above rooms: a Floor(), Building() or Project(). 
+    Like a room, a group keeps running totals of everything within it. A change to a wall only updates its room and each group above it, 
+    so a change costs the depth of the hierarchy, and the totals of any level can be read without visiting its walls. 
+    '''
+    def __init__(self, name, children=()):
+        self.__name = name
+        self.__children = []
+        self.__subtotal = Subtotal()
+        self.__index = PaintIndex()
+        self.__parent = None
+        _groups.add(self)
+        
+        for child in children:
+            self._add_child(child)
+
+    def get_name(self):
+        return self.__name
+
+    def get_parent(self):
+        return self.__parent
+
+    def get_rooms(self):
+        """Returns every room within the group, at any level, in order. 
+        """
+        rooms = []
+        for child in self.__children:
+            if isinstance(child, Room):
+                rooms.append(child)
+            else:
+                rooms.extend(child.get_rooms())
+        return rooms
+
+    def get_cost(self):
+        return self.__subtotal.get_cost()
+
+    def get_area(self):
+        return self.__subtotal.get_area()
+
+    def get_paint(self):
+        """Returns the total number of buckets required for each paint used within the group.
+        This is returned as a dict = {Paint : Total buckets}
+        """
+        return self.__subtotal.get_paint()
+
+    def get_subtotal(self):
+        return Subtotal().merge(self.__subtotal)
+
+    def get_walls_by_paint(self, paint):
+        """Returns every wall within the group which uses a paint. 
+        """
+        return self.__index.get_walls(paint)
+
+    def get_paint_costs(self):
+        """Returns the cost of each paint used within the group, as a dict = {Paint : cost}
+        """
+        return self.__index.get_costs()
+
+    def get_paint_areas(self):
+        """Returns the area covered by each paint within the group, as a dict = {Paint : area}
+        """
+        return self.__index.get_areas()
+
+    def get_litres(self):
+        """Returns the litres of each paint needed within the group, before rounding up to whole buckets, as a dict = {Paint : litres}
+        """
+        return self.__index.get_litres()
+
+    def replace_paint(self, old, new):
+        """Paints every wall within the group which uses the old paint with the new paint instead, keeping their coats. 
+        Only the walls using the old paint are visited. 
+        """
+        for wall in self.__index.get_walls(old):
+            wall.set_paint(new, wall.get_coats())
+
+    def set_name(self, name):
+        self.__name = name
+
+    def _get_index(self):
+        return self.__index
+
+    def _children(self):
+        return self.__children
+
+    def _add_child(self, child):
+        if child.get_parent() is not None:
+            raise ValueError("This %s already belongs to a %s" % (type(child).__name__.lower(), type(child.get_parent()).__name__.lower()))
+        
+        self.__children.append(child)
+        child._set_parent(self)
+        self.__combine(child, 1)
+
+    def _remove_child(self, child):
+        self.__combine(child, -1)
+        self.__children.remove(child)
+        child._set_parent(None)
+
+    def _set_parent(self, parent):
+        self.__parent = parent
+
+    def __combine(self, child, sign):
+        # The totals and paint index of a whole room or group are added to (or removed from) this group and each group above it
+        subtotal = child.get_subtotal()
+        index = child._get_index()
+        group = self
+        while group is not None:
+            if sign > 0:
+                group.__subtotal.merge(subtotal)
+                group.__index.merge(index)
+            else:
+                group.__subtotal.subtract(subtotal)
+                group.__index.subtract(index)
+            group = group.__parent
+
+    def _wall_added(self, wall):
+        self.__subtotal.add_wall(wall)
+        self.__index.add_wall(wall)
+        if self.__parent is not None:
+            self.__parent._wall_added(wall)
+
+    def _wall_removed(self, wall):
+        self.__subtotal.remove_wall(wall)
+        self.__index.remove_wall(wall)
+        if self.__parent is not None:
+            self.__parent._wall_removed(wall)
+
+    def _rebuild(self):
+        """Works out the totals and paint index again from the groups and rooms within. Groups within are rebuilt first. 
+        """
+        self.__subtotal = Subtotal()
+        self.__index = PaintIndex()
+        for child in self.__children:
+            if isinstance(child, Group):
+                child._rebuild()
+            self.__subtotal.merge(child.get_subtotal())
+            self.__index.merge(child._get_index())
+
+class Floor(Group):
+    '''A floor of a building, made up of rooms. 
+    '''
+    def __init__(self, name="default floor", rooms=()):
+        super().__init__(name, rooms)
+
+    def add_room(self, room):
+        self._add_child(room)
+
+    def remove_room(self, room):
+        self._remove_child(room)
+
+class Building(Group):
+    '''A building, made up of floors. 
+    '''
+    def __init__(self, name="default building", floors=()):
+        super().__init__(name, floors)
+
+    def get_floors(self):
+        return list(self._children())
+
+    def add_floor(self, floor):
+        self._add_child(floor)
+
+    def remove_floor(self, floor):
+        self._remove_child(floor)
+
+class Project(Group):
+    '''A project is every room being quoted for. 
+    Rooms can be added to the project directly, or within buildings. get_rooms() returns every room either way. 
+    '''
+    def __init__(self, rooms=(), buildings=()):
+        super().__init__("project", list(rooms) + list(buildings))
+
+    def get_buildings(self):
+        return [child for child in self._children() if isinstance(child, Building)]
+
+    def add_room(self, room):
+        self._add_child(room)
+
+    def remove_room(self, room):
+        self._remove_child(room)
+
+    def add_building(self, building):
+        self._add_child(building)
+
+    def remove_building(self, building):
+        self._remove_child(building)
+
+#########################################################################################
+################################ Batch Areas ############################################
+#########################################################################################
+
+@timed("core.calc_areas")
+def calc_areas(shapes, dimensions, polygons=None):
+    '''Calculates the area of many surfaces at once. 
+    shapes is a column of Shape members or shape codes, and dimensions is a list of up to three columns of dimensions. 
+    The nth column holds the nth dimension of every surface, and is ignored by shapes which need fewer dimensions. 
+    The vertices of polygons do not fit in columns, so are given separately as polygons: the (offsets, coordinates) of every polygon in shapes, in order (see pack_polygons()). 
+    Surfaces are grouped by shape, and every group is evaluated with one call of that shape's lambda, or of polygon_areas() for polygons. 
+    With NumPy this is a vectorised call over arrays, and the result is a float64 array. Otherwise the result is an array('d'). 
+    Either way, the areas are identical to calling the shapes one surface at a time. 
+    '''
+    np = _numpy()
+    if np is None or not isinstance(shapes, np.ndarray):
+        codes = [shape.code() if isinstance(shape, Shape) else int(shape) for shape in shapes]
+    else:
+        codes = shapes
+    count("core.surfaces", len(codes))
+    
+    polygon_code = Shape.POLYGON.code()
+    num_of_polygons = 0 if polygons is None else len(polygons[0]) - 1
+    if np is None:
+        if sum(1 for code in codes if code == polygon_code) != num_of_polygons:
+            raise ValueError("The vertices of every polygon must be given, in order")
+        
+        polygon_area = iter(polygon_areas(*polygons) if num_of_polygons else ())
+        areas = array('d', bytes(8 * len(codes)))
+        for index, code in enumerate(codes):
+            shape = _SHAPES[code]
+            if code == polygon_code:
+                areas[index] = next(polygon_area)
+            else:
+                areas[index] = shape(*(column[index] for column in dimensions[:shape.num_of_dimensions()]))
+        return areas
+    
+    codes = np.asarray(codes, dtype=np.int64)
+    columns = [np.asarray(column, dtype=np.float64) for column in dimensions]
+    areas = np.zeros(len(codes), dtype=np.float64)
+    if int(np.count_nonzero(codes == polygon_code)) != num_of_polygons:
+        raise ValueError("The vertices of every polygon must be given, in order")
+    
+    # One vectorised pass per shape group 
+    for code in np.unique(codes):
+        shape = _SHAPES[code]
+        mask = codes == code
+        if code == polygon_code:
+            areas[mask] = polygon_areas(*polygons)
+        else:
+            areas[mask] = shape(*(column[mask] for column in columns[:shape.num_of_dimensions()]))
+    
+    return areas
+
+def surface_areas(shapes, rows):
+    '''Calculates the area of many surfaces at once, from a list of shapes and a list of dimensions (one per surface). 
+    The dimensions of polygons are packed into vertex buffers, and those of every other shape into columns, so that every surface is measured by one call of calc_areas(). 
+    '''
+    polygons = [row for shape, row in zip(shapes, rows) if shape is Shape.POLYGON]
+    columns = dimension_columns([() if shape is Shape.POLYGON else row for shape, row in zip(shapes, rows)])
+    return calc_areas(shapes, columns, pack_polygons(polygons) if polygons else None)
+
+def pack_polygons(polygons):
+    '''Packs the flat coordinates of many polygons, (x1, y1, x2, y2, ...) each, into the buffers used by polygon_areas(): 
+    - offsets: Where the vertices of each polygon start, followed by the end of the last. The vertices of polygon i are vertices offsets[i] to offsets[i + 1]. 
+    - coordinates: The x and y of every vertex of every polygon, one after another. 
+    '''
+    offsets = array('Q', [0])
+    coordinates = array('d')
+    for polygon in polygons:
+        coordinates.extend(polygon)
+        offsets.append(len(coordinates) // 2)
+
+    return offsets, coordinates
+
+@timed("core.polygon_areas")
+def polygon_areas(offsets, coordinates):
+    '''Calculates the area of many polygons at once, from packed vertex buffers (see pack_polygons()), using the shoelace formula. 
+    With NumPy, the cross product of every edge is worked out in one pass, and the kth edge of every polygon is added in pass k, so each 
+    polygon's terms are added in the same order as Shape.POLYGON, and the areas are identical. 
+    '''
+    np = _numpy()
+    count("core.polygons", len(offsets) - 1)
+    if np is None:
+        areas = array('d')
+        for start, end in zip(offsets, offsets[1:]):
+            areas.append(_shoelace(coordinates[2 * start:2 * end]))
+        return areas
+    
+    offsets = np.frombuffer(offsets, dtype=np.uint64).astype(np.int64) if isinstance(offsets, array) else np.asarray(offsets, dtype=np.int64)
+    vertices = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    xs = vertices[:, 0]
+    ys = vertices[:, 1]
+    starts = offsets[:-1]
+    counts = np.diff(offsets)
+    
+    # The edge from the last vertex of each polygon goes back to its first
+    following = np.arange(1, len(vertices) + 1)
+    closed = counts > 0
+    following[offsets[1:][closed] - 1] = starts[closed]
+    cross = xs * ys[following] - xs[following] * ys
+    
+    totals = np.zeros(len(counts), dtype=np.float64)
+    for k in range(int(counts.max(initial=0))):
+        has_edge = counts > k
+        totals[has_edge] += cross[starts[has_edge] + k]
+    
+    return np.abs(totals) / 2
+
+def dimension_columns(rows):
+    '''Converts a list of dimensions, one per surface, into the columns expected by calc_areas(). 
+    Surfaces with fewer dimensions than the longest are padded with zeros. 
+    '''
+    width = max((len(row) for row in rows), default=0)
+    return [[row[index] if index < len(row) else 0 for row in rows] for index in range(width)]
+
+def split_dimensions(shape, dimensions):
+    '''Splits the dimensions of a surface into the three columns and the vertices it is saved as, by paint_calc_file and paint_calc_store. 
+    Every shape but a polygon fits in the columns, and has no vertices. A polygon has zeros in the columns, and its flat coordinates as vertices. 
+    '''
+    if shape is Shape.POLYGON:
+        return (0.0, 0.0, 0.0), tuple(dimensions)
+    return tuple(dimensions) + (0.0,) * (3 - len(dimensions)), ()
+
+def join_dimensions(shape, columns, vertices):
+    '''The reverse of split_dimensions(). Returns the dimensions of a surface from its saved columns and vertices. 
+    '''
+    if shape is Shape.POLYGON:
+        return tuple(vertices)
+    return tuple(columns[:shape.num_of_dimensions()])
+
+#########################################################################################
+################################ Estimation #############################################
+#########################################################################################
+
+# Every room and group (floor, building or project) with running totals. 
+# They are held weakly, so that rooms and groups which are no longer used can still be deleted. 
+_rooms = weakref.WeakSet()
+_groups = weakref.WeakSet()
+# Anything else which keeps its own totals of paint, such as a paint_calc_store.ProjectStore()
+_paint_users = weakref.WeakSet()
+
+def watch_paints(user):
+    '''Registers an object to be rebuilt by paints_changed(), by calling its _rebuild() method. The object is held weakly. 
+    '''
+    _paint_users.add(user)
+
+@timed("core.paints_changed")
+def paints_changed():
+    '''Rebuilds the running totals of every room and project. 
+    This must be called whenever the price, litres per bucket or coverage of a paint in use changes, such as when a catalogue is reloaded. 
+    '''
+    for room in list(_rooms):
+        room._rebuild()
+    # Each group rebuilds the groups within it, so only the top of each hierarchy is rebuilt here
+    for group in list(_groups):
+        if group.get_parent() is None:
+            group._rebuild()
+    for user in list(_paint_users):
+        user._rebuild()
+
+def required_buckets(area, coats, paint):
+    '''Returns the number of buckets of a paint needed to cover an area with the given number of coats.
+    '''
+    litres_required = (area * coats) / paint(2)
+
+    # Value is rounded up, since you can't purchase .something of a bucket.
+    b_req = math.ceil(litres_required / paint(1))
+    if b_req == 0:  b_req += 1
+
+    return b_req
+
+class Subtotal():
+    '''Running totals for a group of walls: cost, area and the number of buckets of each paint. 
+    Cost and area are kept as exact partial sums, so subtotals can be merged, and walls removed, in any order without changing the result. 
+    '''
+    def __init__(self):
+        self.__cost = []
+        self.__area = []
+        self.__paint = {}
+        self.__walls = 0
+
+    def get_cost(self):
+        return math.fsum(self.__cost)
+
+    def get_area(self):
+        return math.fsum(self.__area)
+
+    def get_paint(self):
+        """Returns the number of buckets of each paint, as a dict = {Paint : Total buckets}
+        """
+        return dict(self.__paint)
+
+    def num_of_walls(self):
+        return self.__walls
+
+    def add_wall(self, wall, count=1):
+        """Adds a wall, or count identical walls, to the totals. 
+        Multiplying gives exactly the same totals as adding the wall count times, as each product is rounded just once. 
+        """
+        paint = wall.get_paint()
+        buckets = wall.required_buckets()
+        self._add(paint, buckets * count, buckets * paint(0) * count, wall.area() * count)
+        self.__walls += count
+
+    def remove_wall(self, wall):
+        paint = wall.get_paint()
+        buckets = wall.required_buckets()
+        self._add(paint, -buckets, -buckets * paint(0), -wall.area())
+        self.__walls -= 1
+
+    def merge(self, other):
+        """Adds the totals of another subtotal to this one.
+        """
+        return self.__combine(other, 1)
+
+    def subtract(self, other):
+        """Removes the totals of another subtotal from this one.
+        """
+        return self.__combine(other, -1)
+
+    def __combine(self, other, sign):
+        for value in other.__cost:
+            _add_partial(self.__cost, sign * value)
+        for value in other.__area:
+            _add_partial(self.__area, sign * value)
+        for paint, buckets in other.__paint.items():
+            self._add_buckets(paint, sign * buckets)
+        self.__walls += sign * other.__walls
+
+        return self
+
+    def _add(self, paint, buckets, cost, area):
+        _add_partial(self.__cost, cost)
+        _add_partial(self.__area, area)
+        self._add_buckets(paint, buckets)
+
+    def _add_buckets(self, paint, buckets):
+        # Paints are removed once no walls use them, so they are not shown with zero buckets
+        buckets += self.__paint.get(paint, 0)
+        if buckets:
+            self.__paint[paint] = buckets
+        else:
+            self.__paint.pop(paint, None)
+
+class PaintIndex():
+    '''An inverted index from each paint to the walls which use it, along with the area, litres, buckets and cost of each paint. 
+    Rooms and groups keep one alongside their Subtotal(), updated as walls are added, changed or removed, so the walls and totals of a paint 
+    are found without visiting the walls which use other paints. Areas, litres and costs are kept as exact partial sums, like those of a Subtotal(). 
+    '''
+    def __init__(self):
+        self.__walls = {}
+        self.__areas = {}
+        self.__litres = {}
+        self.__buckets = {}
+        self.__cost = {}
+
+    def get_paints(self):
+        return list(self.__walls)
+
+    def get_walls(self, paint):
+        """Returns every wall which uses a paint, in the order they were added. 
+        """
+        return list(self.__walls.get(paint, ()))
+
+    def get_areas(self):
+        """Returns the area covered by each paint, as a dict = {Paint : area}
+        """
+        return {paint: math.fsum(area) for paint, area in self.__areas.items()}
+
+    def get_litres(self):
+        """Returns the litres of each paint needed before rounding up to whole buckets, as a dict = {Paint : litres}
+        """
+        return {paint: math.fsum(litres) for paint, litres in self.__litres.items()}
+
+    def get_buckets(self):
+        return dict(self.__buckets)
+
+    def get_costs(self):
+        """Returns the cost of each paint, as a dict = {Paint : cost}
+        """
+        return {paint: math.fsum(cost) for paint, cost in self.__cost.items()}
+
+    def add_wall(self, wall):
+        paint = wall.get_paint()
+        area = wall.area()
+        buckets = required_buckets(area, wall.get_coats(), paint)
+        self.__walls.setdefault(paint, {})[wall] = None
+        self.__add(paint, area, (area * wall.get_coats()) / paint(2), buckets, buckets * paint(0))
+
+    def remove_wall(self, wall):
+        paint = wall.get_paint()
+        area = wall.area()
+        buckets = required_buckets(area, wall.get_coats(), paint)
+        self.__add(paint, -area, -(area * wall.get_coats()) / paint(2), -buckets, -buckets * paint(0))
+        walls = self.__walls[paint]
+        del walls[wall]
+        if not walls:
+            # Paints are removed once no walls use them
+            for values in (self.__walls, self.__areas, self.__litres, self.__buckets, self.__cost):
+                del values[paint]
+
+    def merge(self, other):
+        """Adds every wall of another index to this one.
+        """
+        for paint, walls in other.__walls.items():
+            self.__walls.setdefault(paint, {}).update(walls)
+            self.__combine(other, paint, 1)
+        return self
+
+    def subtract(self, other):
+        """Removes every wall of another index from this one.
+        """
+        for paint, walls in other.__walls.items():
+            self.__combine(other, paint, -1)
+            remaining = self.__walls[paint]
+            for wall in walls:
+                del remaining[wall]
+            if not remaining:
+                for values in (self.__walls, self.__areas, self.__litres, self.__buckets, self.__cost):
+                    del values[paint]
+        return self
+
+    def __combine(self, other, paint, sign):
+        for value in other.__areas[paint]:
+            _add_partial(self.__areas.setdefault(paint, []), sign * value)
+        for value in other.__litres[paint]:
+            _add_partial(self.__litres.setdefault(paint, []), sign * value)
+        for value in other.__cost[paint]:
+            _add_partial(self.__cost.setdefault(paint, []), sign * value)
+        self.__buckets[paint] = self.__buckets.get(paint, 0) + sign * other.__buckets[paint]
+
+    def __add(self, paint, area, litres, buckets, cost):
+        _add_partial(self.__areas.setdefault(paint, []), area)
+        _add_partial(self.__litres.setdefault(paint, []), litres)
+        _add_partial(self.__cost.setdefault(paint, []), cost)
+        self.__buckets[paint] = self.__buckets.get(paint, 0) + buckets
+
+def _add_partial(partials, value):
+    '''Adds a value to a list of non-overlapping partial sums, without any rounding error. 
+    This is the same algorithm used within math.fsum(), which gives the correctly rounded total of the partials. 
+    '''
+    index = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[index] = low
+            index += 1
+        value = high
+    partials[index:] = [value]
+
+@timed("core.total_cost")
+def total_cost(rooms):
+    '''Calculates the total cost for all rooms.
+    '''
+    total_cost = 0
+    for room in rooms:
+        total_cost += room.get_cost()
+
+    return total_cost
+
+@timed("core.total_paint")
+def total_paint(rooms):
+    '''Calculate the total number of buckets required for each paint used.
+    This is across all rooms, and is returned as a dict = {Paint : Total buckets}
+    '''
+    total_paint = {}
+    for room in rooms:
+        for paint, buckets in room.get_paint().items():
+            total_paint[paint] = total_paint.get(paint, 0) + buckets
+
+    return total_paint
+
+@timed("core.estimate")
+def estimate(project):
+    '''Produces a full quote for a project without any user interaction.
+    The project can be a Project(), a list of Room() objects, or a project document (see load_project() and load_buildings()).
+    The result is a dict made up of plain values, with paints referred to by paint_key(): the SKU of a catalogue paint, or the lower case name of a built in paint.
+    If the project has any buildings, the totals of each building and each of its floors are included as well.
+    '''
+    if isinstance(project, dict):
+        project = Project(load_project(project), load_buildings(project))
+
+    buildings = []
+    if isinstance(project, Project):
+        cost = project.get_cost()
+        paint_totals = project.get_paint()
+        buildings = project.get_buildings()
+        project = project.get_rooms()
+    else:
+        cost = total_cost(project)
+        paint_totals = total_paint(project)
+
+    rooms = []
+    for room in project:
+        rooms.append({
+            "name": room.get_name(),
+            "cost": room.get_cost(),
+            "paint": {paint_key(paint): buckets for paint, buckets in room.get_paint().items()}
+        })
+
+    result = {
+        "total_cost": cost,
+        "total_paint": {paint_key(paint): buckets for paint, buckets in paint_totals.items()},
+        "rooms": rooms
+    }
+    if buildings:
+        result["buildings"] = [dict(_group_totals(building), floors=[_group_totals(floor) for floor in building.get_floors()]) for building in buildings]
+
+    return result
+
+def _group_totals(group):
+    # The cached totals of a floor or building, in the same form as a room within estimate()
+    return {
+        "name": group.get_name(),
+        "cost": group.get_cost(),
+        "paint": {paint_key(paint): buckets for paint, buckets in group.get_paint().items()}
+    }
+
+#########################################################################################
+############################## Input Validation #########################################
+#########################################################################################
+# Shared by the front ends, so that typed in values are checked the same way everywhere
+
+def check_float_input(usr_input, allow_zero):
+    """Checks a number typed in by the user. Returns None if it is valid, otherwise the error message to show them. 
+    When called, you can specify if you want a valid input to be non-zero, or if zero can be included. 
+    """
+    try:
+        user_input = float(usr_input)
+    except (TypeError, ValueError):
+        user_input = None
+
+    return _check_input(user_input, allow_zero, "number")
+
+def check_int_input(usr_input, allow_zero):
+    """Checks a whole number typed in by the user. Returns None if it is valid, otherwise the error message to show them. 
+    """
+    try:
+        user_input = int(usr_input)
+    except (TypeError, ValueError):
+        user_input = None
+
+    return _check_input(user_input, allow_zero, "whole number")
+
+def _check_input(user_input, allow_zero, kind):
+    if user_input is not None and (user_input > 0 or (allow_zero and user_input == 0)):
+        return None
+
+    text = "Error: Please enter a positive"
+    # Alter string if zero is not allowed as a valid input
+    if not allow_zero:
+        text += ", non zero,"
+    return text + " %s: " % kind
+
+#########################################################################################
+############################### Project Documents #######################################
+#########################################################################################
+
+@timed("core.load_project")
+def load_project(document):
+    '''Builds a list of Room() objects from a project document. A document is a dict of the form:
+    {"rooms": [{"name": "Kitchen", "walls": [{"shape": "rectangle", "dimensions": [4, 2.5], "paint": "white", "coats": 2,
+                                              "obstacles": [{"shape": "rectangle", "dimensions": [0.9, 2]}]}]}]}
+    A room can also be given as the outline of its floor, from which its walls are generated (see paint_calc_rooms). 
+    A ValueError is raised if any part of the document is invalid.
+    '''
+    rooms = []
+    for room in document.get("rooms", []):
+        walls = [wall_from_dict(wall) for wall in room.get("walls", [])]
+        if "floor" in room or "outline" in room:
+            import paint_calc_rooms
+            walls = paint_calc_rooms.plan_from_dict(room).walls() + walls
+        count("core.walls_loaded", len(walls))
+        rooms.append(Room(room.get("name", "default room"), walls))
+
+    return rooms
+
+def load_buildings(document):
+    '''Builds a list of Building() objects from the "buildings" of a project document, where each building is made up of floors of rooms:
+    {"buildings": [{"name": "Block A", "floors": [{"name": "Ground", "rooms": [...]}]}]}
+    The rooms of each floor take the same form as those of load_project(). A ValueError is raised if any part of the document is invalid.
+    '''
+    buildings = []
+    for building in document.get("buildings", []):
+        floors = [Floor(floor.get("name", "default floor"), load_project(floor)) for floor in building.get("floors", [])]
+        buildings.append(Building(building.get("name", "default building"), floors))
+
+    return buildings
+
+def wall_from_dict(wall):
+    '''Builds a Wall() object, and any of its obstacles, from a dict.
+    Paint defaults to white, and coats default to one.
+    '''
+    shape, dimensions = _read_shape(wall)
+    paint = to_paint_strict(wall.get("paint", "white"))
+    coats = _read_coats(wall)
+
+    obstacles = []
+    for obstacle in wall.get("obstacles", []):
+        obstacles.append(obstacle_from_dict(obstacle))
+
+    return Wall(shape, dimensions, paint, coats, obstacles)
+
+def obstacle_from_dict(obstacle):
+    '''Builds an Obstacle() object from a dict holding its shape and dimensions, and optionally its "position" on the wall as [x, y].
+    '''
+    return Obstacle(*_read_shape(obstacle), _read_position(obstacle))
+
+def to_paint_strict(paint_name):
+    '''Returns the paint matching the given name.
+    If a catalogue is in use (see use_catalogue()), then the paint is looked up by name or SKU within it. Otherwise, only the built in paints are used. 
+    Unlike Paint.to_paint(), an unknown name is an error rather than defaulting to white, as there is no drop down to limit choices.
+    '''
+    if _catalogue is not None:
+        paint = _catalogue.get(str(paint_name))
+    else:
+        paint = _PAINT_NAMES.get(str(paint_name).lower())
+    
+    if paint is None:
+        raise ValueError("Unknown paint: %r" % paint_name)
+
+    return paint
+
+def paint_key(paint):
+    '''Returns the key a paint is saved under. Catalogue paints are saved by SKU, as names may be shared. Built in paints are saved by name. 
+    '''
+    return getattr(paint, "sku", None) or paint.name.lower()
+
+def paint_from_key(key):
+    '''Returns the paint saved under a key (see paint_key()), so saved projects always use the current prices. 
+    Keys are resolved the same way they were saved: by SKU in the catalogue in use, or else by the name of a built in paint. 
+    A built in paint is never swapped for a catalogue paint which shares its name, as the two would then be saved under different keys. 
+    '''
+    if _catalogue is not None:
+        paint = _catalogue.by_sku(key)
+        if paint is not None:
+            return paint
+    paint = Paint.__members__.get(str(key).upper())
+    if paint is None:
+        raise ValueError("Unknown paint: %r" % key)
+
+    return paint
+
+def use_catalogue(catalogue):
+    '''Sets the catalogue used to look up paints in project documents. Passing None goes back to the built in paints. 
+    '''
+    global _catalogue
+    _catalogue = catalogue
+
+def get_catalogue():
+    '''Returns the catalogue in use, or None if only the built in paints are used. 
+    '''
+    return _catalogue
+
+_catalogue = None
+
+def _read_shape(record):
+    '''Reads and validates the shape and dimensions of a wall or obstacle dict.
+    '''
+    shape = Shape.to_shape(str(record.get("shape", "")).lower())
+    if shape is None:
+        raise ValueError("Unknown shape: %r" % record.get("shape"))
+    if shape is Shape.POLYGON:
+        return shape, _read_vertices(record)
+
+    try:
+        dimensions = tuple(float(value) for value in record.get("dimensions", ()))
+    except TypeError:
+        raise ValueError("The dimensions of a %s must be a list of numbers: %r" % (shape.name.lower(), record.get("dimensions")))
+    if len(dimensions) != shape.num_of_dimensions():
+        raise ValueError("A %s needs %d dimensions, got %d" % (shape.name.lower(), shape.num_of_dimensions(), len(dimensions)))
+    if not all(math.isfinite(value) and value >= 0 for value in dimensions):
+        raise ValueError("Dimensions must be positive, finite numbers: %r" % (dimensions,))
+
+    return shape, dimensions
+
+def _read_coats(record):
+    '''Reads and validates the "coats" of a wall dict, which default to one. 
+    Coats must be a whole number of at least one: 2.0 is read as 2, but 2.7 is an error rather than being cut down to 2. 
+    '''
+    value = record.get("coats", 1)
+    try:
+        coats = float(value)
+    except (TypeError, ValueError):
+        coats = math.nan
+    if not (coats.is_integer() and coats >= 1):
+        raise ValueError("Coats must be a positive, non zero, whole number: %r" % (value,))
+
+    return int(coats)
+
+def _read_position(record):
+    '''Reads and validates the optional "position" of an obstacle. Returns None if it has no position. 
+    '''
+    if record.get("position") is None:
+        return None
+
+    try:
+        position = tuple(float(value) for value in record["position"])
+    except TypeError:
+        raise ValueError("A position must be a list of numbers: %r" % (record["position"],))
+    if len(position) != 2 or not all(math.isfinite(value) for value in position):
+        raise ValueError("A position needs a finite x and y: %r" % (record["position"],))
+
+    return position
+
+def _read_vertices(record):
+    '''Reads and validates the "vertices" of a polygon: a list of at least three [x, y] points, going around the outline. 
+    Returns the flat coordinates used as the dimensions of a polygon. 
+    '''
+    coordinates = []
+    try:
+        for vertex in record.get("vertices", ()):
+            if len(vertex) != 2:
+                raise ValueError("Each vertex of a polygon needs an x and a y: %r" % (vertex,))
+            coordinates.extend(float(value) for value in vertex)
+    except TypeError:
+        raise ValueError("The vertices of a polygon must be a list of [x, y] points: %r" % (record.get("vertices"),))
+    if len(coordinates) < 6:
+        raise ValueError("A polygon needs at least 3 vertices, got %d" % (len(coordinates) // 2))
+    if not all(math.isfinite(value) for value in coordinates):
+        raise ValueError("Vertices must be finite numbers: %r" % (coordinates,))
+
+    return tuple(coordinates)
+
+def read_rows(rows):
+    '''Builds Wall() objects from the rows of a table, such as the grid of the GUI's room editor. 
+    Each row is a dict of strings: "kind" ("wall" or "obstacle"), "shape", "dim1", "dim2", "dim3", "paint" and "coats". 
+    An obstacle row belongs to the nearest wall row above it, as in the bulk CSV format. Only the dimensions the shape needs are read. 
+    Every cell is checked, rather than stopping at the first mistake, so that every invalid cell can be shown at once. 
+    Returns a list of walls, and a dict of {(row index, column) : message} for every invalid cell. If there are any errors, then no walls are returned. 
+    '''
+    errors = {}
+    walls = []
+    wall = None
+    for index, row in enumerate(rows):
+        is_wall = row.get("kind", "wall").lower() != "obstacle"
+        if not is_wall and wall is None:
+            errors[(index, "kind")] = "An obstacle must come after the wall it is on"
+
+        shape = Shape.to_shape(str(row.get("shape", "")).lower())
+        dimensions = []
+        if shape is None:
+            errors[(index, "shape")] = "Unknown shape: %r" % row.get("shape")
+        elif shape is Shape.POLYGON:
+            # A table only has room for three dimensions
+            errors[(index, "shape")] = "Polygons can only be given in a project document"
+            shape = None
+        else:
+            for column in ("dim1", "dim2", "dim3")[:shape.num_of_dimensions()]:
+                try:
+                    value = float(row.get(column, ""))
+                except (TypeError, ValueError):
+                    value = -1
+                if not value > 0 or math.isinf(value):
+                    errors[(index, column)] = "Please enter a positive, non zero, number"
+                dimensions.append(value)
+
+        if not is_wall:
+            if wall is not None and shape is not None:
+                wall[4].append(Obstacle(shape, dimensions))
+            continue
+
+        paint = None
+        try:
+            paint = to_paint_strict(row.get("paint", "white"))
+        except ValueError as error:
+            errors[(index, "paint")] = str(error)
+
+        try:
+            coats = int(row.get("coats", ""))
+        except (TypeError, ValueError):
+            coats = 0
+        if coats <= 0:
+            errors[(index, "coats")] = "Please enter a positive, non zero, whole number"
+
+        # Walls are built once all of their obstacles have been read
+        wall = [shape, dimensions, paint, coats, []]
+        walls.append(wall)
+
+    if errors:
+        return [], errors
+
+    return [Wall(*wall) for wall in walls], errors
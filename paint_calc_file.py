@@ -0,0 +1,399 @@
+"""A compact binary format for saving projects.
+A project file can be written in one call, and is read with mmap, so that even a very large estate can be totalled without building a Room() or Wall() for every wall.
+
+Every value is little endian. A file is made up of, in order:
+    Header              magic (8 bytes), version, reserved, number of paints, rooms, walls and obstacles, size of the string table, 
+                        number of buildings and floors, number of wall and obstacle coordinates (72 bytes)
+    Wall records        area, three dimensions, end of its obstacles, end of its coordinates, room index, paint index, coats, shape code, 
+                        flags, padding (64 bytes each)
+    Obstacle records    area, three dimensions, x and y of its position, end of its coordinates, shape code, padding (64 bytes each)
+    Vertices            the coordinates of every polygon wall, followed by those of every polygon obstacle (8 bytes each)
+    Room floors         the floor each room is on, plus one, or zero for a room outside of any building (4 bytes each)
+    Floor buildings     the building index of each floor (4 bytes each)
+    String table        the offset of every string, followed by the strings themselves, in UTF-8
+
+The obstacles of wall i are the obstacle records from the end of wall i - 1 up to the end of wall i.
+The dimensions of polygons do not fit in a record, so their dimensions are zero, and their vertices are found in the same way as the obstacles of a wall.
+Obstacles without a position have NaN for x and y. Positioned obstacles may overlap, so a wall with any has the NET_AREA flag, and its net area is stored 
+in place of its area. Its obstacles are then not subtracted again when the file is totalled.
+The string table holds the key of every paint used (the SKU of catalogue paints, or the name of built in paints), followed by the name of every room, 
+every building and every floor.
+Paints are looked up again when a file is opened, so a file always uses the current prices.
+
+    python paint_calc_file.py estate.pcalc                      Total a project file
+    python paint_calc_file.py estate.pcalc --import survey.json   Save a project document as a project file
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+
+import paint_calc_core as core
+from paint_calc_core import Shape, np
+from paint_calc_profile import count, timed
+from paint_calc_table import WallTable, aggregate_columns, net_areas
+
+EXTENSION = ".pcalc"
+MAGIC = b"PAINTCAL"
+VERSION = 4
+
+HEADER = struct.Struct("<8sHHIQQQQIIQQ")
+WALL_RECORD = struct.Struct("<4dQQIHHBB6x")
+OBSTACLE_RECORD = struct.Struct("<6dQB7x")
+COORDINATE = struct.Struct("<d")
+STRING_OFFSET = struct.Struct("<Q")
+INDEX = struct.Struct("<I")
+
+# Flags of a wall record
+NET_AREA = 1
+
+# Coats and paint indexes are stored as 16 bit fields of each wall record
+MAX_COATS = 65535
+MAX_PAINTS = 65536
+
+# How many walls are read between each report of progress
+PROGRESS_INTERVAL = 4096
+
+if np is not None:
+    # The same records as NumPy types, so that the columns of a mapped file can be read without copying them
+    WALL_DTYPE = np.dtype([("area", "<f8"), ("dimensions", "<f8", (3,)), ("obstacle_end", "<u8"), ("vertex_end", "<u8"), ("room", "<u4"),
+                           ("paint", "<u2"), ("coats", "<u2"), ("shape", "u1"), ("flags", "u1"), ("padding", "V6")])
+    OBSTACLE_DTYPE = np.dtype([("area", "<f8"), ("dimensions", "<f8", (3,)), ("position", "<f8", (2,)), ("vertex_end", "<u8"), ("shape", "u1"), ("padding", "V7")])
+
+#########################################################################################
+#################################### Saving #############################################
+#########################################################################################
+
+@timed("file.save")
+def save_project(path, rooms):
+    '''Saves a Project() or list of Room() objects to a project file. The buildings and floors of a Project() are saved too.
+    The whole file is packed into memory and written with one call. It is written under a temporary name first, so a failed save never leaves half a file behind.
+    '''
+    buildings = []
+    if isinstance(rooms, core.Project):
+        buildings = rooms.get_buildings()
+        rooms = rooms.get_rooms()
+    rooms = list(rooms)
+    floors = [(building_index, floor) for building_index, building in enumerate(buildings) for floor in building.get_floors()]
+    floor_indexes = {id(floor): index + 1 for index, (building_index, floor) in enumerate(floors)}
+
+    walls = [(room_index, wall) for room_index, room in enumerate(rooms) for wall in room.get_walls()]
+    num_of_obstacles = sum(len(wall.get_obstacles()) for room_index, wall in walls)
+    count("file.walls_saved", len(walls))
+
+    paints = []
+    paint_indexes = {}
+    records = bytearray(HEADER.size + WALL_RECORD.size * len(walls) + OBSTACLE_RECORD.size * num_of_obstacles)
+    wall_position = HEADER.size
+    obstacle_position = HEADER.size + WALL_RECORD.size * len(walls)
+    obstacle_end = 0
+    wall_vertices = []
+    obstacle_vertices = []
+
+    for room_index, wall in walls:
+        paint = wall.get_paint()
+        paint_index = paint_indexes.get(paint)
+        if paint_index is None:
+            if len(paints) == MAX_PAINTS:
+                raise ValueError("A project file can hold at most %d different paints" % MAX_PAINTS)
+            paint_index = paint_indexes[paint] = len(paints)
+            paints.append(paint)
+        if wall.get_coats() > MAX_COATS:
+            raise ValueError("Coats must be at most %d: %r" % (MAX_COATS, wall.get_coats()))
+
+        for obstacle in wall.get_obstacles():
+            columns, vertices = core.split_dimensions(obstacle.get_shape(), obstacle.get_dimensions())
+            obstacle_vertices.extend(vertices)
+            position = obstacle.get_position() or (math.nan, math.nan)
+            OBSTACLE_RECORD.pack_into(records, obstacle_position, obstacle._area(), *columns, *position, len(obstacle_vertices), obstacle.get_shape().code())
+            obstacle_position += OBSTACLE_RECORD.size
+        obstacle_end += len(wall.get_obstacles())
+
+        # As in WallTable.add_wall(), a wall with positioned obstacles is totalled from its net area
+        if any(obstacle.get_position() is not None for obstacle in wall.get_obstacles()):
+            area, flags = wall.area(), NET_AREA
+        else:
+            area, flags = wall._area(), 0
+        columns, vertices = core.split_dimensions(wall.get_shape(), wall.get_dimensions())
+        wall_vertices.extend(vertices)
+        WALL_RECORD.pack_into(records, wall_position, area, *columns, obstacle_end, len(wall_vertices),
+                              room_index, paint_index, wall.get_coats(), wall.get_shape().code(), flags)
+        wall_position += WALL_RECORD.size
+
+    records += struct.pack("<%dd" % (len(wall_vertices) + len(obstacle_vertices)), *wall_vertices, *obstacle_vertices)
+
+    for room in rooms:
+        records += INDEX.pack(floor_indexes.get(id(room.get_parent()), 0))
+    for building_index, floor in floors:
+        records += INDEX.pack(building_index)
+
+    strings = _pack_strings([core.paint_key(paint) for paint in paints] + [room.get_name() for room in rooms] + 
+                            [building.get_name() for building in buildings] + [floor.get_name() for building_index, floor in floors])
+    HEADER.pack_into(records, 0, MAGIC, VERSION, 0, len(paints), len(rooms), len(walls), num_of_obstacles, len(strings), len(buildings), len(floors),
+                     len(wall_vertices), len(obstacle_vertices))
+
+    records += strings
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(records)
+    os.replace(temporary, path)
+
+def _pack_strings(strings):
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = bytearray()
+    position = 0
+    for string in encoded:
+        offsets += STRING_OFFSET.pack(position)
+        position += len(string)
+    offsets += STRING_OFFSET.pack(position)
+
+    return bytes(offsets) + b"".join(encoded)
+
+#########################################################################################
+#################################### Loading ############################################
+#########################################################################################
+
+class ProjectFile():
+    '''A project file, opened with mmap. Nothing is read from the wall and obstacle records until they are needed.
+    Can be used in a with statement, which closes the file at the end.
+    '''
+    def __init__(self, path):
+        self.__map = None
+        self.__file = open(path, "rb")
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__read_header(path)
+        except (ValueError, OSError):
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.__num_of_walls
+
+    def close(self):
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        self.__file.close()
+
+    def get_room_names(self):
+        return self.__room_names
+
+    def get_paints(self):
+        '''Returns the paints used in the file, in the order they are indexed by the wall records.
+        '''
+        return self.__paints
+
+    def walls(self):
+        '''Yields every wall as a tuple of (room index, shape, dimensions, paint, coats, obstacles), where obstacles is a list of (shape, dimensions, position).
+        '''
+        obstacles = OBSTACLE_RECORD.iter_unpack(self.__section(self.__obstacle_start, OBSTACLE_RECORD.size * self.__num_of_obstacles))
+        wall_vertices = self.__vertices(0, self.__num_of_wall_vertices)
+        obstacle_vertices = self.__vertices(self.__num_of_wall_vertices, self.__num_of_obstacle_vertices)
+        obstacle_start = 0
+        wall_vertex_start = 0
+        obstacle_vertex_start = 0
+        for area, *dimensions, obstacle_end, vertex_end, room, paint, coats, shape, flags in WALL_RECORD.iter_unpack(self.__section(HEADER.size, WALL_RECORD.size * self.__num_of_walls)):
+            self.__check_wall(obstacle_start, obstacle_end, room, paint)
+            if not wall_vertex_start <= vertex_end <= self.__num_of_wall_vertices:
+                raise ValueError("Project file refers to vertices which it does not contain")
+            wall_obstacles = []
+            for index in range(obstacle_start, obstacle_end):
+                obstacle_area, *obstacle_dimensions, x, y, obstacle_vertex_end, obstacle_shape = next(obstacles)
+                if not obstacle_vertex_start <= obstacle_vertex_end <= self.__num_of_obstacle_vertices:
+                    raise ValueError("Project file refers to vertices which it does not contain")
+                obstacle_shape = Shape.from_code(obstacle_shape)
+                wall_obstacles.append((obstacle_shape, core.join_dimensions(obstacle_shape, obstacle_dimensions, obstacle_vertices[obstacle_vertex_start:obstacle_vertex_end]),
+                                       None if math.isnan(x) else (x, y)))
+                obstacle_vertex_start = obstacle_vertex_end
+            obstacle_start = obstacle_end
+
+            shape = Shape.from_code(shape)
+            yield room, shape, core.join_dimensions(shape, dimensions, wall_vertices[wall_vertex_start:vertex_end]), self.__paints[paint], coats, wall_obstacles
+            wall_vertex_start = vertex_end
+
+    def to_rooms(self, progress=None):
+        '''Builds a list of Room() objects from the file, so the project can be edited again.
+        If progress is given, it is called with the fraction of walls built so far, every PROGRESS_INTERVAL walls.
+        '''
+        walls = [[] for name in self.__room_names]
+        for index, (room, shape, dimensions, paint, coats, obstacles) in enumerate(self.walls()):
+            if progress is not None and index % PROGRESS_INTERVAL == 0:
+                progress(index / self.__num_of_walls)
+            walls[room].append(core.Wall(shape, dimensions, paint, coats, [core.Obstacle(*obstacle) for obstacle in obstacles]))
+
+        return [core.Room(name, room_walls) for name, room_walls in zip(self.__room_names, walls)]
+
+    def to_project(self, progress=None):
+        '''Builds a Project() from the file, with each room placed back within its building and floor.
+        Rooms outside of any building are added to the project directly, ahead of the buildings. 
+        '''
+        rooms = self.to_rooms(progress)
+        floors = [[] for floor in self.__floor_buildings]
+        for room, floor in zip(rooms, self.__room_floors):
+            if floor:
+                floors[floor - 1].append(room)
+
+        buildings = [[] for name in self.__building_names]
+        for name, building, floor_rooms in zip(self.__floor_names, self.__floor_buildings, floors):
+            buildings[building].append(core.Floor(name, floor_rooms))
+
+        return core.Project([room for room, floor in zip(rooms, self.__room_floors) if not floor],
+                            [core.Building(name, building_floors) for name, building_floors in zip(self.__building_names, buildings)])
+
+    def to_table(self):
+        '''Copies the file into a WallTable(), without building any Wall() objects.
+        '''
+        table = WallTable()
+        for name in self.__room_names:
+            table.add_room(name)
+
+        obstacle_areas = [record[0] for record in OBSTACLE_RECORD.iter_unpack(self.__section(self.__obstacle_start, OBSTACLE_RECORD.size * self.__num_of_obstacles))]
+        obstacle_start = 0
+        for area, *dimensions, obstacle_end, vertex_end, room, paint, coats, shape, flags in WALL_RECORD.iter_unpack(self.__section(HEADER.size, WALL_RECORD.size * self.__num_of_walls)):
+            self.__check_wall(obstacle_start, obstacle_end, room, paint)
+            table.append(room, area, self.__paints[paint], coats, () if flags & NET_AREA else obstacle_areas[obstacle_start:obstacle_end])
+            obstacle_start = obstacle_end
+
+        return table
+
+    @timed("file.aggregate")
+    def aggregate(self):
+        '''Totals every wall in the file. The result is in the same form as WallTable.aggregate().
+        With NumPy the records are read directly from the mapped file, so the file is never copied into memory as a whole.
+        '''
+        count("file.walls", self.__num_of_walls)
+        if np is None or self.__num_of_walls == 0:
+            return self.to_table().aggregate()
+
+        walls = np.frombuffer(self.__map, dtype=WALL_DTYPE, count=self.__num_of_walls, offset=HEADER.size)
+        obstacles = np.frombuffer(self.__map, dtype=OBSTACLE_DTYPE, count=self.__num_of_obstacles, offset=self.__obstacle_start)
+
+        if int(walls["paint"].max()) >= len(self.__paints) or int(walls["room"].max()) >= len(self.__room_names):
+            raise ValueError("Project file refers to a paint or room which it does not contain")
+
+        ends = walls["obstacle_end"].astype(np.int64)
+        counts = np.diff(ends, prepend=0)
+        if int(counts.min()) < 0 or int(ends[-1]) > self.__num_of_obstacles:
+            raise ValueError("Project file refers to an obstacle which it does not contain")
+        # The obstacles of walls stored with their net area have already been subtracted
+        areas = net_areas(walls["area"], ends - counts, np.where(walls["flags"] & NET_AREA, 0, counts), obstacles["area"])
+
+        return aggregate_columns(self.__room_names, self.__paints, areas, walls["coats"], walls["paint"], walls["room"])
+
+    def __check_wall(self, obstacle_start, obstacle_end, room, paint):
+        # The obstacles, room and paint of a wall record must all be within the file
+        if not obstacle_start <= obstacle_end <= self.__num_of_obstacles:
+            raise ValueError("Project file refers to an obstacle which it does not contain")
+        if paint >= len(self.__paints) or room >= len(self.__room_names):
+            raise ValueError("Project file refers to a paint or room which it does not contain")
+
+    def __read_header(self, path):
+        if len(self.__map) < HEADER.size:
+            raise ValueError("%s is not a project file" % path)
+
+        (magic, version, reserved, num_of_paints, num_of_rooms, num_of_walls, num_of_obstacles, strings_size, num_of_buildings, num_of_floors, 
+         num_of_wall_vertices, num_of_obstacle_vertices) = HEADER.unpack_from(self.__map)
+        if magic != MAGIC:
+            raise ValueError("%s is not a project file" % path)
+        if version != VERSION:
+            raise ValueError("%s is a version %d project file, but only version %d can be read" % (path, version, VERSION))
+
+        self.__num_of_walls = num_of_walls
+        self.__num_of_obstacles = num_of_obstacles
+        self.__obstacle_start = HEADER.size + WALL_RECORD.size * num_of_walls
+        self.__vertex_start = self.__obstacle_start + OBSTACLE_RECORD.size * num_of_obstacles
+        self.__num_of_wall_vertices = num_of_wall_vertices
+        self.__num_of_obstacle_vertices = num_of_obstacle_vertices
+        floors_start = self.__vertex_start + COORDINATE.size * (num_of_wall_vertices + num_of_obstacle_vertices)
+        strings_start = floors_start + INDEX.size * (num_of_rooms + num_of_floors)
+        if len(self.__map) != strings_start + strings_size:
+            raise ValueError("%s is truncated or corrupt" % path)
+
+        indexes = [index for (index,) in INDEX.iter_unpack(self.__section(floors_start, strings_start - floors_start))]
+        self.__room_floors = indexes[:num_of_rooms]
+        self.__floor_buildings = indexes[num_of_rooms:]
+        if any(floor > num_of_floors for floor in self.__room_floors) or any(building >= num_of_buildings for building in self.__floor_buildings):
+            raise ValueError("%s refers to a building or floor which it does not contain" % path)
+
+        strings = _unpack_strings(self.__section(strings_start, strings_size), num_of_paints + num_of_rooms + num_of_buildings + num_of_floors)
+        self.__paints = [core.paint_from_key(key) for key in strings[:num_of_paints]]
+        self.__room_names = strings[num_of_paints:num_of_paints + num_of_rooms]
+        self.__building_names = strings[num_of_paints + num_of_rooms:num_of_paints + num_of_rooms + num_of_buildings]
+        self.__floor_names = strings[num_of_paints + num_of_rooms + num_of_buildings:]
+
+    def __section(self, start, size):
+        return memoryview(self.__map)[start:start + size]
+
+    def __vertices(self, start, num_of_coordinates):
+        return [coordinate for (coordinate,) in COORDINATE.iter_unpack(self.__section(self.__vertex_start + COORDINATE.size * start, COORDINATE.size * num_of_coordinates))]
+
+def _unpack_strings(section, num_of_strings):
+    table_size = STRING_OFFSET.size * (num_of_strings + 1)
+    if len(section) < table_size:
+        raise ValueError("Project file string table is corrupt")
+
+    offsets = [offset for (offset,) in STRING_OFFSET.iter_unpack(section[:table_size])]
+    data = bytes(section[table_size:])
+    return [data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+def load_project(path):
+    '''Opens a project file, and returns its rooms as Room() objects.
+    '''
+    with ProjectFile(path) as project_file:
+        return project_file.to_rooms()
+
+def aggregate_file(path):
+    '''Totals a project file without building any Room() or Wall() objects.
+    '''
+    with ProjectFile(path) as project_file:
+        return project_file.aggregate()
+
+#########################################################################################
+##################################### Main ##############################################
+#########################################################################################
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Total a project file, or create one from a project document.")
+    parser.add_argument("file", help="Project file to total, or to create with --import.")
+    parser.add_argument("--import", dest="document", help="JSON project document to save as the project file.")
+    parser.add_argument("--json", action="store_true", help="Print the totals as JSON.")
+    args = parser.parse_args(args)
+
+    try:
+        if args.document:
+            with open(args.document) as file:
+                document = json.load(file)
+            save_project(args.file, core.Project(core.load_project(document), core.load_buildings(document)))
+        totals = aggregate_file(args.file)
+    except (OSError, ValueError) as error:
+        print("Error: %s" % error, file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(totals, indent=2))
+    else:
+        for room in totals["rooms"]:
+            print("Room %s: %.2f" % (room["name"], room["cost"]))
+        print("Total Cost: %.2f" % totals["total_cost"])
+        for name, buckets in totals["total_paint"].items():
+            print("Total %s: %d buckets" % (name.title(), buckets))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
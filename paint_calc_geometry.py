@@ -0,0 +1,227 @@
+"""Plane geometry for walls with positioned obstacles.
+Outlines are lists of (x, y) vertices going around a shape, measured in metres from the bottom left corner of the wall.
+The area an obstacle covers is the part of it within the wall, and where obstacles overlap, the overlap is only counted once.
+
+Obstacles are first indexed by their bounding boxes with a sweep line, so that only obstacles which overlap each other, or cross the edge of the wall, need their outlines intersected.
+Every other obstacle lies wholly within the wall, and simply covers its own area. This keeps walls with hundreds of openings, such as curtain wall facades, fast.
+"""
+
+#########################################################################################
+################################### Outlines ############################################
+#########################################################################################
+
+def bounding_box(outline):
+    '''Returns the (left, bottom, right, top) of an outline.
+    '''
+    xs = [x for x, y in outline]
+    ys = [y for x, y in outline]
+    return min(xs), min(ys), max(xs), max(ys)
+
+def translate(outline, position):
+    '''Returns an outline moved so that the bottom left corner of its bounding box is at position.
+    '''
+    left, bottom, right, top = bounding_box(outline)
+    return [(x - left + position[0], y - bottom + position[1]) for x, y in outline]
+
+def contains(outline, point):
+    '''Returns True if a point is within (or on the edge of) an outline.
+    '''
+    x, y = point
+    inside = False
+    for (x1, y1), (x2, y2) in _edges(outline):
+        if _on_edge(x1, y1, x2, y2, x, y):
+            return True
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+
+    return inside
+
+#########################################################################################
+################################ Spatial Index ##########################################
+#########################################################################################
+
+def overlapping_pairs(boxes):
+    '''Returns the index of every pair of bounding boxes which overlap, with a sweep line from left to right.
+    Only boxes still open at the sweep line are compared, so boxes spread across a wall are never compared with each other.
+    Boxes which only touch are not counted as overlapping.
+    '''
+    order = sorted(range(len(boxes)), key=lambda index: boxes[index][0])
+    active = []
+    pairs = []
+    for index in order:
+        left, bottom, right, top = boxes[index]
+        # Boxes which end before this one starts can never overlap any later box
+        active = [other for other in active if boxes[other][2] > left]
+        for other in active:
+            if boxes[other][1] < top and bottom < boxes[other][3]:
+                pairs.append((other, index))
+        active.append(index)
+
+    return pairs
+
+def clusters(num_of_items, pairs):
+    '''Groups items into clusters, where each pair given is in the same cluster. Returns a list of lists of indexes.
+    '''
+    parents = list(range(num_of_items))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    for first, second in pairs:
+        parents[find(first)] = find(second)
+
+    groups = {}
+    for index in range(num_of_items):
+        groups.setdefault(find(index), []).append(index)
+
+    return list(groups.values())
+
+#########################################################################################
+################################## Coverage #############################################
+#########################################################################################
+
+def covered_area(wall, obstacles):
+    '''Returns the area of a wall covered by its obstacles.
+    wall is the outline of the wall, and obstacles is a list of (outline, area) for each obstacle, where area is the exact area of the obstacle.
+    An obstacle which is wholly within the wall and overlaps no other obstacle covers exactly its own area.
+    The rest are grouped into clusters of overlapping obstacles, and each cluster covers the area of the union of its outlines within the wall.
+    '''
+    wall_box = bounding_box(wall)
+    boxes = [bounding_box(outline) for outline, area in obstacles]
+    covered = 0
+    for cluster in clusters(len(obstacles), overlapping_pairs(boxes)):
+        if len(cluster) == 1:
+            outline, area = obstacles[cluster[0]]
+            if _within(wall, wall_box, outline, boxes[cluster[0]]):
+                covered += area
+                continue
+        covered += union_area(wall, [obstacles[index][0] for index in cluster])
+
+    return covered
+
+def union_area(wall, outlines):
+    '''Returns the area of the part of a wall covered by any of the given outlines.
+    The plane is cut into vertical slabs at every vertex and every crossing of two edges. Within a slab no edges cross, so the covered length of
+    each vertical line changes linearly across it, and the area of the slab is exactly its width times the covered length down its middle.
+    '''
+    left, bottom, right, top = bounding_box([vertex for outline in outlines for vertex in outline])
+    wall_left, wall_bottom, wall_right, wall_top = bounding_box(wall)
+    left, right = max(left, wall_left), min(right, wall_right)
+    if right <= left:
+        return 0
+
+    shapes = [wall] + outlines
+    xs = {x for outline in shapes for x, y in outline}
+    xs.update(_crossings(shapes))
+
+    xs = sorted(x for x in xs if left < x < right)
+    xs = [left] + xs + [right]
+
+    area = 0
+    for x1, x2 in zip(xs, xs[1:]):
+        middle = (x1 + x2) / 2
+        covered = _merge([interval for outline in outlines for interval in _slice(outline, middle)])
+        area += _overlap(_slice(wall, middle), covered) * (x2 - x1)
+
+    return area
+
+#########################################################################################
+################################### Helpers #############################################
+#########################################################################################
+
+def _edges(outline):
+    return zip(outline, outline[1:] + outline[:1])
+
+def _on_edge(x1, y1, x2, y2, x, y):
+    if (x2 - x1) * (y - y1) != (y2 - y1) * (x - x1):
+        return False
+    return min(x1, x2) <= x <= max(x1, x2) and min(y1, y2) <= y <= max(y1, y2)
+
+def _within(wall, wall_box, outline, box):
+    '''Returns True if an outline is wholly within the wall.
+    '''
+    if box[0] < wall_box[0] or box[1] < wall_box[1] or box[2] > wall_box[2] or box[3] > wall_box[3]:
+        return False
+    if not all(contains(wall, vertex) for vertex in outline):
+        return False
+    # With every vertex inside, the outline can only leave a wall which is not convex by crossing one of its edges
+    return not any(_crossing(first, second) is not None for first in _edges(wall) for second in _edges(outline))
+
+def _crossings(outlines):
+    '''Returns the x of every point where the edges of two different outlines cross. 
+    Edges are swept from left to right, so only edges which overlap horizontally are compared. 
+    '''
+    edges = sorted(((min(x1, x2), max(x1, x2), index, ((x1, y1), (x2, y2))) for index, outline in enumerate(outlines) 
+                    for (x1, y1), (x2, y2) in _edges(outline)), key=lambda edge: edge[0])
+    active = []
+    xs = []
+    for left, right, index, edge in edges:
+        active = [other for other in active if other[1] >= left]
+        for other in active:
+            if other[2] != index:
+                x = _crossing(other[3], edge)
+                if x is not None:
+                    xs.append(x)
+        active.append((left, right, index, edge))
+
+    return xs
+
+def _crossing(first, second):
+    '''Returns the x at which two edges cross, or None if they do not cross at a single point within both.
+    '''
+    (x1, y1), (x2, y2) = first
+    (x3, y3), (x4, y4) = second
+    if max(x1, x2) < min(x3, x4) or max(x3, x4) < min(x1, x2) or max(y1, y2) < min(y3, y4) or max(y3, y4) < min(y1, y2):
+        return None
+
+    denominator = (x2 - x1) * (y4 - y3) - (y2 - y1) * (x4 - x3)
+    if denominator == 0:
+        return None
+    t = ((x3 - x1) * (y4 - y3) - (y3 - y1) * (x4 - x3)) / denominator
+    u = ((x3 - x1) * (y2 - y1) - (y3 - y1) * (x2 - x1)) / denominator
+    if 0 < t < 1 and 0 < u < 1:
+        return x1 + t * (x2 - x1)
+    return None
+
+def _slice(outline, x):
+    '''Returns the intervals of a vertical line at x which are within an outline, as a sorted list of (bottom, top).
+    '''
+    ys = []
+    for (x1, y1), (x2, y2) in _edges(outline):
+        if min(x1, x2) < x < max(x1, x2):
+            ys.append(y1 + (x - x1) * (y2 - y1) / (x2 - x1))
+    ys.sort()
+
+    return list(zip(ys[0::2], ys[1::2]))
+
+def _merge(intervals):
+    '''Merges intervals into a sorted list which do not overlap.
+    '''
+    merged = []
+    for bottom, top in sorted(intervals):
+        if merged and bottom <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], top))
+        else:
+            merged.append((bottom, top))
+
+    return merged
+
+def _overlap(first, second):
+    '''Returns the total length shared by two sorted lists of intervals which do not overlap.
+    '''
+    length = 0
+    index = other = 0
+    while index < len(first) and other < len(second):
+        bottom = max(first[index][0], second[other][0])
+        top = min(first[index][1], second[other][1])
+        if top > bottom:
+            length += top - bottom
+        if first[index][1] < second[other][1]:
+            index += 1
+        else:
+            other += 1
+
+    return length
@@ -1,580 +1,375 @@
 #########################################################################################
 ##################################### Imports ###########################################
 #########################################################################################
-from abc import abstractmethod
-from enum import Enum
-import math
-import PySimpleGUI as sg
-import sys
+import base64
+import importlib
+import os
+import threading
 
-icon_logo = "icon.png"
+import paint_calc_cache
+import paint_calc_core as core
+from paint_calc_core import Paint
+from paint_calc_profile import span, timed
 
-#########################################################################################
-##################################### Enums #############################################
-#########################################################################################
-
-class Shape(Enum):
-    """Shapes store a lambda function used to evaluate their area
-    They can then be easily calculated if I store a shape object on a wall/obstacles/etc. 
-    """
-    SQUARE = lambda b: pow(b, 2)
-    RECTANGLE = lambda b, h: b * h
-    PARALLELOGRAM = lambda b, h: b * h
-    TRAPEZOID = lambda b, h, a: ((a + b) / 2) * h
-    TRIANGLE = lambda b, h: 0.5 * (b * h)
-    ELLIPSE = lambda b, a: math.pi * (a*b)
-    CIRCLE = lambda r: math.pi * pow(r, 2)
-    SEMICIRCLE = lambda r: (math.pi * pow(r, 2)) / 2
-    
-    def __call__(self, args):
-        """Override the usual call method to instead allow for the supplying of a variety of multiple args.
-        These args are then passed to the matching lambda function to calculate the respective area. 
-        """
-        return self.value[0](args)
-    
-    @classmethod
-    def to_shape(self, shape_name):
-        """This is a class method, meaning it does not need to be called on a Shape object.
-        The method is passed a string, which it will then attempt to return a matching shape for.  
-        Error handling is not needed, because the user will only ever select from a drop down. 
-        """
-        match shape_name:
-            case "square":
-                return Shape.SQUARE
-            case "rectangle":
-                return Shape.RECTANGLE
-            case "parallelogram":
-                return Shape.PARALLELOGRAM
-            case "trapezoid":
-                return Shape.TRAPEZOID
-            case "triangle":
-                return Shape.TRIANGLE
-            case "ellipse":
-                return Shape.ELLIPSE
-            case "circle":
-                return Shape.CIRCLE
-            case "semicircle":
-                return Shape.SEMICIRCLE
-            case _:
-                return None
-
-class Paint(Enum):
-    """Paints are stored by their colour, with the value being the:
-    (Price per bucke (GBP), litres per bucket, coverage per litre (m^2))
-    Error handling is not needed, because the user will only ever select from a drop down.
-    Values used here come from https://www.wickes.co.uk : A random assortment of paints were selected to ensure variety of values
-    """
-    EMERALD = (24, 2.5, 13)
-    SAPPHIRE = (20, 2.5, 13)
-    WHITE = (45, 2.5, 12)
-    BLACK = (20, 2.5, 13)
-    BERRY = (20, 2.5, 13)
-    COTTON = (10, 0.75, 16)
-    PEBBLE = (32, 5, 13)
-    IVORY = (10, 5, 13)
-    
-    def __call__(self, args):
-        """Override the usual call method. 
-        The method can be passed an argument, which will be used to return one element from the list value of the paint. 
-        """
-        return self.value[args]
+class LazyModule():
+    '''Stands in for a module, which is only imported the first time one of its attributes is used. 
+    This means PySimpleGUI (and tkinter) are only imported once a window is actually shown, so the rest of this file can be imported without them. 
+    '''
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
     
-    @classmethod
-    def to_paint(self, paint_name):
-        """This is a class method, meaning it does not need to be called on a Paint object.
-        The method is passed a string, which it will then attempt to return a matching paint for.  
-        """
-        # Iterates through all paints until a matching paint is found. Then returns that paint. 
-        for paint in self:
-            if paint_name.lower() == paint.name.lower():
-                return paint
-        
-        #if no match is found, then return white as a default value. 
-        return Paint.WHITE 
+    def __getattr__(self, attribute):
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name)
+        return getattr(self.__module, attribute)
+
+sg = LazyModule("PySimpleGUI")
+
+def load_icon(path="icon.png"):
+    '''Reads the icon once, so that it is not read from disk again every time a window is created. 
+    '''
+    try:
+        with open(path, "rb") as file:
+            return base64.b64encode(file.read())
+    except OSError:
+        return None
+
+icon_logo = load_icon()
 
 #########################################################################################
 ################################### Classes #############################################
 #########################################################################################
 
-class Architecture():
-    """The parent class of Wall() and Obstacle(). 
-    An architecture object has an area- which can be calculated, and an index used to specify when asking for user input. 
-    Shape and dimensions are not stored, because they are not needed once area has been calculated. 
-    """
-    def __init__(self):
-        self.__surface_area = 0  
-        self.__index = 0
-        self.__shape = Shape.SQUARE
-
-    @abstractmethod
-    def define(self):
-        pass
-
-    def _area(self):
-        return self.__surface_area
-
-    def _calc_area(self, shape, dimensions):
-        """This area is used to calculate the area of an Architecture object.  
-        It takes a provided shape (the shape of the architecture object), and its dimensions. 
-        """
-        surface_area = 0
-        
-        # It uses the provided shape to call the lambda function assigned with it to calculate area. 
-        if shape is Shape.SQUARE:
-           return shape(dimensions[0])
-        elif shape is Shape.RECTANGLE or shape is Shape.PARALLELOGRAM or shape is Shape.TRIANGLE:
-           return shape(dimensions[0], dimensions[1])
-        elif shape is Shape.TRAPEZOID:
-          return shape(dimensions[0], dimensions[1], dimensions[2])
-        elif shape is Shape.ELLIPSE:
-           return shape(dimensions[0], dimensions[1])
-        elif shape is Shape.CIRCLE or shape is Shape.SEMICIRCLE:
-           return shape(dimensions[0])
-        else:
-            return surface_area
-
-class Wall(Architecture):
-    """A wall is a child class of Architecture. 
-    Walls have additional methods to find the required number of buckets and the cost to paint the wall. 
-    """
-    def __init__(self):
-        """init is overrided due to additional variables.
-        All values are assigned as a defualt and updated later. 
-        """
-        self.__paint = Paint.WHITE
-        self.__surface_area = 0.0
-        self.__coats = 1
-        self.__obstacles = []
-        
-    def define(self, shape, colour, num_of_obstacles):  
-        """Deine in wall is used to specify the details of the wall, including:
-        - Dimensions
-        - Number of coats they want to apply
-        """
-        
-        # Populates self.__obstacles with the supplied number of Obstacle objects
-        num_of_values = 0 
-        for i in range(0, num_of_obstacles):
-            self.__obstacles.append(Obstacle())
-        obstacle_index = 1
-        
-        # Define each obstacle before defining the wall
-        for obstacle in self.__obstacles:
-            obstacle.define(obstacle_index, len(self.__obstacles))
-            obstacle_index += 1 
-        
-        # Define the layout for the prompt window so that it asks for the variables required of the supplied shape. 
-        # E.g. a square only needs the length of one side, but a rectangle needs the height and width. 
-        # num_of_values is used later to specify the number of expected inputs later. 
-        match shape:
-            case Shape.RECTANGLE | Shape.PARALLELOGRAM | Shape.TRIANGLE:
-                num_of_values = 2 
-                layout = [
-                    [sg.Text("Please enter the details for this wall:")], 
-                    [sg.Text("Enter the length of the base of the wall in metres:")], 
-                    [sg.Multiline(size=(30,1), key='val1')], 
-                    [sg.Text("Enter the height of the wall in metres:")], 
-                    [sg.Multiline(size=(30,1), key='val2')]
-                ]
-            case Shape.TRAPEZOID:
-                num_of_values = 3 
-                layout = [
-                    [sg.Text("Please enter the details for this wall:")], 
-                    [sg.Text("Enter the length of the base of the wall in metres:")], 
-                    [sg.Multiline(size=(30,1), key='val1')],
-                    [sg.Text("Enter the height of the wall:")], 
-                    [sg.Multiline(size=(30,1), key='val2')], 
-                    [sg.Text("Enter the length of the top of the wall in metres:")], 
-                    [sg.Multiline(size=(30,1), key='val3')]
-                ]
-            case Shape.ELLIPSE:
-                num_of_values = 2
-                layout = [
-                    [sg.Text("Please enter the details for this wall:")], 
-                    [sg.Text("Enter the vertical radius the wall in metres:")], 
-                    [sg.Multiline(size=(30,1), key='val1')],
-                    [sg.Text("Enter the horizontal radius the wall in metres:")], 
-                    [sg.Multiline(size=(30,1), key='val2')] 
-                ]
-            case Shape.CIRCLE | Shape.SEMICIRCLE:
-                num_of_values = 1
-                layout = [
-                    [sg.Text("Please enter the details for this wall:")], 
-                    [sg.Text("Enter the radius the wall in meters::")], 
-                    [sg.Multiline(size=(30,1), key='val1')]
-                ]
-            case _: # Default case is a square
-                num_of_values = 1 
-                layout = [
-                    [sg.Text("Please enter the details of this wall:")], 
-                    [sg.Text("Enter the length of one side of the wall in meters:")], 
-                    [sg.Multiline(size=(30,1), key='val1')]     
-                ]
-        
-        # This is shared across all shapes. So it is simply added at the end. 
-        layout.append([sg.Text("Enter the number of coats of paint you plan to apply to the wall:")])
-        layout.append([sg.Multiline(size=(30,1), key='paint')])
-        layout.append([sg.Button("CONFIRM")])
-        layout.append([sg.Button("CLOSE")])
-
-        
-        # Draw the new window 
-        window = sg.Window("Wall Definition" , layout, icon=icon_logo)
-        
-        dimensions = []
-        coats = 0
-        
-        # Until loop (keep the window open) until a valid input is given     
-        while True:
-          event, values = window.read()
-          
-          # Match the event (user interaction)
-          match event:
-              case "CONFIRM":
-                # If the user presses the confirm button, then retrieve all of thir inputs 
-                coats = get_int_input(values['paint'], False)
-                if num_of_values == 1:
-                    dimensions.append(get_float_input(values['val1'],  False))
-                elif num_of_values == 2:
-                    dimensions.append(get_float_input(values['val1'], False))
-                    dimensions.append(get_float_input(values['val2'], False))
-                else:
-                    dimensions.append(get_float_input(values['val1'], False))
-                    dimensions.append(get_float_input(values['val2'], False))
-                    dimensions.append(get_float_input(values['val3'], False))
-                break 
-              case None | "CLOSE":
-                  sys.exit()
-              case _: 
-                 pass
-        
-        # Assign inputted values
-        self.__paint = colour
-        self.__coats = coats
-        
-        window.Disable()
-        
-        # Calculate the area of the wall
-        self.__surface_area = self._calc_area(shape, dimensions)
-       
-        # If there are obstacles, then remove their surface area from the wall. 
-        if len(self.__obstacles) != 0: 
-            self.__area_with_obstacles
-        window.close()
-    
-    def required_buckets(self):
-        """Returns the amount of paint required to cover the wall. 
-        """
-        import math
-        litres_required = (self.__surface_area * self.__coats) / self.__paint(2)
-        
-        # Value is rounded up, since you can't purchase .something of a bucket. 
-        b_req = math.ceil(litres_required / self.__paint(1))
-        if b_req == 0:  b_req += 1 
-        
-        return b_req
+class Room(core.Room):
+    '''The GUI version of a room. 
+    New rooms are filled in by the ProjectEditor(), whereas rooms opened from a project file are core rooms which have already been defined. 
+    '''
+
+class ProjectEditor():
+    '''A single window for entering every room. 
+    Each room has its own tab, holding an editable grid with a row for every wall and obstacle. Obstacles belong to the wall above them. 
+    Every cell is checked as it is typed in, and invalid cells are highlighted in place, rather than opening a new window for each wall and obstacle. 
+    Each room can also be given the building and floor it is on, which can be read with get_locations() once the editor is closed. 
+    '''
     
-    def get_cost(self):
-        """Returns the cost of covering the wall.
-        """
-        return self.required_buckets() * self.__paint(0)
+    # Valid shapes and colour choices used in the drop down menus
+    shapes = ["Square", "Rectangle", "Parallelogram", "Trapezoid", "Triangle", "Ellipse", "Circle", "Semicircle"]
+    colours = [colour.name.title() for colour in Paint]
     
-    def get_paint(self): 
-        """Returns the paint used on the wall. 
-        """
-        return self.__paint
+    # Background colours of valid and invalid cells
+    valid_colour = "white"
+    invalid_colour = "#f4b6b6"
     
-    def __area_with_obstacles(self):
-        """Calculates the area of the wall when accounting for obstacles
-        """
-        for obstacle in self.__obstacles:
-            self.__surface_area -= obstacle._area()
-
-class Obstacle(Architecture): 
-    """Obstacle is a child of the Architecture() class. 
-    Obstacles would be anything on the wall that cannot be painted. Such as doors or windows. 
-    The user is never asked to specify what the obstacle is, because it ultimately doesn't matter. 
-    What matters, is the shape of the obstacle.
-    """
+    def __init__(self, rooms):
+        self.__rooms = rooms
+        self.__rows = [[] for room in rooms]
+        self.__kinds = {}
+        self.__next_row = 0
+        self.__invalid = set()
+        self.__locations = [("", "") for room in rooms]
+        self.__window = None
     
-    def define(self, index, total_num):
-        """Like in the Wall() class, define is used here to retrieve information about the obstacle. 
-        """
-        
-        # Valid Shapes     
-        shape_types = ["Square", "Rectangle", "Parallelogram", "Trapezoid", "Triangle", "Ellipse", "Circle", "Semicircle"]
+    def open(self):
+        '''Creates the editor window with a tab for each room, and returns it. Each event of the window is then passed to handle(). 
+        '''
+        tabs = []
+        for room_index in range(len(self.__rooms)):
+            tabs.append(sg.Tab("Room %d" % (room_index + 1), self.__room_layout(room_index), key=("tab", room_index)))
         
         layout = [
-                [sg.Text("Obstacle No.%d of %d" % (index, total_num))], 
-                [sg.Text("Please enter the details for this obstacle:")], 
-                [sg.Text("Please select the shape of the obstacle from the drop down menu: ")], 
-                [sg.OptionMenu(values=shape_types,size=(30,8), default_value='Square',key='shape')],
-                [sg.Button("CONFIRM")],
-                [sg.Button("CLOSE")]
-            ] 
-        
-        # Create a window and keep it open until a valid interaction is given. 
-        window = sg.Window("Obstacle Definition", layout, icon=icon_logo)
-        while True:
-            event, values = window.read()
-            match event:
-                case "CONFIRM":
-                    # When the user clicks confirm, convert the input into a shape object
-                    shape = Shape.to_shape(values['shape'].lower())
-                    break 
-                case None | "CLOSE":
-                    sys.exit()
-                case _: 
-                    pass
-        
-        # Freeze the window so the user cannot interact with it.
-        # This is because we will be making a new window, and do not want them to interact with this current one whilst it is open. 
-        window.Disable()
-        self.__define_area(shape)   
-        window.close()
+            [sg.Text("Enter every wall in each room. Obstacles (doors/windows/areas that cannot be painted) belong to the wall above them.")], 
+            [sg.TabGroup([tabs])], 
+            [sg.Button("CONFIRM"), sg.Button("CLOSE")]
+        ]
+        with span("gui.window.editor"):
+            self.__window = sg.Window("Room Definition", layout, icon=icon_logo, finalize=True, resizable=True)
         
-    def __define_area(self, shape):
-        '''This is used to define the area of the obstacle.
-        The area itself is calculated within the Shape object.
+        return self.__window
+    
+    def handle(self, event, values):
+        '''Handles a single event of the editor window. 
+        Returns True once every room is valid and the user confirms, after the name and walls of each room have been set. 
+        Returns False if the user closes the editor, and None while it is still being edited. The window is left for the caller to close. 
         '''
+        window = self.__window
+        match event:
+            case None | "CLOSE":
+                return False
+            case (("add_wall" | "add_obstacle") as kind, room_index):
+                row_id, row = self.__row("wall" if kind == "add_wall" else "obstacle")
+                self.__rows[room_index].append(row_id)
+                window.extend_layout(window[("grid", room_index)], row)
+                window[("grid", room_index)].contents_changed()
+                self.__validate(window, values)
+            case ("delete", row_id):
+                # Rows are hidden rather than removed, as elements cannot be taken out of a window
+                window[("row", row_id)].update(visible=False)
+                window[("row", row_id)].hide_row()
+                for rows in self.__rows:
+                    if row_id in rows:
+                        rows.remove(row_id)
+                self.__validate(window, values)
+            case "CONFIRM":
+                rooms = self.__validate(window, values)
+                if rooms is not None:
+                    for room, (name, walls) in zip(self.__rooms, rooms):
+                        room.set_name(name)
+                        for wall in walls:
+                            room.add_wall(wall)
+                    self.__locations = [(values[("building", room_index)].strip(), values[("floor", room_index)].strip()) 
+                                        for room_index in range(len(self.__rooms))]
+                    return True
+            case _:
+                # Any edit to a cell 
+                self.__validate(window, values)
         
-        # Generate different window layouts depending upon the shape. 
-        match shape:
-            case Shape.RECTANGLE | Shape.PARALLELOGRAM | Shape.TRIANGLE:
-                num_of_values = 2 
-                layout = [
-                    [sg.Text("Please enter the details for this obstacle:")], 
-                    [sg.Text("Enter the length of the base of the obstacle in metres:")], 
-                    [sg.Multiline(size=(30,1), key='val1')], 
-                    [sg.Text("Enter the height of the obstacle:")], 
-                    [sg.Multiline(size=(30,1), key='val2')], 
-                ]
-            case Shape.TRAPEZOID:
-                num_of_values = 3 
-                layout = [
-                    [sg.Text("Please enter the details for this obstacle:")], 
-                    [sg.Text("Enter the length of the base of the obstacle in metres::")], 
-                    [sg.Multiline(size=(30,1), key='val1')],
-                    [sg.Text("Enter the height of the obstacle in metres::")], 
-                    [sg.Multiline(size=(30,1), key='val2')], 
-                    [sg.Text("Enter the length of the top of the obstacle in metres::")], 
-                    [sg.Multiline(size=(30,1), key='val3')],  
-                ]
-            case Shape.ELLIPSE:
-                num_of_values = 2
-                layout = [
-                    [sg.Text("Please enter the details for this obstacle:")], 
-                    [sg.Text("Enter the vertical radius the obstacle in metres::")], 
-                    [sg.Multiline(size=(30,1), key='val1')],
-                    [sg.Text("Enter the horizontal radius the obstacle in metres::")], 
-                    [sg.Multiline(size=(30,1), key='val2')], 
-                ]
-            case Shape.CIRCLE | Shape.SEMICIRCLE:
-                num_of_values = 1
-                layout = [
-                    [sg.Text("Please enter the details for this obstacle in metres::")], 
-                    [sg.Text("Enter the radius the obstacle in metres::")], 
-                    [sg.Multiline(size=(30,1), key='val1')],
-                ]
-            case _: # Default case is a square
-                num_of_values = 1 
-                layout = [
-                    [sg.Text("Please enter the details for this obstacle in metres::")], 
-                    [sg.Text("Enter the length of one side of the obstacle in metres::")], 
-                    [sg.Multiline(size=(30,1), key='val1')], 
-                ]     
-        
-        # These buttons are shared regardless of the shape. So they are appended afterwards. 
-        layout.append([sg.Button("CONFIRM")])
-        layout.append([sg.Button("CLOSE")])
-        
-        # Create a new window with the above layout. 
-        window = sg.Window("Paint Calculator", layout, icon=icon_logo)
-        
-        dimensions = []
-        coats = 0
-        
-        # Keep the window open until a valid interaction is made.       
-        while True:
-          event, values = window.read()
-          match event:
-              case "CONFIRM":
-                # If the user clicks confirm, then attempt to get their inputs what they entered. 
-                if num_of_values == 1:
-                    dimensions.append(get_float_input(values['val1'], False))
-                elif num_of_values == 2:
-                    dimensions.append(get_float_input(values['val1'], False))
-                    dimensions.append(get_float_input(values['val2'], False))
-                else:
-                    dimensions.append(get_float_input(values['val1'], False))
-                    dimensions.append(get_float_input(values['val2'], False))
-                    dimensions.append(get_float_input(values['val3'], False))
-                break 
-              case None | "CLOSE":
-                  sys.exit()
-              case _: 
-                 pass
-        
-        # The surface area of the obstacle is calculated and assigned. 
-        window.Disable()        
-        self.__surface_area = self._calc_area(shape, dimensions)
-        window.close()
-
-class Room():
-    '''Rooms do not inherit from Architecture as they do not share enough with how they have been defined. 
-    Instead, a room is functionally a collection of Wall() objects, with its own methods. 
-    '''
-    def __init__(self):
-        self.__walls = []
-        self.__name = "default room"
-        self.__index = 0
+        return None
     
-    def get_walls(self):
-        return self.__walls
+    def get_locations(self):
+        '''Returns the (building, floor) entered for each room, in order. Either is an empty string if it was left blank. 
+        '''
+        return self.__locations
     
-    def get_name(self):
-        return self.__name
+    def __room_layout(self, room_index):
+        # Every room starts with a single wall
+        row_id, first_row = self.__row("wall")
+        self.__rows[room_index].append(row_id)
+        
+        return [
+            [sg.Text("Room name:"), sg.Input(key=("name", room_index), size=(30,1)), 
+             sg.Text("Building (optional):"), sg.Input(key=("building", room_index), size=(15,1)), 
+             sg.Text("Floor (optional):"), sg.Input(key=("floor", room_index), size=(10,1))], 
+            [sg.Text("", size=(10,1)), sg.Text("Shape", size=(14,1)), sg.Text("Dimension 1", size=(10,1)), sg.Text("Dimension 2", size=(10,1)), 
+             sg.Text("Dimension 3", size=(10,1)), sg.Text("Paint", size=(12,1)), sg.Text("Coats", size=(6,1))], 
+            [sg.Column(first_row, key=("grid", room_index), scrollable=True, vertical_scroll_only=True, size=(760, 300))], 
+            [sg.Button("Add Wall", key=("add_wall", room_index)), sg.Button("Add Obstacle", key=("add_obstacle", room_index))], 
+            [sg.Text("", key=("status", room_index), size=(90,1))]
+        ]
     
-    def get_cost(self):
-        """Calculates the total cost to paint the room by finding the cost of every wall and adding them together
-        """
-        total_cost = 0
-        for wall in self.__walls:
-            total_cost += wall.get_cost()
-            
-        return total_cost
-        
-    def define(self, room_index):
-        """Used to define the room itself.
-        It it just passed an index, which is used so the user can keep track of what room they are defining.
-        """
-        
-        self.__index = room_index
-        
-        # Create a window to ask for user input
-        # They will enter the details for the wall 
-        layout = [
-                [sg.Text("Room No.%d" % self.__index)], 
-                [sg.Text("Please enter the details of this room:")], 
-                [sg.Text("Room name:")], 
-                [sg.Multiline(size=(30,1), key='name')], 
-                [sg.Text("Number of walls:")], 
-                [sg.Multiline(size=(30,1), key='walls')], 
-                [sg.Button("CONFIRM")],
-                [sg.Button("CLOSE")]
-            ]    
-        window = sg.Window("Room Definition", layout, icon=icon_logo)
-        
-        # Keep the window open until a valid input is given 
-        while True:
-            event, values = window.read()
-            match event:
-                case "CONFIRM":
-                    # Once the user clicks confirm, attempt to store their inputs
-                    self.__name = values['name']
-
-                    num_of_rooms = get_int_input(values['walls'], False)
-                    # Populate self.__walls() with the relative number of Wall() objects
-                    # They will be defined later
-                    for i in range(0, num_of_rooms):
-                        self.__walls.append(Wall()) 
-                    break 
-                case None | "CLOSE":
-                    sys.exit()
-                case _: 
-                    pass
-        
-        # Populate the room
-        # This is in regards to getting information on each wall
-        window.Disable()
-        self.__populate()
-        window.close()
-        
-    def __populate(self): 
-        '''The room is populated by get details on each wall within the room, and then defining the Wall() objects
+    def __row(self, kind):
+        '''Returns the id and layout of a new row of the grid. Every element of the row is keyed by (column, row id). 
         '''
+        row_id = self.__next_row
+        self.__next_row += 1
+        self.__kinds[row_id] = kind
         
-        # Valid shapes and colour choices used in the drop down menu 
-        shapes = ["Square", "Rectangle", "Parallelogram", "Trapezoid", "Triangle", "Ellipse", "Circle", "Semicircle"]        
-        colours = []
-        for colour in Paint:   
-            colours.append(colour.name.title())
-        
+        cells = [
+            sg.Text("Wall" if kind == "wall" else "  Obstacle", size=(10,1)), 
+            sg.Combo(self.shapes, default_value="Square", key=("shape", row_id), readonly=True, enable_events=True, size=(14,1))
+        ]
+        for column in ("dim1", "dim2", "dim3"):
+            cells.append(sg.Input(key=(column, row_id), size=(11,1), enable_events=True, background_color=self.valid_colour))
+        if kind == "wall":
+            cells.append(sg.Combo(self.colours, default_value="White", key=("paint", row_id), readonly=True, enable_events=True, size=(12,1)))
+            cells.append(sg.Input("1", key=("coats", row_id), size=(6,1), enable_events=True, background_color=self.valid_colour))
+        else:
+            cells.append(sg.Text("", size=(22,1)))
+        cells.append(sg.Button("X", key=("delete", row_id)))
         
-        wall_index = 1
-        for wall in self.__walls:
-            shape = "Square"
+        return row_id, [[sg.Column([cells], key=("row", row_id), pad=(0,0))]]
+    
+    @timed("gui.validate")
+    def __validate(self, window, values):
+        '''Checks every room, highlights invalid cells and shows the total of each valid room. 
+        Returns a list of (name, walls) for every room if they are all valid, otherwise None. 
+        '''
+        rooms = []
+        invalid = set()
+        for room_index, row_ids in enumerate(self.__rows):
+            rows = []
+            for row_id in row_ids:
+                # Rows added since the values were read take their default values
+                row = {"kind": self.__kinds[row_id], "shape": "Square", "paint": "White", "coats": "1"}
+                for column in ("shape", "dim1", "dim2", "dim3", "paint", "coats"):
+                    if (column, row_id) in values:
+                        row[column] = values[(column, row_id)]
+                rows.append(row)
             
-            # For each wall create a new window which will ask the user to enter information on that wall. 
-            layout = [
-                    [sg.Text("Wall No.%d of %d in %s" % (wall_index, len(self.__walls), self.__name))], 
-                    [sg.Text("Please enter the number of obstacles (doors/windows/areas that cannot be painted): ")], 
-                    [sg.Multiline(size=(30,1), key='obstacles')], 
-                    [sg.Text("Please select the shape of the wall from the drop down menu: ")], 
-                    [sg.OptionMenu(values=shapes,size=(30,8), default_value='Square',key='shape')],
-                    [sg.Text("Please select the colour of the wall from the drop down menu: ")], 
-                    [sg.OptionMenu(values=colours,size=(30,8), default_value='White',key='colour')],
-                    [sg.Button("CONFIRM")],
-                    [sg.Button("CLOSE")]
-                ]
-            wall_index += 1
-            window = sg.Window("Room Definition", layout, icon=icon_logo)
-
-            # Keep window open until valid input is given
-            while True:
-                event, values = window.read()
-                match event:
-                    case "CONFIRM":
-                        # When the user clicks confirm, attempt to store their inputs
-                        
-                        shape = Shape.to_shape(values['shape'].lower())
-                        colour = Paint.to_paint(values['colour'].lower())
-                        
-                        window.Disable()
-                        num_of_obstacles = get_int_input(values['obstacles'], True)
-                        wall.define(shape, colour, num_of_obstacles)  
-                        break 
-                    case None | "CLOSE":
-                        sys.exit()
-                    case _: 
-                        pass   
-            window.close()
-        
+            walls, errors = core.read_rows(rows)
+            for (index, column), message in errors.items():
+                invalid.add((column, row_ids[index]))
+            
+            status = window[("status", room_index)]
+            if not row_ids:
+                status.update("Please add at least one wall.")
+            elif errors:
+                (index, column), message = min(errors.items())
+                status.update("Row %d: %s" % (index + 1, message))
+            else:
+                status.update("%d walls, £%.2f" % (len(walls), sum(wall.get_cost() for wall in walls)))
+            
+            if errors or not row_ids:
+                rooms = None
+            elif rooms is not None:
+                rooms.append((values[("name", room_index)], walls))
+        
+        # Only the cells whose state has changed are updated
+        for key in invalid - self.__invalid:
+            if key[0] in ("dim1", "dim2", "dim3", "coats"):
+                window[key].update(background_color=self.invalid_colour)
+        for key in self.__invalid - invalid:
+            if key[0] in ("dim1", "dim2", "dim3", "coats") and key in window.AllKeysDict:
+                window[key].update(background_color=self.valid_colour)
+        self.__invalid = invalid
+        
+        return rooms
+    
 class Calculator():
     '''Calculator is the main class for running the program.
-    This is where the base windows are called from in the hierarchy of windows. It is also where the program loop is located
+    Every window is a screen, kept on a stack along with the function which handles its events. A single event loop reads the events of every window, 
+    and passes each to the handler of its screen. Only the top screen takes input: opening a screen disables the one below it until it is closed. 
+    Anything which may take a while, such as opening a project or working out the range of each total, is run as a BackgroundTask behind a progress screen, 
+    so every window keeps responding and the work can be cancelled. 
     '''
     
     def __init__(self):       
-        self.__rooms = []
+        self.__project = core.Project()
+        self.__screens = []
+        # Kept for the whole session, so results survive starting again. Setting PAINT_CALC_CACHE to a file keeps them between sessions too
+        self.__cache = paint_calc_cache.RoomCache(path=os.environ.get("PAINT_CALC_CACHE"))
      
     def main(self):
-        '''Main simply loops through until the user closes the program.
-        On the final screen, the user can choose to restart. Which will return to the loop. 
+        '''Main runs the event loop until the user closes the program.
+        On the final screen, the user can choose to restart, which returns to the first screen. 
+        '''
+        self.__get_rooms()
+        while self.__screens:
+            window, event, values = sg.read_all_windows()
+            # Events of windows which have already been closed are ignored
+            for screen, handler in reversed(self.__screens):
+                if screen is window:
+                    handler(event, values)
+                    break
+
+    def __open(self, window, handler):
+        '''Shows a window as the top screen, with a function to handle each of its events as (event, values). 
+        The screen below is disabled until this one is closed. 
+        '''
+        if self.__screens:
+            self.__screens[-1][0].Disable()
+        self.__screens.append((window, handler))
+
+    def __close(self, window):
+        '''Closes a screen, and enables the screen below it again. 
+        '''
+        window.close()
+        self.__screens = [screen for screen in self.__screens if screen[0] is not window]
+        if self.__screens:
+            self.__screens[-1][0].Enable()
+
+    def __quit(self):
+        '''Closes every screen, which ends the event loop. 
         '''
-        while True:
-            # Get the number of rooms
-            self.__rooms = self.__get_rooms()
+        for window, handler in reversed(self.__screens):
+            window.close()
+        self.__screens = []
+        self.__cache.close()
+
+    def __show(self, title, layout):
+        '''Shows a window of results, which is closed by any event. 
+        '''
+        window = sg.Window(title, layout, icon=icon_logo, finalize=True)
+        self.__open(window, lambda event, values: self.__close(window))
+
+    def __run(self, message, function, args, finished, failure):
+        '''Runs function(*args) as a BackgroundTask, behind a screen showing its progress, then calls finished() with its result. 
+        If the function raises an error, it is shown after the failure message instead. If the user cancels the task, nothing more is done. 
+        '''
+        layout = [
+            [sg.Text(message, key="message", size=(50,1))], 
+            [sg.ProgressBar(PROGRESS_STEPS, orientation="h", size=(40,20), key="bar")], 
+            [sg.Button("CANCEL")]
+        ]
+        # The screen can only be closed once the task has finished, so that the task never sends an event to a closed window
+        window = sg.Window("Please wait", layout, icon=icon_logo, finalize=True, disable_close=True)
+        task = BackgroundTask(window, function, *args)
+        
+        def handle(event, values):
+            match event:
+                case "progress":
+                    window["bar"].update(current_count=values[event])
+                case "done":
+                    self.__close(window)
+                    result = values[event]
+                    if isinstance(result, Cancelled):
+                        return
+                    if isinstance(result, Exception):
+                        self.__show("Error", [[sg.Text("%s: %s" % (failure, result))], [sg.Button("OK")]])
+                    else:
+                        finished(result)
+                case "CANCEL":
+                    # The task stops the next time it reports its progress, and this screen is closed once it has
+                    task.cancel()
+                    window["message"].update("Cancelling...")
+                    window["CANCEL"].update(disabled=True)
+        
+        self.__open(window, handle)
+        task.start()
 
-            # Define and populate each room
-            room_index = 1
-            for room in self.__rooms:
-                room.define(room_index)
-                room_index += 1
+    def __get_rooms(self): 
+        '''The first screen, which gets the number of rooms which are being painted, or opens a project file. 
+        '''
+        layout = [[sg.Text('Please enter the number of rooms you wish to paint in the box below:')], [sg.Multiline(size=(30,1), key='textbox')], 
+                  [sg.Text("", key="status", size=(60,1))], [sg.Button("CONFIRM")], [sg.Button("OPEN PROJECT")], [sg.Button("CLOSE")]] 
+        window = sg.Window("Paint Calculator", layout, icon=icon_logo, finalize=True)
+        
+        def handle(event, values):
+            match event:
+                case "CONFIRM":
+                    # Invalid input is shown on this screen, rather than in a new window
+                    error = core.check_int_input(values['textbox'], False)
+                    if error is not None:
+                        window["status"].update(error)
+                        return
+                    self.__close(window)
+                    self.__define_rooms([Room() for i in range(int(values['textbox']))])
+                case "OPEN PROJECT":
+                    # Open a saved project file. Its rooms have already been defined, so it goes straight to the final screen
+                    import paint_calc_file
+                    path = sg.popup_get_file("Open a project:", file_types=(("Paint Calculator Projects", "*" + paint_calc_file.EXTENSION),), icon=icon_logo)
+                    if path:
+                        self.__run("Opening the project...", open_project, (path,), opened, "Could not open the project")
+                case None | "CLOSE":
+                    self.__quit()
+        
+        def opened(project):
+            self.__close(window)
+            self.__project = project
+            self.__final_screen()
+        
+        self.__open(window, handle)
 
-            # Present the final screen where the user can get the results
+    def __define_rooms(self, rooms):
+        '''Defines and populates every new room in a single editor window. 
+        The project keeps running totals, which are updated as each room is defined. 
+        '''
+        self.__project = core.Project(rooms)
+        editor = ProjectEditor(rooms)
+        window = editor.open()
+        
+        def handle(event, values):
+            confirmed = editor.handle(event, values)
+            if confirmed is None:
+                return
+            if not confirmed:
+                self.__quit()
+                return
+            self.__close(window)
+            place_rooms(self.__project, rooms, editor.get_locations())
             self.__final_screen()
-            # Delete the variables created this loop to clear memory. 
-            self.__rooms = []
+        
+        self.__open(window, handle)
 
     def __final_screen(self): 
         '''This is the final window.
         Here, the user can ask for:
         - Total cost
         - Total number of puckets per paint
-        - Per Room:
+        - Per Room, Per Floor or Per Building:
             - Cost
             - Number of buckets of each paint
+        - A report of every paint, room and wall, saved as CSV, JSON or HTML
         '''
         
         # Create a new window to present results to the user 
@@ -584,341 +379,270 @@ class Calculator():
             [sg.Button("Total Cost")],
             [sg.Button("Total Paint")],
             [sg.Button("Per Room")],
+            [sg.Button("Per Floor")],
+            [sg.Button("Per Building")],
+            [sg.Button("SAVE PROJECT")],
+            [sg.Button("EXPORT REPORT")],
             [sg.Button("START AGAIN")], 
             [sg.Button("CLOSE")]
         ]
-        window = sg.Window("Paint Calculator", layout, icon=icon_logo)
+        window = sg.Window("Paint Calculator", layout, icon=icon_logo, finalize=True)
 
-        # Loop until valid input is given
-        while True:
-            event, values = window.read()
+        def handle(event, values):
             match event:
-                case "Total Cost":
-                    # Call the total_cost() method, which will present a pop up with the costs 
-                    window.Disable()
-                    self.__total_cost()
-                    window.Enable()
-                case "Total Paint":
-                    # Call the total_paint() method, which will present a pop up with the total number of buckets required for each paint used 
-                    window.Disable()
-                    self.__total_paint()
-                    window.Enable()
+                case "Total Cost" | "Total Paint":
+                    # Present a window with the total cost, or the total number of buckets required for each paint used, along with the range each is likely to fall within
+                    self.__show_quote(event, self.__project)
                 case "Per Room": 
-                    # Call the per_room() method
-                    # This method creates a new winodw where the user can select one of their defined rooms
-                    window.Disable()
-                    self.__per_room()
-                    window.Enable()
+                    # Open a new window where the user can select one of their defined rooms
+                    self.__per_group("Room", self.__project.get_rooms())
+                case "Per Floor" | "Per Building":
+                    # The same as per room, but for each floor or building. Their totals are kept by the project, so nothing is added up here
+                    buildings = self.__project.get_buildings()
+                    if event == "Per Building":
+                        self.__per_group("Building", buildings)
+                    else:
+                        self.__per_group("Floor", [floor for building in buildings for floor in building.get_floors()])
+                case "SAVE PROJECT":
+                    # Save every room to a project file, so it can be opened again later
+                    self.__save_project()
+                case "EXPORT REPORT":
+                    # Write out the breakdown of every paint, room and wall
+                    self.__export_report()
                 case "START AGAIN":
-                    # Exit this method and return to the main loop
-                    window.close()
-                    break
-                case None | "CLOSE":
-                    sys.exit()
-                case _: 
-                    sys.exit()
+                    # Return to the first screen with a new project
+                    self.__close(window)
+                    self.__project = core.Project()
+                    self.__get_rooms()
+                case _:
+                    self.__quit()
+        
+        self.__open(window, handle)
         
-    def __total_cost(self):
-        '''Calculates the total cost for all rooms.
+    def __save_project(self):
+        '''Asks the user where to save the project, then saves it as a project file.
         '''
-        # Iterates through each room, then each wall in each room, and adds the cost of that wall to the total 
-        total_cost = 0
-        for room in self.__rooms:
-            for wall in room.get_walls():
-                total_cost += wall.get_cost()
-            
-        # Popup window created to present cost to user.     
-        temp_layout = [
-            [sg.Text("Total Cost: £%.2f" % total_cost)], 
-            [sg.Button("OK")]
-        ] 
-        temp_window = sg.Window("Total Cost", temp_layout, icon=icon_logo)
-        
-        # Keep window open until valid input is given
-        while True:
-            event, values = temp_window.read()
-            match event:
-                case None | "OK":
-                    temp_window.close()
-                    break
-                case _: 
-                    temp_window.close()
-                    break
-      
-    def __total_paint(self):
-        '''Calculate the total number of buckets required for each paint used. 
-        This is across all rooms.
+        import paint_calc_file
+        path = sg.popup_get_file("Save the project as:", save_as=True, default_extension=paint_calc_file.EXTENSION,
+                                 file_types=(("Paint Calculator Projects", "*" + paint_calc_file.EXTENSION),), icon=icon_logo)
+        if not path:
+            return
+
+        self.__run("Saving the project...", save_project, (path, self.__project), lambda result: None, "Could not save the project")
+
+    def __export_report(self):
+        '''Asks the user where to save a report on the project, then writes it in the format given by its extension. 
         '''
-        # Iterate through each room, then each wall in each room, and retrieve the amount of paint needed. 
-        # This is stored as a dictionary, with the {Paint: total cost}
-        total_paint = {}
-        for room in self.__rooms:
-            for wall in room.get_walls():  
-                keys = total_paint.keys()
-                if wall.get_paint() in keys:
-                    total_paint[wall.get_paint()] += wall.required_buckets()
-                else: 
-                    total_paint[wall.get_paint()] = wall.required_buckets()
-            
-        # Generate a layout so that the correct number of paints are displayed.     
-        temp_layout = [[sg.Text("Total of each paint used can be found below. Along with a margin of error of 10 percent")]]
-        for key, value in total_paint.items():
-            margin_error = value / 10.0
-            temp_layout.append([sg.Text("Total %s: %.0f buckets (± %.2f buckets)" % (key.name.title(), value, margin_error))])
-        temp_layout.append( [sg.Button("OK")])
-        
-        # Create new popup window to display result 
-        temp_window = sg.Window("Total Paint", temp_layout, icon=icon_logo)
-        
-        # Keep window open until valid input is given
-        while True:
-            event, values = temp_window.read()
-            match event:
-                case None | "OK":
-                    temp_window.close()
-                    break
-                case _: 
-                    temp_window.close()
-                    break
+        path = sg.popup_get_file("Save the report as:", save_as=True, default_extension=".html",
+                                 file_types=(("HTML Reports", "*.html"), ("CSV Reports", "*.csv"), ("JSON Reports", "*.json")), icon=icon_logo)
+        if not path:
+            return
+
+        self.__run("Writing the report...", export_report, (path, self.__project), lambda result: None, "Could not write the report")
+
+    def __show_quote(self, title, group):
+        '''Works out the totals of a project, building, floor or room in the background, then shows either its cost or paint. 
+        '''
+        if title.endswith("Cost"):
+            finished = lambda result: self.__show("Total Cost", cost_layout(result))
+        else:
+            finished = lambda result: self.__show("Total Paint", paint_layout(result))
+        self.__run("Working out the likely range of each total...", quote_group, (group, self.__cache), finished, "Could not work out the totals")
         
-    def __per_room(self):
-        '''This method allows the user to view a list of rooms they have specified
-        They can then select a room, and view information on that room.
+    def __per_group(self, kind, groups):
+        '''Allows the user to select one of a list of rooms, floors or buildings, and view information on it. 
         '''
         
         # the layout is appended to for each room 
         layout = [
-            [sg.Text("Please select a room: ")] 
+            [sg.Text("Please select a %s: " % kind.lower())] 
         ]
+        if not groups:
+            layout.append([sg.Text("No %ss have been given." % kind.lower())])
         
         # Iterate through each room 
         # If rooms have duplicate names, then only one button is added
         # In this case, both rooms will be presented one after the other 
         name_check = []
-        for room in self.__rooms:
+        for room in groups:
             if room.get_name() not in name_check:
                 name_check.append(room.get_name())
                 layout.append([sg.Button(room.get_name())])
         layout.append([sg.Button("OK")])
         
         # Create new window
-        temp_window = sg.Window("Per Room", layout, icon=icon_logo)
+        window = sg.Window("Per %s" % kind, layout, icon=icon_logo, finalize=True)
         
-        # Keep window open until valid input is given 
-        while True:
-            event, values = temp_window.read()
+        def handle(event, values):
             match event:
                 case None | "OK":
-                    temp_window.close()
-                    break
+                    self.__close(window)
                 case _: 
-                    # If the user selects a room, then iterate through the list of rooms until one with a matching name is found
-                    # Then, call the room_info() method with that room
-                    for room in self.__rooms:
+                    # If the user selects a room, then open a room_info() screen for every room with a matching name
+                    # They are opened last first, so that the first is on top
+                    for room in reversed(groups):
                         if event == room.get_name():
-                            temp_window.Disable()
-                            self.__room_info(room)
-                            temp_window.Enable()
+                            self.__room_info(room, kind)
         
-    def __room_info(self, room):
-        '''Allows the user to view individual information on each room
+        self.__open(window, handle)
+        
+    def __room_info(self, room, kind="Room"):
+        '''Allows the user to view individual information on each room, floor or building
         '''
         
         # Generate layout for the window, then create the window
         layout = [
-            [sg.Text("Room: %s" % room.get_name())], 
+            [sg.Text("%s: %s" % (kind, room.get_name()))], 
             [sg.Button("Cost")],
             [sg.Button("Paint")],
             [sg.Button("CLOSE")]
         ]
-        window = sg.Window("Per Room", layout, icon=icon_logo)
+        window = sg.Window("Per %s" % kind, layout, icon=icon_logo, finalize=True)
         
-        # Keep window open until valid input is given
-        while True:
-            event, values = window.read()
+        def handle(event, values):
             match event:
-                case "Cost":
-                    # Display the cost fort this room in a popout window
-                    cost = room.get_cost()
-                    temp_layout = [
-                        [sg.Text("Total Cost: £%.2f" % cost)], 
-                        [sg.Button("OK")]
-                    ] 
-                    temp_window = sg.Window("Total Cost", temp_layout, icon=icon_logo)
-                    while True:
-                        event, values = temp_window.read()
-                        match event:
-                            case None | "OK":
-                                temp_window.close()
-                                break
-                            case _: 
-                                temp_window.close()
-                                break
-                case "Paint":
-                    # Calculate the total amount of each paint used
-                    # This is stored in a dict = {Paint : Total cost}
-                    total_paint = {}
-        
-                    # Get the paint used in each room and add it
-                    for wall in room.get_walls():  
-                        keys = total_paint.keys()
-                        if wall.get_paint() in keys:
-                            total_paint[wall.get_paint()] += wall.required_buckets()
-                        else: 
-                            total_paint[wall.get_paint()] = wall.required_buckets()
-
-                    
-                    # Create a layout to display each used paint and the amount required
-                    temp_layout = [[sg.Text("Total of each paint used can be found below. Along with a margin of error of 10 percent")]]
-                    for key, value in total_paint.items():
-                        margin_error = value / 10.0
-                        temp_layout.append([sg.Text("Total %s: %.0f buckets (± %.2f buckets)" % (key.name.title(), value, margin_error))])
-                    temp_layout.append( [sg.Button("OK")])
-
-                    # Create popup window to display information
-                    temp_window = sg.Window("Total Paint", temp_layout, icon=icon_logo)
-                    
-                    # Keep window open until valid input is given
-                    while True:
-                        event, values = temp_window.read()
-                        match event:
-                            case None | "OK":
-                                temp_window.close()
-                                break
-                            case _: 
-                                temp_window.close()
-                                break
-                case None | "CLOSE":
-                    window.close()
-                    break
-                case _: 
-                    window.close()
-                    break
-                   
-    def __get_rooms(self): 
-        '''Get the number of rooms which are being painted
-        '''
-        layout = [[sg.Text('Please enter the number of rooms you wish to paint in the box below:')], [sg.Multiline(size=(30,1), key='textbox')], [sg.Button("CONFIRM")], [sg.Button("CLOSE")]] 
-        window = sg.Window("Paint Calculator", layout, icon=icon_logo)
-        
-        # Keep window open until valid input is given
-        while True:
-            event, values = window.read()
-            match event:
-                case "CONFIRM":
-                    window.Disable()
-                    num_of_rooms = get_int_input(values['textbox'], False)
-                    rooms = [] 
-                    for i in range(0, num_of_rooms):
-                        rooms.append(Room())
-                    window.close()
-                    return rooms
-                case None | "CLOSE":
-                    sys.exit()
-                case _: 
-                    pass
+                case "Cost" | "Paint":
+                    # Display the cost or paint of this room in a popout window
+                    self.__show_quote(event, room)
+                case _:
+                    self.__close(window)
         
+        self.__open(window, handle)
+
+def cost_layout(quote):
+    '''Returns the layout of a window showing the cost from quote_group(), along with the range it is likely to fall within. 
+    '''
+    low, middle, high = quote["ranges"]["total_cost"]
+    return [
+        [sg.Text("Total Cost: £%.2f" % quote["cost"])], 
+        [sg.Text("90 percent likely to be between £%.2f and £%.2f, allowing for errors in measuring and paint coverage" % (low, high))], 
+        [sg.Button("OK")]
+    ]
+
+def paint_layout(quote):
+    '''Returns the layout of a window listing the buckets and cost of each paint from quote_group(), along with the range the buckets are likely to fall within. 
+    '''
+    ranges = quote["ranges"]["paint"]
+    layout = [[sg.Text("Total of each paint used can be found below. Along with the range it is 90 percent likely to fall within, allowing for errors in measuring and paint coverage")]]
+    for key, value in quote["paint"].items():
+        low, middle, high = ranges[core.paint_key(key)]["buckets"]
+        layout.append([sg.Text("Total %s: %.0f buckets, £%.2f (%d to %d buckets)" % (key.name.title(), value, quote["paint_cost"][key], low, high))])
+    layout.append([sg.Button("OK")])
+    
+    return layout
+
+def place_rooms(project, rooms, locations):
+    '''Moves each room with a building or floor into that floor of the project, creating buildings and floors as they are first named. 
+    Rooms without either are left directly within the project. 
+    '''
+    for room, (building_name, floor_name) in zip(rooms, locations):
+        if not building_name and not floor_name:
+            continue
+        
+        building_name = building_name or "default building"
+        floor_name = floor_name or "default floor"
+        building = next((building for building in project.get_buildings() if building.get_name() == building_name), None)
+        if building is None:
+            building = core.Building(building_name)
+            project.add_building(building)
+        floor = next((floor for floor in building.get_floors() if floor.get_name() == floor_name), None)
+        if floor is None:
+            floor = core.Floor(floor_name)
+            building.add_floor(floor)
+        
+        project.remove_room(room)
+        floor.add_room(room)
+
 #########################################################################################
-############################## Input Validation #########################################
+############################### Background Tasks ########################################
 #########################################################################################
 
-def get_float_input(usr_input, allow_zero):
-    """ Returns a provided string input as a float. 
-    When called, you can specify if you want the a valid input to be non-zero, or if zero can be included. 
-    """
+# The number of steps of each progress bar
+PROGRESS_STEPS = 100
+
+class Cancelled(Exception):
+    '''Raised within a BackgroundTask once it has been cancelled. 
+    '''
+
+class BackgroundTask():
+    '''Runs a function on a worker thread, so that the window which started it keeps responding. 
+    The function is called with the arguments given and progress, a function it should call with the fraction of its work done so far. 
+    Progress is sent to the window as a "progress" event, whose value is the number of PROGRESS_STEPS done, but only when it changes. 
+    Once the function finishes, a "done" event is sent, whose value is its result or the exception it raised. 
+    Cancelling a task stops it the next time it reports its progress, by raising Cancelled. 
+    '''
+    def __init__(self, window, function, *args):
+        self.__window = window
+        self.__function = function
+        self.__args = args
+        self.__steps = None
+        self.__cancelled = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
     
-    # Temporary assignment of values
-    user_input = ""
-    valid_input = False
+    def start(self):
+        self.__thread.start()
+        return self
     
-     # Loops until a valid input is given
-    while True:
-        # Attempt casting of string into float
-        try:
-            user_input = float(usr_input)
-            valid_input = True
-        except ValueError:
-            valid_input = False
-
-        # If the input is invalid, or if it's valid but less than 0, then:
-        if not valid_input or user_input < 0 or user_input == 0:
-            if allow_zero and user_input == 0:
-                return user_input
-            
-            text = "'Error: Please enter a positive"
-             # Alter string if zero is not allowed as a valid input
-            if not allow_zero:
-                text += ", non zero,"
-            text += " number: "
-            
-            # Create new window asking for corrected input
-            layout = [[sg.Text(text)], [sg.Multiline(size=(30,1), key='textbox')], [sg.Button("CONFIRM")], [sg.Button("CLOSE")]]
-            window = sg.Window("Error! Invalid Input", layout, icon=icon_logo) 
-        elif valid_input:
-             # Temporary window is created so that any actual window can be closed before method exits. 
-            window = sg.Window("Paint Calculator") 
-            window.close()
-            return user_input
-
-        window.refresh()
-        while True:
-          event, values = window.read()
-          if event == "CONFIRM":
-               # Get user input
-              usr_input = values['textbox']
-              window.close()
-              break
-          elif event == "CLOSE":
-              sys.exit()
+    def cancel(self):
+        self.__cancelled.set()
     
-def get_int_input(usr_input, allow_zero):
-    """ Returns a provided string input as an integer. 
-    When called, you can specify if you want the a valid input to be non-zero, or if zero can be included. 
-    """
+    def is_cancelled(self):
+        return self.__cancelled.is_set()
     
-    # Temporary assignment of values
-    user_input = ""
-    valid_input = False
+    def join(self, timeout=None):
+        self.__thread.join(timeout)
     
-    # Loops until a valid input is given
-    while True:
-        # Attempt casting of string into int 
+    def progress(self, fraction):
+        if self.__cancelled.is_set():
+            raise Cancelled()
+        
+        # Only whole steps are sent, so a task which reports often does not flood the window with events
+        steps = min(PROGRESS_STEPS, max(0, int(fraction * PROGRESS_STEPS)))
+        if steps != self.__steps:
+            self.__steps = steps
+            self.__window.write_event_value("progress", steps)
+    
+    def __run(self):
         try:
-            user_input = int(usr_input)
-            valid_input = True
-        except ValueError:
-            valid_input = False
-
-        # If the input is invalid, or if it's valid but less than 0, then:
-        if not valid_input or user_input < 0 or user_input == 0 :
-            if allow_zero and user_input == 0:
-                return user_input
-            
-            text = "'Error: Please enter a positive"
-            # Alter string if zero is not allowed as a valid input
-            if not allow_zero:
-                text += ", non zero,"
-            text += " whole number: "
-            
-            # Create new window asking for corrected input
-            layout = [[sg.Text(text)], [sg.Multiline(size=(30,1), key='textbox')], [sg.Button("CONFIRM")], [sg.Button("CLOSE")]]
-            window = sg.Window("Error! Invalid Input", layout, icon=icon_logo) 
-        elif valid_input:
-            # Temporary window is created so that any actual window can be closed before method exits. 
-            window = sg.Window("Paint Calculator") 
-            window.close()
-            return user_input
-
-        window.refresh()
-        while True:
-          event, values = window.read()
-          if event == "CONFIRM":
-              # Get user input
-              usr_input = values['textbox']
-              window.close()
-              break
-          elif event == "CLOSE":
-              sys.exit()
+            with span("gui.task"):
+                result = self.__function(*self.__args, progress=self.progress)
+        except Exception as error:
+            result = error
+        
+        # A task cancelled after it last reported its progress is still treated as cancelled
+        if self.__cancelled.is_set() and not isinstance(result, Exception):
+            result = Cancelled()
+        self.__window.write_event_value("done", result)
+
+def quote_group(group, cache, progress):
+    '''Returns the cost and buckets of each paint of a Project(), Building(), Floor() or Room(), along with the range each is likely to fall within. 
+    The range comes from a Monte Carlo simulation of errors in measuring and in the coverage of each paint (see paint_calc_uncertainty). 
+    The trials of each room are kept in the RoomCache() given, so only rooms which have changed since they were last quoted are run again. 
+    '''
+    import paint_calc_uncertainty
+    with span("gui.simulate"):
+        ranges = paint_calc_uncertainty.simulate(group, progress=progress, cache=cache)
+    
+    return {"cost": group.get_cost(), "paint": group.get_paint(), "paint_cost": group.get_paint_costs(), "ranges": ranges}
+
+def open_project(path, progress):
+    '''Opens a project file, and returns it as a Project(), along with its buildings and floors. 
+    '''
+    import paint_calc_file
+    with paint_calc_file.ProjectFile(path) as project_file:
+        return project_file.to_project(progress)
+
+def save_project(path, project, progress):
+    '''Saves a project as a project file. 
+    '''
+    import paint_calc_file
+    paint_calc_file.save_project(path, project)
+
+def export_report(path, project, progress):
+    '''Writes a report on a project, as CSV, JSON or HTML depending on the extension of the path (see paint_calc_report). 
+    '''
+    import paint_calc_report
+    paint_calc_report.export(path, project, progress=progress)
 
 if __name__ == '__main__':
     # All of the program is run through the Calculator class
@@ -0,0 +1,162 @@
+"""Parallel estimation of large portfolios.
+A portfolio is split into shards of rooms, and each shard is totalled in its own process.
+The Subtotal() of every room is then merged, which gives exactly the same totals as totalling every wall on one core.
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+
+import paint_calc_core as core
+from paint_calc_profile import count, timed
+
+#########################################################################################
+################################ Estimation #############################################
+#########################################################################################
+
+@timed("parallel.estimate")
+def parallel_estimate(portfolio, workers=None, chunk_size=None):
+    '''Produces a quote for a portfolio using a pool of processes.
+    The portfolio can be a project document, a list of project documents (one per building), or a list of Room() objects.
+    If workers is 1, then every shard is totalled in this process instead.
+    The result matches core.estimate(), with the total area of each room, building, floor and of the portfolio added.
+    '''
+    rooms = portfolio_rooms(portfolio)
+    buildings = portfolio_buildings(portfolio)
+    workers = workers or os.cpu_count() or 1
+
+    # Several shards are given to each worker, so one slow shard does not hold up the others
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(rooms) / (workers * 4)))
+    shards = [rooms[index:index + chunk_size] for index in range(0, len(rooms), chunk_size)]
+
+    if workers == 1 or len(shards) <= 1:
+        return merge_shards(map(estimate_shard, shards), buildings)
+
+    # Room() objects are linked to their walls, their project and the groups above them, so only their details are sent to each worker
+    shards = [[detach_room(room) for room in shard] for shard in shards]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return merge_shards(executor.map(estimate_shard, shards), buildings)
+
+def portfolio_rooms(portfolio):
+    '''Flattens a portfolio into a single list of rooms.
+    Each room is either a Room() object or a room dict from a project document.
+    The rooms within the "buildings" of a document follow the rooms of that document, in the same order as core.load_buildings() builds them. 
+    '''
+    rooms = []
+    for item in _portfolio_items(portfolio):
+        if _is_document(item):
+            rooms.extend(item.get("rooms", []))
+            for building in item.get("buildings", []):
+                for floor in building.get("floors", []):
+                    rooms.extend(floor.get("rooms", []))
+        else:
+            rooms.append(item)
+
+    return rooms
+
+def portfolio_buildings(portfolio):
+    '''Returns the buildings within the documents of a portfolio, as a list of (building name, floors).
+    Each floor is (floor name, first room, last room), where the rooms are indices into portfolio_rooms(). 
+    '''
+    buildings = []
+    position = 0
+    for item in _portfolio_items(portfolio):
+        if not _is_document(item):
+            position += 1
+            continue
+        position += len(item.get("rooms", []))
+        for building in item.get("buildings", []):
+            floors = []
+            for floor in building.get("floors", []):
+                num_of_rooms = len(floor.get("rooms", []))
+                floors.append((floor.get("name", "default floor"), position, position + num_of_rooms))
+                position += num_of_rooms
+            buildings.append((building.get("name", "default building"), floors))
+
+    return buildings
+
+def _portfolio_items(portfolio):
+    # A single document, or a list of documents, room dicts and Room() objects
+    if isinstance(portfolio, dict):
+        return [portfolio]
+    return portfolio
+
+def _is_document(item):
+    return isinstance(item, dict) and ("rooms" in item or "buildings" in item)
+
+def detach_room(room):
+    '''Returns the details of a Room() as plain values, which can be sent to another process without anything the room is linked to. 
+    The result is (name, walls), where each wall is (shape code, dimensions, paint, coats, obstacles) and each obstacle is (shape code, dimensions, position). 
+    Shapes are sent by their code, as they hold the functions for their area and cannot be pickled. Room dicts are returned as they are. 
+    '''
+    if isinstance(room, dict):
+        return room
+
+    walls = [(wall.get_shape().code(), wall.get_dimensions(), wall.get_paint(), wall.get_coats(),
+              [(obstacle.get_shape().code(), obstacle.get_dimensions(), obstacle.get_position()) for obstacle in wall.get_obstacles()])
+             for wall in room.get_walls()]
+    return room.get_name(), walls
+
+@timed("parallel.shard")
+def estimate_shard(rooms):
+    '''Totals every room in a shard. This is what runs within each worker.
+    Each room is a Room(), a room dict from a project document, or the details of a room from detach_room(). 
+    Returns a list of (room name, Subtotal) pairs in the same order as the rooms.
+    '''
+    results = []
+    for room in rooms:
+        if isinstance(room, dict):
+            room = core.load_project({"rooms": [room]})[0]
+        elif isinstance(room, tuple):
+            name, walls = room
+            room = core.Room(name, [core.Wall(core.Shape.from_code(shape), dimensions, paint, coats,
+                                              [core.Obstacle(core.Shape.from_code(code), *details) for code, *details in obstacles])
+                                    for shape, dimensions, paint, coats, obstacles in walls])
+        results.append((room.get_name(), room.get_subtotal()))
+
+    return results
+
+@timed("parallel.merge")
+def merge_shards(results, buildings=()):
+    '''Merges the room subtotals of every shard into the totals of the whole portfolio.
+    Buildings are given as by portfolio_buildings(), and the totals of each building and floor are included if there are any.
+    '''
+    total = core.Subtotal()
+    rooms = []
+    subtotals = []
+    for shard in results:
+        for name, subtotal in shard:
+            total.merge(subtotal)
+            subtotals.append(subtotal)
+            rooms.append(dict(name=name, **_totals(subtotal)))
+
+    result = {
+        "total_cost": total.get_cost(),
+        "total_area": total.get_area(),
+        "total_paint": _paint_names(total),
+        "rooms": rooms
+    }
+    if buildings:
+        result["buildings"] = []
+    for name, floors in buildings:
+        building = core.Subtotal()
+        floor_totals = []
+        for floor_name, first_room, last_room in floors:
+            floor = core.Subtotal()
+            for subtotal in subtotals[first_room:last_room]:
+                floor.merge(subtotal)
+            building.merge(floor)
+            floor_totals.append(dict(name=floor_name, **_totals(floor)))
+        result["buildings"].append(dict(name=name, **_totals(building), floors=floor_totals))
+
+    return result
+
+def _totals(subtotal):
+    return {"cost": subtotal.get_cost(), "area": subtotal.get_area(), "paint": _paint_names(subtotal)}
+
+def _paint_names(subtotal):
+    return {core.paint_key(paint): buckets for paint, buckets in subtotal.get_paint().items()}
@@ -0,0 +1,166 @@
+"""Opt-in timing of each stage of a quote.
+Named spans record how many times a stage ran, and its total and longest time. Counters record amounts, such as the number of walls processed.
+
+Instrumentation is switched on with environment variables, which must be set before the program starts:
+    PAINT_CALC_PROFILE=summary.json    Write a JSON summary of every span and counter when the program exits
+    PAINT_CALC_TRACE=trace.json        Also write every span as a trace file, which can be opened as a flame graph in chrome://tracing or speedscope
+
+When both are unset, timed() returns the original function and span() returns a shared object which does nothing, so there is next to no overhead.
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+_summary_path = os.environ.get("PAINT_CALC_PROFILE")
+_trace_path = os.environ.get("PAINT_CALC_TRACE")
+_enabled = bool(_summary_path or _trace_path)
+
+# Traces keep every span, so they are capped to stop a long run using up all memory
+MAX_TRACE_EVENTS = 1000000
+
+_lock = threading.Lock()
+_spans = {}
+_counters = {}
+_events = []
+
+#########################################################################################
+################################### Recording ###########################################
+#########################################################################################
+
+class _Span():
+    '''Times the code within a with block.
+    '''
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+class _NoSpan():
+    '''Used in place of a span when instrumentation is switched off.
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def is_enabled():
+    return _enabled
+
+def span(name):
+    '''Returns a context manager which times the code within it under the given name.
+    '''
+    return _Span(name) if _enabled else _NO_SPAN
+
+def timed(name):
+    '''Decorator which times every call of a function under the given name.
+    '''
+    def decorator(func):
+        if not _enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(name, start, time.perf_counter_ns())
+        return wrapper
+    return decorator
+
+def count(name, amount=1):
+    '''Adds an amount to a named counter.
+    '''
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+def _record(name, start, end):
+    duration = end - start
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            _spans[name] = [1, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            if duration > stats[2]:
+                stats[2] = duration
+
+        if _trace_path and len(_events) < MAX_TRACE_EVENTS:
+            _events.append((name, start, duration, threading.get_ident()))
+
+#########################################################################################
+#################################### Output #############################################
+#########################################################################################
+
+def enable(summary_path=None, trace_path=None):
+    '''Switches instrumentation on from within the program.
+    Only spans, counters and functions decorated after this point are recorded, so the environment variables are preferred.
+    '''
+    global _enabled, _summary_path, _trace_path
+    _enabled = True
+    _summary_path = summary_path or _summary_path
+    _trace_path = trace_path or _trace_path
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        del _events[:]
+
+def summary():
+    '''Returns the recorded spans and counters as a dict. Times are in seconds.
+    '''
+    with _lock:
+        spans = {}
+        for name, (calls, total, longest) in sorted(_spans.items()):
+            spans[name] = {
+                "calls": calls,
+                "total": total / 1e9,
+                "mean": total / calls / 1e9,
+                "max": longest / 1e9
+            }
+        return {"spans": spans, "counters": dict(_counters)}
+
+def write_summary(path):
+    with open(path, "w") as file:
+        json.dump(summary(), file, indent=2)
+
+def write_trace(path):
+    '''Writes every recorded span in the Trace Event format, as complete ("X") events with times in microseconds.
+    '''
+    pid = os.getpid()
+    with _lock:
+        events = [{"name": name, "ph": "X", "ts": start / 1000, "dur": duration / 1000, "pid": pid, "tid": tid}
+                  for name, start, duration, tid in _events]
+    with open(path, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+def _write_at_exit():
+    if _summary_path:
+        write_summary(_summary_path)
+    if _trace_path:
+        write_trace(_trace_path)
+
+atexit.register(_write_at_exit)
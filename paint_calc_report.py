@@ -0,0 +1,384 @@
+"""Exporting a full breakdown of a project as a report: the totals, then each paint, each room and each wall.
+Reports can be written as CSV, JSON or a self-contained HTML page. Rows are streamed out in chunks of CHUNK_SIZE, so only one chunk of walls is held
+in memory at a time, however large the project.
+
+A report can be made from a Project(), Building(), Floor() or Room(), in which case the totals of each paint and room are read from their
+running totals, the same ones used by the screens of the calculator. A WallTable() can be reported on as well, for very large numbers of walls;
+its totals are worked out in a handful of vectorised passes when NumPy is installed, and walls in a table have no shape.
+
+Every row of a report is one of four levels, with the fields given in LEVEL_FIELDS:
+- total: The area and cost of the whole project
+- paint: The area, litres, buckets and cost of each paint over the whole project
+- room: The area, litres, buckets and cost of each paint used in each room
+- wall: Every wall, numbered from 1 within its room
+
+Paints are referred to by core.paint_key(), as in core.estimate(), and every total is summed exactly, so it matches the running totals of the same walls.
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import argparse
+import csv
+import html
+import json
+import math
+import sys
+import time
+
+import paint_calc_core as core
+from paint_calc_core import np
+from paint_calc_profile import count, timed
+from paint_calc_table import WallTable, exact_sums
+
+# How many rows are written at a time
+CHUNK_SIZE = 4096
+
+FIELDS = ("level", "room", "wall", "shape", "paint", "coats", "area", "litres", "buckets", "cost")
+LEVEL_FIELDS = {
+    "total": ("area", "cost"),
+    "paint": ("paint", "area", "litres", "buckets", "cost"),
+    "room": ("room", "paint", "area", "litres", "buckets", "cost"),
+    "wall": FIELDS[1:]
+}
+FORMATS = ("csv", "json", "html")
+
+#########################################################################################
+################################## Sections #############################################
+#########################################################################################
+# Each yields (level, rows) in order of level, where rows is a list of tuples of the fields of that level.
+# A level can be split over many chunks.
+
+def sections(source, chunk_size=CHUNK_SIZE):
+    '''Returns the rows of a report on a Project(), Building(), Floor(), Room() or WallTable(), in chunks.
+    '''
+    if isinstance(source, WallTable):
+        return table_sections(source, chunk_size)
+    return group_sections(source, chunk_size)
+
+def group_sections(group, chunk_size=CHUNK_SIZE):
+    '''The rows of a report on a Project(), Building(), Floor() or Room().
+    The totals of each paint and room come from their running totals, so only the walls themselves are visited.
+    '''
+    rooms = _rooms(group)
+    yield "total", [(group.get_area(), group.get_cost())]
+    yield "paint", _paint_rows(group)
+
+    chunk = []
+    for room in rooms:
+        chunk.extend((room.get_name(),) + row for row in _paint_rows(room))
+        if len(chunk) >= chunk_size:
+            yield "room", chunk
+            chunk = []
+    if chunk:
+        yield "room", chunk
+
+    chunk = []
+    for room in rooms:
+        name = room.get_name()
+        for number, wall in enumerate(room.get_walls(), 1):
+            paint = wall.get_paint()
+            area = wall.area()
+            coats = wall.get_coats()
+            buckets = core.required_buckets(area, coats, paint)
+            chunk.append((name, number, wall.get_shape().name.lower(), core.paint_key(paint), coats, area, (area * coats) / paint(2), buckets, buckets * paint(0)))
+            if len(chunk) >= chunk_size:
+                yield "wall", chunk
+                chunk = []
+    if chunk:
+        yield "wall", chunk
+
+def _paint_rows(group):
+    areas = group.get_paint_areas()
+    litres = group.get_litres()
+    costs = group.get_paint_costs()
+    return [(core.paint_key(paint), areas[paint], litres[paint], buckets, costs[paint]) for paint, buckets in group.get_paint().items()]
+
+def table_sections(table, chunk_size=CHUNK_SIZE):
+    '''The rows of a report on a WallTable().
+    With NumPy, the totals are worked out for every wall at once, then the walls are worked out again and turned into rows one chunk at a time,
+    so only the columns of the table itself are held in full. Buckets and costs always match those of the equivalent Wall() objects.
+    '''
+    if np is None or len(table) == 0:
+        yield from _table_sections_walls(table, chunk_size)
+        return
+
+    paints = core.registered_paints()
+    num_of_paints = len(paints)
+    paint_names = [core.paint_key(paint) for paint in paints]
+    room_names = table.get_room_names()
+    areas, coats, paint_codes, rooms = table.columns()
+    values = np.array([(paint(0), paint(1), paint(2)) for paint in paints], dtype=np.float64).reshape(-1, 3)
+    litres, buckets, costs = _wall_columns(values, areas, coats, paint_codes)
+
+    yield "total", [(math.fsum(areas.tolist()), math.fsum(costs.tolist()))]
+
+    # Every wall is keyed by its paint, then by its room and paint, and the walls of each key are totalled together
+    used, totals = _key_totals(paint_codes, (areas, litres, buckets, costs))
+    yield "paint", [(paint_names[key],) + row for key, row in zip(used.tolist(), _rows(totals))]
+    used, totals = _key_totals(rooms.astype(np.int64) * num_of_paints + paint_codes, (areas, litres, buckets, costs))
+    del litres, buckets, costs
+    for start in range(0, len(used), chunk_size):
+        end = start + chunk_size
+        yield "room", [(room_names[key // num_of_paints], paint_names[key % num_of_paints]) + row
+                       for key, row in zip(used[start:end].tolist(), _rows(column[start:end] for column in totals))]
+
+    numbers = [0] * len(room_names)
+    for start in range(0, len(table), chunk_size):
+        end = start + chunk_size
+        chunk_areas = areas[start:end]
+        chunk = []
+        for room, paint, wall_coats, row in zip(rooms[start:end].tolist(), paint_codes[start:end].tolist(), coats[start:end].tolist(),
+                                                _rows((chunk_areas,) + _wall_columns(values, chunk_areas, coats[start:end], paint_codes[start:end]))):
+            numbers[room] += 1
+            chunk.append((room_names[room], numbers[room], "", paint_names[paint], wall_coats) + row)
+        yield "wall", chunk
+
+def _wall_columns(values, areas, coats, paint_codes):
+    '''Returns the litres, buckets and cost of every wall. values holds the price, litres per bucket and coverage of each paint code.
+    '''
+    prices, litres_per_bucket, coverage = (values[:, column].take(paint_codes) for column in range(3))
+
+    # The same steps as core.required_buckets(), applied to every wall at once
+    litres = (areas * coats) / coverage
+    buckets = np.ceil(litres / litres_per_bucket)
+    buckets[buckets == 0] = 1
+    return litres, buckets, buckets * prices
+
+def _key_totals(keys, columns):
+    '''Returns each key used, in order, along with the exact totals of each column over the walls of each key.
+    '''
+    used, inverse = np.unique(keys, return_inverse=True)
+    return used, [np.array(sums) for sums, total in exact_sums(inverse, len(used), *columns)]
+
+def _rows(columns):
+    # Turns columns of area, litres, buckets and cost into rows, with whole buckets
+    area, litres, buckets, cost = columns
+    return zip(area.tolist(), litres.tolist(), buckets.astype(np.int64).tolist(), cost.tolist())
+
+def _table_sections_walls(table, chunk_size):
+    '''The rows of a report on a WallTable(), one wall at a time. Used when NumPy is not installed.
+    '''
+    room_names = table.get_room_names()
+    # The partial sums of the area, litres and cost of each key, along with its buckets (see core._add_partial())
+    totals = {}
+    total_area = []
+    total_cost = []
+    for wall in table:
+        paint = wall.get_paint()
+        area, litres, buckets, cost = _wall_values(wall)
+        core._add_partial(total_area, area)
+        core._add_partial(total_cost, cost)
+        for key in (paint, (wall.get_room(), paint)):
+            partials = totals.setdefault(key, [[], [], 0, []])
+            core._add_partial(partials[0], area)
+            core._add_partial(partials[1], litres)
+            partials[2] += buckets
+            core._add_partial(partials[3], cost)
+    totals = {key: (math.fsum(areas), math.fsum(litres), buckets, math.fsum(costs)) for key, (areas, litres, buckets, costs) in totals.items()}
+
+    # Paints and rooms are put in the same order as with NumPy: by room, then by the code of each paint
+    paint_totals = [(key, values) for key, values in totals.items() if not isinstance(key, tuple)]
+    paint_totals = [(core.paint_key(paint), *values) for paint, values in sorted(paint_totals, key=lambda item: core.register_paint(item[0]))]
+    room_totals = sorted(((room, core.register_paint(paint)), values) for (room, paint), values in
+                         ((key, values) for key, values in totals.items() if isinstance(key, tuple)))
+    yield "total", [(math.fsum(total_area), math.fsum(total_cost))]
+    yield "paint", paint_totals
+    yield "room", [(room_names[room], core.paint_key(core.Paint.from_code(code)), *values) for (room, code), values in room_totals]
+
+    numbers = [0] * len(room_names)
+    chunk = []
+    for wall in table:
+        room = wall.get_room()
+        numbers[room] += 1
+        chunk.append((room_names[room], numbers[room], "", core.paint_key(wall.get_paint()), wall.get_coats()) + _wall_values(wall))
+        if len(chunk) >= chunk_size:
+            yield "wall", chunk
+            chunk = []
+    if chunk:
+        yield "wall", chunk
+
+def _wall_values(wall):
+    # The area, litres, buckets and cost of a wall
+    paint = wall.get_paint()
+    area = wall.area()
+    buckets = core.required_buckets(area, wall.get_coats(), paint)
+    return (area, (area * wall.get_coats()) / paint(2), buckets, buckets * paint(0))
+
+#########################################################################################
+################################### Writers #############################################
+#########################################################################################
+
+@timed("report.write_csv")
+def write_csv(stream, source, chunk_size=CHUNK_SIZE, progress=None):
+    '''Writes a report as CSV, with a row for every total, paint, room and wall. Fields which do not apply to a level are left blank.
+    '''
+    writer = csv.writer(stream)
+    writer.writerow(FIELDS)
+    for level, rows in _counted(source, chunk_size, progress):
+        if level == "wall":
+            # The fields of a wall are every field but the level, so each row only needs the level putting in front
+            writer.writerows(("wall",) + row for row in rows)
+            continue
+        positions = [FIELDS.index(field) for field in LEVEL_FIELDS[level]]
+        for row in rows:
+            line = [level] + [""] * (len(FIELDS) - 1)
+            for position, value in zip(positions, row):
+                line[position] = value
+            writer.writerow(line)
+
+@timed("report.write_json")
+def write_json(stream, source, chunk_size=CHUNK_SIZE, progress=None):
+    '''Writes a report as a JSON object of the form:
+    {"total": {"area": ..., "cost": ...}, "paints": [...], "rooms": [...], "walls": [...]}
+    where each list holds an object for each row, with the fields of its level.
+    '''
+    stream.write("{")
+    current = None
+    for level, rows in _counted(source, chunk_size, progress):
+        fields = LEVEL_FIELDS[level]
+        if level == "total":
+            stream.write('"total": %s' % json.dumps(dict(zip(fields, rows[0]))))
+            continue
+        if level != current:
+            stream.write('%s, "%ss": [' % ("\n]" if current else "", level))
+            current = level
+            separator = "\n"
+        if rows:
+            # Encoding a whole chunk at once is much faster than encoding each row on its own, so each chunk of rows is written on one line
+            stream.write(separator + json.dumps([dict(zip(fields, row)) for row in rows])[1:-1])
+            separator = ",\n"
+
+    stream.write("\n]}\n")
+
+@timed("report.write_html")
+def write_html(stream, source, chunk_size=CHUNK_SIZE, progress=None, title="Paint Report"):
+    '''Writes a report as a single HTML page with a table for each level. The page has no scripts or links to other files, so it can be sent on its own.
+    '''
+    stream.write(HTML_HEADER % {"title": html.escape(title)})
+    current = None
+    for level, rows in _counted(source, chunk_size, progress):
+        fields = LEVEL_FIELDS[level]
+        if level != current:
+            if current:
+                stream.write("</table>\n")
+            stream.write("<h2>%s</h2>\n<table>\n<tr>%s</tr>\n" % (HTML_TITLES[level], "".join("<th>%s</th>" % field.title() for field in fields)))
+            # Each level has a template for its rows, so only the text fields need to be looked at one at a time
+            template = "<tr>%s</tr>\n" % "".join("<td>%s</td>" % HTML_FORMATS[field] for field in fields)
+            text = [index for index, field in enumerate(fields) if HTML_FORMATS[field] == "%s"]
+            current = level
+        stream.write("".join(template % _escape(row, text) for row in rows))
+
+    if current:
+        stream.write("</table>\n")
+    stream.write("</body>\n</html>\n")
+
+HTML_TITLES = {"total": "Total", "paint": "Paints", "room": "Rooms", "wall": "Walls"}
+
+HTML_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>%(title)s</title>
+<style>
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin-bottom: 2em; }
+th, td { border: 1px solid #ccc; padding: 0.25em 0.75em; }
+th { background: #eee; text-align: left; }
+td { text-align: right; }
+td:first-child { text-align: left; }
+</style>
+</head>
+<body>
+<h1>%(title)s</h1>
+"""
+
+HTML_FORMATS = {"room": "%s", "wall": "%d", "shape": "%s", "paint": "%s", "coats": "%d", "area": "%.2f", "litres": "%.2f", "buckets": "%d", "cost": "%.2f"}
+
+def _escape(row, text):
+    row = list(row)
+    for index in text:
+        row[index] = html.escape(row[index])
+    return tuple(row)
+
+def _counted(source, chunk_size, progress):
+    '''Passes on the rows of a report, calling progress with the fraction of walls written after each chunk of walls.
+    '''
+    walls = len(source) if isinstance(source, WallTable) else sum(len(room.get_walls()) for room in _rooms(source))
+    written = 0
+    # Every level is passed on, even if it has no rows, so that each writer always writes a table or list for it
+    pending = list(LEVEL_FIELDS)
+    for level, rows in sections(source, chunk_size):
+        while level in pending:
+            skipped = pending.pop(0)
+            if skipped != level:
+                yield skipped, []
+        yield level, rows
+        if level == "wall":
+            written += len(rows)
+            if progress is not None:
+                progress(written / walls)
+    for level in pending:
+        yield level, []
+    count("report.walls", written)
+
+def _rooms(group):
+    return group.get_rooms() if isinstance(group, core.Group) else [group]
+
+WRITERS = {"csv": write_csv, "json": write_json, "html": write_html}
+
+def export(path, source, file_format=None, progress=None):
+    '''Writes a report on a Project(), Building(), Floor(), Room() or WallTable() to a file. The format is guessed from the extension if it is not given.
+    '''
+    if file_format is None:
+        file_format = guess_format(path)
+    with open(path, "w", newline="" if file_format == "csv" else None, encoding="utf-8") as stream:
+        WRITERS[file_format](stream, source, progress=progress)
+
+def guess_format(path):
+    '''Returns the format of a report from the extension of its path. Anything other than .json or .html (or .htm) is written as CSV.
+    '''
+    path = path.lower()
+    if path.endswith(".json"):
+        return "json"
+    if path.endswith((".html", ".htm")):
+        return "html"
+    return "csv"
+
+#########################################################################################
+##################################### Main ##############################################
+#########################################################################################
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Write a report on a project document or project file, with the totals of every paint, room and wall.")
+    parser.add_argument("project", help="JSON project document, or project file.")
+    parser.add_argument("report", help="File to write the report to. Writes to stdout if '-'.")
+    parser.add_argument("--format", choices=FORMATS, help="Format of the report. Guessed from the extension of the report, or csv for stdout.")
+    args = parser.parse_args(args)
+
+    import paint_calc_file
+    file_format = args.format or ("csv" if args.report == "-" else guess_format(args.report))
+    start = time.perf_counter()
+    try:
+        if args.project.lower().endswith(paint_calc_file.EXTENSION):
+            # Project files are reported on as a table, so no Room() or Wall() objects are built
+            with paint_calc_file.ProjectFile(args.project) as project_file:
+                source = project_file.to_table()
+        else:
+            with open(args.project) as file:
+                document = json.load(file)
+            source = core.Project(core.load_project(document), core.load_buildings(document))
+
+        if args.report == "-":
+            WRITERS[file_format](sys.stdout, source)
+        else:
+            export(args.report, source, file_format)
+    except (OSError, ValueError) as error:
+        print("Error: %s" % error, file=sys.stderr)
+        return 1
+
+    print("Wrote the report in %.2fs" % (time.perf_counter() - start), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,258 @@
+"""Generating whole rooms from the outline of their floor.
+Rather than entering every wall, a room can be given as the outline of its floor and the height of its ceiling. A wall is generated for every edge
+of the outline, along with the ceiling if it is being painted, and standard doors and windows are put on the longest walls.
+
+A room plan can take the place of the "walls" of a room in a project document (see core.load_project()):
+{"rooms": [{"name": "Lounge", "floor": [5, 4], "height": 2.4, "paint": "white", "coats": 2, "ceiling": true, "doors": 1, "windows": 2}]}
+where "floor" is the length and width of a rectangular room, or "outline" is a list of the [x, y] corners of a room of any other shape.
+"ceiling" is either true, to paint the ceiling the same as the walls, or the name of the paint used on it.
+
+Plans can be turned into Room() objects, or for very large numbers of rooms, every wall of every plan can be added to a WallTable() at once.
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import math
+
+import paint_calc_core as core
+from paint_calc_core import Paint, Shape, np
+from paint_calc_profile import count, timed
+from paint_calc_table import WallTable
+
+# Standard obstacles, as (shape, dimensions) in metres: an internal door of 762mm by 1981mm, and a window of 1200mm by 1050mm
+DOOR = (Shape.RECTANGLE, (0.762, 1.981))
+WINDOW = (Shape.RECTANGLE, (1.2, 1.05))
+
+DEFAULT_HEIGHT = 2.4
+
+#########################################################################################
+################################### Classes #############################################
+#########################################################################################
+
+class RoomPlan():
+    '''A room defined by the outline of its floor, as a list of (x, y) corners going around the room, and the height of its ceiling.
+    Every edge of the outline is a rectangular wall as tall as the room. The ceiling is only painted if it is given a paint.
+    Doors and windows are put on the longest walls first: the kth obstacle, counting doors then windows, goes on the kth longest wall,
+    going round the walls again if there are more obstacles than walls.
+    '''
+    def __init__(self, name="default room", outline=(), height=DEFAULT_HEIGHT, paint=Paint.WHITE, coats=1, ceiling=None, doors=0, windows=0,
+                 door=DOOR, window=WINDOW):
+        self.__name = name
+        self.__outline = tuple((float(x), float(y)) for x, y in outline)
+        self.__height = float(height)
+        self.__paint = paint
+        self.__coats = coats
+        self.__ceiling = ceiling
+        self.__doors = doors
+        self.__windows = windows
+        self.__door = door
+        self.__window = window
+        self.__floor = None
+
+        if len(self.__outline) < 3:
+            raise ValueError("An outline needs at least 3 corners, got %d" % len(self.__outline))
+        if not all(math.isfinite(value) for corner in self.__outline for value in corner):
+            raise ValueError("Corners must be finite numbers: %r" % (self.__outline,))
+        if any(first == second for first, second in zip(self.__outline, self.__outline[1:] + self.__outline[:1])):
+            raise ValueError("An outline cannot have the same corner twice in a row: %r" % (self.__outline,))
+        if not (math.isfinite(self.__height) and self.__height > 0):
+            raise ValueError("The height of a room must be a positive number: %r" % height)
+
+    @classmethod
+    def rectangle(self, name, length, width, **options):
+        '''Returns the plan of a rectangular room. Its ceiling is a rectangle rather than a polygon, so it can be saved to a project file.
+        '''
+        plan = RoomPlan(name, [(0, 0), (length, 0), (length, width), (0, width)], **options)
+        plan.__floor = (float(length), float(width))
+        return plan
+
+    def get_name(self):
+        return self.__name
+
+    def get_outline(self):
+        return self.__outline
+
+    def get_floor(self):
+        '''Returns the (length, width) of a rectangular room, or None if it was given as an outline.
+        '''
+        return self.__floor
+
+    def get_height(self):
+        return self.__height
+
+    def get_paint(self):
+        return self.__paint
+
+    def get_coats(self):
+        return self.__coats
+
+    def get_ceiling(self):
+        '''Returns the paint used on the ceiling, or None if the ceiling is not painted.
+        '''
+        return self.__ceiling
+
+    def get_doors(self):
+        return self.__doors
+
+    def get_windows(self):
+        return self.__windows
+
+    def get_door(self):
+        return self.__door
+
+    def get_window(self):
+        return self.__window
+
+    def get_obstacles(self):
+        '''Returns the (shape, dimensions) of every door, then every window.
+        '''
+        return [self.__door] * self.__doors + [self.__window] * self.__windows
+
+    def wall_lengths(self):
+        '''Returns the length of every edge of the outline, in order. The last edge goes from the last corner back to the first.
+        '''
+        # Worked out the same way as generate_table(), so the areas are identical
+        return [math.sqrt((x2 - x1) * (x2 - x1) + (y2 - y1) * (y2 - y1)) for (x1, y1), (x2, y2) in zip(self.__outline, self.__outline[1:] + self.__outline[:1])]
+
+    def walls(self):
+        '''Generates a Wall() for every edge of the outline, with its doors and windows, followed by the ceiling if it is painted.
+        '''
+        lengths = self.wall_lengths()
+        longest = sorted(range(len(lengths)), key=lambda index: -lengths[index])
+        obstacles = [[] for length in lengths]
+        for index, obstacle in enumerate(self.get_obstacles()):
+            obstacles[longest[index % len(lengths)]].append(core.Obstacle(*obstacle))
+
+        walls = [core.Wall(Shape.RECTANGLE, (length, self.__height), self.__paint, self.__coats, wall_obstacles)
+                 for length, wall_obstacles in zip(lengths, obstacles)]
+        if self.__ceiling is not None:
+            walls.append(core.Wall(*self.__ceiling_shape(), self.__ceiling, self.__coats))
+
+        return walls
+
+    def to_room(self):
+        '''Returns the plan as a Room().
+        '''
+        return core.Room(self.__name, self.walls())
+
+    def __ceiling_shape(self):
+        if self.__floor is not None:
+            return Shape.RECTANGLE, self.__floor
+        return Shape.POLYGON, tuple(value for corner in self.__outline for value in corner)
+
+#########################################################################################
+################################## Generation ###########################################
+#########################################################################################
+
+@timed("rooms.generate_rooms")
+def generate_rooms(plans):
+    '''Returns a Room() for every plan.
+    '''
+    count("rooms.plans", len(plans))
+    return [plan.to_room() for plan in plans]
+
+@timed("rooms.generate_table")
+def generate_table(plans, table=None):
+    '''Adds a room for every plan to a WallTable(), which is created if one is not given, and returns the table.
+    With NumPy, every wall, obstacle and ceiling of every plan is generated at once, without building any Wall() objects.
+    The areas are worked out in the same way as those of RoomPlan.walls(), so the table totals exactly the same as the equivalent rooms.
+    '''
+    if table is None:
+        table = WallTable()
+    count("rooms.plans", len(plans))
+    if np is None or not plans:
+        for plan in plans:
+            room_index = table.add_room(plan.get_name())
+            for wall in plan.walls():
+                table.add_wall(room_index, wall)
+        return table
+
+    room_indexes = np.array([table.add_room(plan.get_name()) for plan in plans], dtype=np.int64)
+    offsets, coordinates = core.pack_polygons(tuple(value for corner in plan.get_outline() for value in corner) for plan in plans)
+    offsets = np.frombuffer(offsets, dtype=np.uint64).astype(np.int64)
+    starts = offsets[:-1]
+    counts = np.diff(offsets)
+    plan_indexes = np.repeat(np.arange(len(plans)), counts)
+
+    # Every edge of every outline, where the edge from the last corner of each goes back to its first
+    vertices = np.frombuffer(coordinates, dtype=np.float64).reshape(-1, 2)
+    following = np.arange(1, len(vertices) + 1)
+    following[offsets[1:] - 1] = starts
+    dx = vertices[following, 0] - vertices[:, 0]
+    dy = vertices[following, 1] - vertices[:, 1]
+    lengths = np.sqrt(dx * dx + dy * dy)
+
+    heights = np.array([plan.get_height() for plan in plans], dtype=np.float64)
+    paints = np.array([core.register_paint(plan.get_paint()) for plan in plans], dtype=np.int64)
+    coats = np.array([plan.get_coats() for plan in plans], dtype=np.int64)
+
+    # The kth obstacle of each plan goes on its kth longest wall. Sorting by plan, then longest first, puts the walls of each plan in that order
+    longest = np.lexsort((-lengths, plan_indexes))
+    doors = np.array([plan.get_doors() for plan in plans], dtype=np.int64)
+    obstacles_per_plan = doors + np.array([plan.get_windows() for plan in plans], dtype=np.int64)
+    obstacle_plans = np.repeat(np.arange(len(plans)), obstacles_per_plan)
+    k = np.arange(len(obstacle_plans)) - np.repeat(np.cumsum(obstacles_per_plan) - obstacles_per_plan, obstacles_per_plan)
+    walls = longest[starts[obstacle_plans] + k % counts[obstacle_plans]]
+    # Most plans share the standard doors and windows, so each kind of obstacle is only measured once
+    kinds = {obstacle: core.Obstacle(*obstacle)._area() for plan in plans for obstacle in (plan.get_door(), plan.get_window())}
+    door_areas = np.array([kinds[plan.get_door()] for plan in plans], dtype=np.float64)
+    window_areas = np.array([kinds[plan.get_window()] for plan in plans], dtype=np.float64)
+    obstacle_areas = np.where(k < doors[obstacle_plans], door_areas[obstacle_plans], window_areas[obstacle_plans])
+
+    # A stable sort keeps the obstacles of each wall in order, so they are taken away in the same order as Wall.area()
+    by_wall = np.argsort(walls, kind="stable")
+    table.extend(room_indexes[plan_indexes], lengths * heights[plan_indexes], paints[plan_indexes], coats[plan_indexes],
+                 np.bincount(walls, minlength=len(lengths)), obstacle_areas[by_wall])
+
+    # Ceilings are the area of each floor
+    ceilings = np.array([plan.get_ceiling() is not None for plan in plans])
+    if ceilings.any():
+        floors = np.array([plan.get_floor() or (0, 0) for plan in plans], dtype=np.float64)
+        areas = np.where(np.array([plan.get_floor() is not None for plan in plans]), floors[:, 0] * floors[:, 1], core.polygon_areas(offsets, coordinates))
+        ceiling_paints = np.array([core.register_paint(plan.get_ceiling()) for plan in plans if plan.get_ceiling() is not None], dtype=np.int64)
+        table.extend(room_indexes[ceilings], areas[ceilings], ceiling_paints, coats[ceilings])
+
+    return table
+
+#########################################################################################
+############################### Project Documents #######################################
+#########################################################################################
+
+def plan_from_dict(record):
+    '''Builds a RoomPlan() from a room of a project document with a "floor" or "outline" (see the top of this file).
+    A ValueError is raised if any part of the plan is invalid.
+    '''
+    options = {
+        "height": float(record.get("height", DEFAULT_HEIGHT)),
+        "paint": core.to_paint_strict(record.get("paint", "white")),
+        "coats": core._read_coats(record),
+        "doors": _read_count(record, "doors", 0),
+        "windows": _read_count(record, "windows", 0)
+    }
+    ceiling = record.get("ceiling", False)
+    if ceiling is True:
+        options["ceiling"] = options["paint"]
+    elif ceiling:
+        options["ceiling"] = core.to_paint_strict(ceiling)
+
+    name = record.get("name", "default room")
+    if "floor" in record:
+        floor = tuple(float(value) for value in record["floor"])
+        if len(floor) != 2 or not all(math.isfinite(value) and value > 0 for value in floor):
+            raise ValueError("A floor needs a positive length and width: %r" % (record["floor"],))
+        return RoomPlan.rectangle(name, *floor, **options)
+    if "outline" in record:
+        coordinates = core._read_vertices({"vertices": record["outline"]})
+        return RoomPlan(name, zip(coordinates[0::2], coordinates[1::2]), **options)
+
+    raise ValueError("A room plan needs a floor or an outline")
+
+def _read_count(record, key, default):
+    try:
+        value = float(record.get(key, default))
+    except (TypeError, ValueError):
+        value = -1.5
+    if not (value.is_integer() and value >= 0):
+        raise ValueError("%s must be a positive whole number: %r" % (key.title(), record.get(key)))
+    return int(value)
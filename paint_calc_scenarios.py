@@ -0,0 +1,220 @@
+"""What if analysis: pricing a whole project in every paint at once.
+The walls of a project are reduced to columns of net area, coats, current paint and room. Every candidate paint is then applied to every wall
+as a single (walls x paints) matrix operation, giving the buckets and cost of each room for each paint, so all alternatives can be ranked without re-entering any walls.
+
+    python paint_calc_scenarios.py survey.json                      Rank every paint, as if it were used on every wall
+    python paint_calc_scenarios.py survey.json --replace white      Rank every paint as a replacement for white only
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import argparse
+import json
+import math
+import sys
+
+import paint_calc_core as core
+from paint_calc_core import Paint, np
+from paint_calc_profile import count, timed
+from paint_calc_table import exact_sums
+
+# The most values worked out at once for each block of walls. Large projects are priced in blocks so that the matrix never grows with the number of walls
+BLOCK_SIZE = 1 << 22
+
+#########################################################################################
+################################### Classes #############################################
+#########################################################################################
+
+class ScenarioMatrix():
+    '''The walls of a project as columns, ready to be priced in any paint.
+    Walls are sorted by room once when the matrix is made, so the totals of each room are a single reduction over each block of walls.
+    '''
+    def __init__(self, room_names, areas, coats, paint_codes, rooms):
+        '''Builds the matrix from columns of net areas, coats, paint codes (see core.register_paint()) and room indexes.
+        '''
+        self.__room_names = list(room_names)
+        if np is None:
+            # Without NumPy, walls are priced one at a time
+            self.__walls = list(zip(areas, coats, paint_codes, rooms))
+            return
+
+        order = np.argsort(np.asarray(rooms, dtype=np.int64), kind="stable")
+        self.__areas = np.asarray(areas, dtype=np.float64)[order]
+        self.__coats = np.asarray(coats, dtype=np.float64)[order]
+        self.__paint_codes = np.asarray(paint_codes, dtype=np.int64)[order]
+        self.__rooms = np.asarray(rooms, dtype=np.int64)[order]
+
+    @classmethod
+    def from_rooms(self, rooms):
+        '''Builds the matrix from a Project() or list of Room() objects.
+        '''
+        if isinstance(rooms, core.Project):
+            rooms = rooms.get_rooms()
+
+        room_names, areas, coats, paint_codes, room_indexes = [], [], [], [], []
+        for room_index, room in enumerate(rooms):
+            room_names.append(room.get_name())
+            for wall in room.get_walls():
+                areas.append(wall.area())
+                coats.append(wall.get_coats())
+                paint_codes.append(core.register_paint(wall.get_paint()))
+                room_indexes.append(room_index)
+
+        return ScenarioMatrix(room_names, areas, coats, paint_codes, room_indexes)
+
+    @classmethod
+    def from_table(self, table):
+        '''Builds the matrix from a WallTable(), without building any Wall() objects.
+        '''
+        return ScenarioMatrix(table.get_room_names(), *table.columns())
+
+    def __len__(self):
+        return len(self.__walls) if np is None else len(self.__areas)
+
+    def get_room_names(self):
+        return self.__room_names
+
+    @timed("scenarios.buckets")
+    def buckets(self, candidates, replace=None):
+        '''Returns the number of buckets of each candidate paint needed by each room, as a list of rows (one per room) with a column per candidate.
+        If replace is given (a paint, or a list of paints), only the walls currently painted with it are counted, otherwise every wall is.
+        The buckets of every wall are worked out in the same way as core.required_buckets(), so they always match those of a Wall().
+        '''
+        values = [(paint(0), paint(1), paint(2)) for paint in candidates]
+        selected = self.__select(replace)
+        count("scenarios.cells", len(self) * len(values))
+
+        if np is None:
+            totals = [[0] * len(values) for name in self.__room_names]
+            for area, coats, paint_code, room in self.__walls:
+                if selected is None or paint_code in selected:
+                    for column, paint in enumerate(candidates):
+                        totals[room][column] += core.required_buckets(area, coats, paint)
+            return totals
+
+        litres_needed = self.__areas * self.__coats
+        rooms = self.__rooms
+        if selected is not None:
+            mask = np.isin(self.__paint_codes, list(selected))
+            litres_needed = litres_needed[mask]
+            rooms = rooms[mask]
+
+        values = np.array(values, dtype=np.float64).reshape(-1, 3)
+        totals = np.zeros((len(self.__room_names), len(values)), dtype=np.int64)
+        block = max(1, BLOCK_SIZE // max(1, len(values)))
+        for start in range(0, len(rooms), block):
+            block_rooms = rooms[start:start + block]
+
+            # The same steps as core.required_buckets(), for every wall of the block in every paint at once
+            buckets = np.ceil((litres_needed[start:start + block, None] / values[:, 2]) / values[:, 1])
+            buckets[buckets == 0] = 1
+
+            # Walls are sorted by room, so each room is one run of rows
+            starts = np.flatnonzero(np.diff(block_rooms, prepend=-1))
+            totals[block_rooms[starts]] += np.add.reduceat(buckets, starts, axis=0).astype(np.int64)
+
+        return totals.tolist()
+
+    def kept_costs(self, replace):
+        '''Returns the cost of the walls of each room which are not painted with the paint (or paints) being replaced.
+        Costs are summed exactly, with or without NumPy, so they match the running totals of the same walls.
+        '''
+        selected = self.__select(replace)
+        paints = core.registered_paints()
+        if np is None:
+            costs = [[] for name in self.__room_names]
+            for area, coats, paint_code, room in self.__walls:
+                if paint_code not in selected:
+                    paint = paints[paint_code]
+                    costs[room].append(core.required_buckets(area, coats, paint) * paint(0))
+            return [math.fsum(room_costs) for room_costs in costs]
+
+        mask = ~np.isin(self.__paint_codes, list(selected))
+        values = np.array([(paint(0), paint(1), paint(2)) for paint in paints], dtype=np.float64).reshape(-1, 3)
+        codes = self.__paint_codes[mask]
+        prices, litres, coverage = (values[:, column].take(codes) for column in range(3))
+        buckets = np.ceil(((self.__areas[mask] * self.__coats[mask]) / coverage) / litres)
+        buckets[buckets == 0] = 1
+
+        (costs, total), = exact_sums(self.__rooms[mask], len(self.__room_names), buckets * prices)
+        return costs
+
+    @timed("scenarios.rank")
+    def rank(self, candidates=None, replace=None):
+        '''Prices the project in every candidate paint, and returns the results from cheapest to most expensive.
+        Candidates default to every paint in the catalogue in use, or every built in paint.
+        If replace is given, only the walls painted with it are switched to each candidate, and the cost of every other wall is kept.
+        Each result is a dict of the form:
+        {"paint": "ivory", "total_cost": 1234.0, "total_buckets": 42, "rooms": [{"name": "Kitchen", "cost": 200.0, "buckets": 7}]}
+        where buckets are those of the candidate paint alone.
+        '''
+        if candidates is None:
+            candidates = default_candidates()
+        candidates = list(candidates)
+
+        buckets = self.buckets(candidates, replace)
+        kept = self.kept_costs(replace) if replace is not None else [0.0] * len(self.__room_names)
+
+        results = []
+        for column, paint in enumerate(candidates):
+            # Every selected wall uses the same paint, so the cost of a room is its buckets at the price of that paint
+            rooms = [{"name": name, "cost": kept[index] + row[column] * paint(0), "buckets": row[column]}
+                     for index, (name, row) in enumerate(zip(self.__room_names, buckets))]
+            results.append({
+                "paint": core.paint_key(paint),
+                "total_cost": math.fsum(room["cost"] for room in rooms),
+                "total_buckets": sum(room["buckets"] for room in rooms),
+                "rooms": rooms
+            })
+
+        results.sort(key=lambda result: result["total_cost"])
+        return results
+
+    def __select(self, replace):
+        # The codes of the paints being replaced, or None for every wall
+        if replace is None:
+            return None
+        if not isinstance(replace, (list, tuple, set, frozenset)):
+            replace = [replace]
+        return {core.register_paint(paint) for paint in replace}
+
+def default_candidates():
+    '''Returns every paint in the catalogue in use, or every built in paint if there is no catalogue.
+    '''
+    catalogue = core.get_catalogue()
+    if catalogue is not None:
+        return list(catalogue)
+    return list(Paint)
+
+#########################################################################################
+##################################### Main ##############################################
+#########################################################################################
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Rank every paint for a project document.")
+    parser.add_argument("document", help="JSON project document to price.")
+    parser.add_argument("--replace", help="Only switch the walls painted with this paint.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args(args)
+
+    try:
+        with open(args.document) as file:
+            document = json.load(file)
+        matrix = ScenarioMatrix.from_rooms(core.load_project(document) + [room for building in core.load_buildings(document) for room in building.get_rooms()])
+        replace = core.to_paint_strict(args.replace) if args.replace else None
+    except (OSError, ValueError) as error:
+        print("Error: %s" % error, file=sys.stderr)
+        return 1
+
+    results = matrix.rank(replace=replace)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print("%-20s %10.2f  (%d buckets)" % (result["paint"].title(), result["total_cost"], result["total_buckets"]))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,414 @@
+"""A local quoting service, so other programs can get quotes without running either front end.
+The service speaks a line protocol over TCP or a Unix socket. Each request is a project document (see core.load_project()) on a single line of JSON,
+and each response is a single line of JSON holding the same totals as core.estimate(), or {"error": message} if the document is invalid.
+If a request has an "id", it is copied into the response. Requests on one connection may be pipelined, and are answered in order.
+
+Requests arriving at the same time are quoted together in micro-batches: the walls of every document in a batch are put in a single WallTable() and totalled at once.
+
+    python paint_calc_service.py --port 8765
+    python paint_calc_service.py --unix /tmp/paint_calc.sock --catalogue paint_catalogue.csv
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import argparse
+import asyncio
+import json
+import math
+import sys
+
+import paint_calc_core as core
+from paint_calc_catalogue import Catalogue
+from paint_calc_profile import count, timed
+from paint_calc_table import WallTable
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Requests longer than this are rejected, so a single client cannot use up all memory
+MAX_LINE = 16 * 1024 * 1024
+
+# Coats and paint codes are stored in 16 bit columns of the WallTable(), so larger values are rejected while reading each document
+MAX_COATS = 65535
+MAX_PAINT_CODE = 65535
+
+#########################################################################################
+################################ Batch Quoting ##########################################
+#########################################################################################
+
+@timed("service.quote_batch")
+def quote_batch(documents):
+    '''Quotes a list of project documents at once.
+    Returns a list with either the totals (as core.estimate()) or a ValueError for each document, in the same order.
+    An invalid document does not affect the others in the batch.
+    '''
+    count("service.quotes", len(documents))
+    table = WallTable()
+    surfaces = []
+    results = []
+    room_ranges = []
+
+    for document in documents:
+        first_room = len(table.get_room_names())
+        try:
+            rooms, buildings = _read_document(document)
+        except (AttributeError, TypeError, ValueError) as error:
+            results.append(ValueError(str(error)))
+            room_ranges.append(None)
+            continue
+
+        for name, walls in rooms:
+            room_index = table.add_room(name)
+            for wall in walls:
+                surfaces.append((room_index, wall))
+        results.append(None)
+        room_ranges.append((first_room, len(table.get_room_names()), buildings))
+
+    # Every wall and obstacle in the batch is measured with one call of calc_areas()
+    # Walls with positioned obstacles have already been measured as a whole, as their obstacles may overlap
+    shapes = []
+    dimensions = []
+    for room_index, wall in surfaces:
+        if isinstance(wall, core.Wall):
+            continue
+        shape, wall_dimensions, paint, coats, obstacles = wall
+        shapes.append(shape)
+        dimensions.append(wall_dimensions)
+        for obstacle_shape, obstacle_dimensions in obstacles:
+            shapes.append(obstacle_shape)
+            dimensions.append(obstacle_dimensions)
+    areas = core.surface_areas(shapes, dimensions).tolist() if shapes else []
+
+    position = 0
+    for room_index, wall in surfaces:
+        if isinstance(wall, core.Wall):
+            table.append(room_index, wall.area(), wall.get_paint(), wall.get_coats())
+            continue
+        shape, wall_dimensions, paint, coats, obstacles = wall
+        table.append(room_index, areas[position], paint, coats, areas[position + 1:position + 1 + len(obstacles)])
+        position += 1 + len(obstacles)
+
+    totals = table.aggregate()["rooms"]
+    for index, room_range in enumerate(room_ranges):
+        if room_range is not None:
+            first_room, last_room, buildings = room_range
+            results[index] = _document_totals(totals[first_room:last_room], buildings)
+
+    return results
+
+def _read_document(document):
+    '''Reads and validates a project document, without building any objects.
+    Returns (rooms, buildings). Rooms is a list of (room name, walls), where each wall is a tuple of (shape, dimensions, paint, coats, obstacles).
+    Walls with positioned obstacles are returned as a Wall() instead, as their obstacles cannot simply be subtracted.
+    The rooms of each building follow the rooms of the document, in the same order as core.Project.get_rooms(). 
+    Buildings is a list of (building name, floors), where each floor is (floor name, number of rooms).
+    '''
+    rooms = _read_rooms(document)
+    buildings = []
+    for building in document.get("buildings", []):
+        floors = []
+        for floor in building.get("floors", []):
+            floor_rooms = _read_rooms(floor)
+            rooms.extend(floor_rooms)
+            floors.append((floor.get("name", "default floor"), len(floor_rooms)))
+        buildings.append((building.get("name", "default building"), floors))
+
+    return rooms, buildings
+
+def _read_rooms(document):
+    rooms = []
+    for room in document.get("rooms", []):
+        walls = []
+        for wall in room.get("walls", []):
+            if any(obstacle.get("position") is not None for obstacle in wall.get("obstacles", [])):
+                walls.append(core.wall_from_dict(wall))
+                continue
+            shape, dimensions = core._read_shape(wall)
+            paint = core.to_paint_strict(wall.get("paint", "white"))
+            coats = core._read_coats(wall)
+            obstacles = [core._read_shape(obstacle) for obstacle in wall.get("obstacles", [])]
+            walls.append((shape, dimensions, paint, coats, obstacles))
+        if "floor" in room or "outline" in room:
+            # Walls generated from a floor plan are already built, so they are quoted as Wall() objects too
+            import paint_calc_rooms
+            walls = paint_calc_rooms.plan_from_dict(room).walls() + walls
+        for wall in walls:
+            if isinstance(wall, core.Wall):
+                _check_storable(wall.get_paint(), wall.get_coats())
+            else:
+                _check_storable(wall[2], wall[3])
+        rooms.append((room.get("name", "default room"), walls))
+
+    return rooms
+
+def _check_storable(paint, coats):
+    '''Raises a ValueError if a wall cannot be stored in a WallTable(), so that it fails on its own rather than failing the whole batch. 
+    '''
+    if coats > MAX_COATS:
+        raise ValueError("Coats must be at most %d: %r" % (MAX_COATS, coats))
+    if core.register_paint(paint) > MAX_PAINT_CODE:
+        raise ValueError("Too many different paints to quote: %r" % (paint,))
+
+def _document_totals(rooms, buildings=()):
+    '''Converts the aggregated rooms of one document into the same form as core.estimate(), including the totals of any buildings and their floors.
+    '''
+    cost, total_paint = _group_totals(rooms)
+    result = {
+        "total_cost": cost,
+        "total_paint": total_paint,
+        "rooms": [{"name": room["name"], "cost": room["cost"], "paint": room["paint"]} for room in rooms]
+    }
+
+    # The rooms of the buildings follow the rooms of the document itself
+    position = len(rooms) - sum(num_of_rooms for name, floors in buildings for floor_name, num_of_rooms in floors)
+    if buildings:
+        result["buildings"] = []
+    for name, floors in buildings:
+        building_rooms = rooms[position:position + sum(num_of_rooms for floor_name, num_of_rooms in floors)]
+        floor_totals = []
+        for floor_name, num_of_rooms in floors:
+            floor_cost, floor_paint = _group_totals(rooms[position:position + num_of_rooms])
+            floor_totals.append({"name": floor_name, "cost": floor_cost, "paint": floor_paint})
+            position += num_of_rooms
+        building_cost, building_paint = _group_totals(building_rooms)
+        result["buildings"].append({"name": name, "cost": building_cost, "paint": building_paint, "floors": floor_totals})
+
+    return result
+
+def _group_totals(rooms):
+    # The cost and paint of a group of aggregated rooms
+    paint = {}
+    for room in rooms:
+        for name, buckets in room["paint"].items():
+            paint[name] = paint.get(name, 0) + buckets
+
+    return math.fsum(room["cost"] for room in rooms), paint
+
+class QuoteBatcher():
+    '''Collects requests which arrive at about the same time, and quotes them together with quote_batch().
+    A batch is started by the first waiting request, and takes in every other request which arrives within max_delay seconds, up to max_batch requests.
+    '''
+    def __init__(self, max_batch=512, max_delay=0.002):
+        self.__max_batch = max_batch
+        self.__max_delay = max_delay
+        self.__queue = None
+        self.__task = None
+
+    async def quote(self, document):
+        '''Returns the totals of a project document. A ValueError is raised if the document is invalid.
+        '''
+        if self.__task is None:
+            self.__queue = asyncio.Queue()
+            self.__task = asyncio.get_running_loop().create_task(self.__run())
+
+        future = asyncio.get_running_loop().create_future()
+        self.__queue.put_nowait((document, future))
+        return await future
+
+    async def close(self):
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+    async def __run(self):
+        while True:
+            batch = [await self.__queue.get()]
+            await asyncio.sleep(self.__max_delay)
+            while len(batch) < self.__max_batch and not self.__queue.empty():
+                batch.append(self.__queue.get_nowait())
+
+            count("service.batches")
+            try:
+                results = quote_batch([document for document, future in batch])
+            except Exception:
+                # Something in one document broke the whole batch, so each document is quoted on its own, and only that one fails
+                results = [_quote_alone(document) for document, future in batch]
+
+            for (document, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+def _quote_alone(document):
+    try:
+        return quote_batch([document])[0]
+    except Exception as error:
+        return error
+
+#########################################################################################
+#################################### Server #############################################
+#########################################################################################
+
+class QuoteServer():
+    '''Serves quotes over TCP, or over a Unix socket if a path is given.
+    '''
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, batcher=None):
+        self.__host = host
+        self.__port = port
+        self.__path = path
+        self.__batcher = batcher or QuoteBatcher()
+        self.__server = None
+
+    async def start(self):
+        if self.__path is not None:
+            self.__server = await asyncio.start_unix_server(self.__handle, self.__path, limit=MAX_LINE)
+        else:
+            self.__server = await asyncio.start_server(self.__handle, self.__host, self.__port, limit=MAX_LINE)
+
+    def get_address(self):
+        '''Returns the address the server is listening on. This is the (host, port) pair, or the path of the Unix socket.
+        '''
+        return self.__server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        if self.__server is None:
+            await self.start()
+        await self.__server.serve_forever()
+
+    async def close(self):
+        self.__server.close()
+        await self.__server.wait_closed()
+        await self.__batcher.close()
+
+    async def __handle(self, reader, writer):
+        # Responses are queued in the order their requests arrived, so pipelined requests are answered in order
+        responses = asyncio.Queue()
+        sender = asyncio.get_running_loop().create_task(self.__send(responses, writer))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    responses.put_nowait(_error_response(None, "Request is longer than %d bytes" % MAX_LINE))
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    responses.put_nowait(asyncio.get_running_loop().create_task(self.__respond(line)))
+        finally:
+            responses.put_nowait(None)
+            await sender
+
+    async def __respond(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            return _error_response(None, "Invalid JSON: %s" % error)
+        if not isinstance(request, dict):
+            return _error_response(None, "A request must be a JSON object")
+
+        try:
+            response = dict(await self.__batcher.quote(request))
+        except ValueError as error:
+            return _error_response(request.get("id"), str(error))
+        except Exception as error:
+            # Any other failure is only reported to this request, so the connection stays open for the rest
+            return _error_response(request.get("id"), "Could not quote the document: %s" % error)
+
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    async def __send(self, responses, writer):
+        try:
+            while True:
+                response = await responses.get()
+                if response is None:
+                    break
+                if isinstance(response, asyncio.Task):
+                    response = await response
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def _error_response(request_id, message):
+    response = {"error": message}
+    if request_id is not None:
+        response["id"] = request_id
+    return response
+
+#########################################################################################
+#################################### Client #############################################
+#########################################################################################
+
+class QuoteClient():
+    '''A client for a QuoteServer(). Requests may be sent from many tasks at once; they share one connection and are pipelined.
+    '''
+    def __init__(self, reader, writer):
+        self.__reader = reader
+        self.__writer = writer
+        self.__lock = asyncio.Lock()
+        self.__waiting = []
+
+    @classmethod
+    async def connect(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=MAX_LINE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+        return QuoteClient(reader, writer)
+
+    async def quote(self, document):
+        '''Returns the response to a project document. Invalid documents return {"error": message}, rather than raising an exception.
+        '''
+        future = asyncio.get_running_loop().create_future()
+        self.__waiting.append(future)
+        self.__writer.write(json.dumps(document).encode() + b"\n")
+
+        # Whichever task holds the lock reads responses for every waiting request, in order
+        async with self.__lock:
+            while not future.done():
+                line = await self.__reader.readline()
+                if not line:
+                    raise ConnectionError("The quote server closed the connection")
+                self.__waiting.pop(0).set_result(json.loads(line))
+
+        return future.result()
+
+    async def close(self):
+        self.__writer.close()
+        await self.__writer.wait_closed()
+
+#########################################################################################
+##################################### Main ##############################################
+#########################################################################################
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Serve quotes for project documents over a local socket.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on.")
+    parser.add_argument("--unix", help="Listen on a Unix socket at this path instead of TCP.")
+    parser.add_argument("--catalogue", help="CSV or JSON paint catalogue to look up paints in, by name or SKU.")
+    parser.add_argument("--max-batch", type=int, default=512, help="Most requests quoted together in one batch.")
+    parser.add_argument("--max-delay", type=float, default=0.002, help="Seconds to wait for more requests before quoting a batch.")
+    args = parser.parse_args(args)
+
+    if args.catalogue:
+        core.use_catalogue(Catalogue(args.catalogue))
+
+    async def serve():
+        server = QuoteServer(args.host, args.port, args.unix, QuoteBatcher(args.max_batch, args.max_delay))
+        await server.start()
+        print("Serving quotes on %s" % (server.get_address(),), file=sys.stderr)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,315 @@
+"""Durable storage of projects in an SQLite database.
+Rooms, walls, obstacles and the paints they use are stored in tables, with indexes on the room and paint of every wall.
+The number of buckets each wall needs is stored alongside it, so costs and paint totals are answered by indexed SQL aggregates rather than by looping over walls in Python.
+Stored buckets and prices are brought up to date whenever the paints change (see core.paints_changed()).
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import math
+import sqlite3
+import struct
+
+import paint_calc_core as core
+from paint_calc_core import Shape
+from paint_calc_profile import count, timed
+
+# Stored in the database's user_version, so older databases can be upgraded
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS paints (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    litres REAL NOT NULL,
+    coverage REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS walls (
+    id INTEGER PRIMARY KEY,
+    room_id INTEGER NOT NULL REFERENCES rooms(id) ON DELETE CASCADE,
+    shape INTEGER NOT NULL,
+    dim1 REAL NOT NULL,
+    dim2 REAL NOT NULL,
+    dim3 REAL NOT NULL,
+    net_area REAL NOT NULL,
+    paint_id INTEGER NOT NULL REFERENCES paints(id),
+    coats INTEGER NOT NULL,
+    buckets INTEGER NOT NULL,
+    vertices BLOB
+);
+CREATE TABLE IF NOT EXISTS obstacles (
+    id INTEGER PRIMARY KEY,
+    wall_id INTEGER NOT NULL REFERENCES walls(id) ON DELETE CASCADE,
+    shape INTEGER NOT NULL,
+    dim1 REAL NOT NULL,
+    dim2 REAL NOT NULL,
+    dim3 REAL NOT NULL,
+    x REAL,
+    y REAL,
+    vertices BLOB
+);
+CREATE INDEX IF NOT EXISTS walls_room_paint ON walls(room_id, paint_id, buckets);
+CREATE INDEX IF NOT EXISTS walls_paint ON walls(paint_id, buckets);
+CREATE INDEX IF NOT EXISTS obstacles_wall ON obstacles(wall_id);
+"""
+
+# The changes needed to bring a database up from each older version
+UPGRADES = {
+    1: """
+ALTER TABLE obstacles ADD COLUMN x REAL;
+ALTER TABLE obstacles ADD COLUMN y REAL;
+""",
+    2: """
+ALTER TABLE walls ADD COLUMN vertices BLOB;
+ALTER TABLE obstacles ADD COLUMN vertices BLOB;
+"""
+}
+
+#########################################################################################
+################################### Classes #############################################
+#########################################################################################
+
+class ProjectStore():
+    '''A project stored in an SQLite database. The default path of ":memory:" keeps the database in memory.
+    Rooms are referred to by the id they are given when added.
+    Can be used in a with statement, which closes the database at the end.
+    '''
+    def __init__(self, path=":memory:"):
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute("PRAGMA foreign_keys = ON")
+        version = self.__connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            self.__connection.close()
+            raise ValueError("%s was created by a newer version of the store (schema %d)" % (path, version))
+
+        with self.__connection:
+            # A new database has no version, and is created with the latest schema
+            if version > 0:
+                for upgrade in range(version, SCHEMA_VERSION):
+                    self.__connection.executescript(UPGRADES[upgrade])
+            self.__connection.executescript(SCHEMA)
+            self.__connection.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+
+        self.__load_paints()
+        self.refresh_paints()
+        core.watch_paints(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.__connection.close()
+
+    @timed("store.add_rooms")
+    def add_rooms(self, rooms):
+        '''Adds a Project() or list of Room() objects to the store, and returns the id given to each room.
+        Every row is inserted with executemany() within a single transaction.
+        '''
+        if isinstance(rooms, core.Project):
+            rooms = rooms.get_rooms()
+
+        try:
+            room_ids, walls = self.__insert_rooms(rooms)
+        except Exception:
+            # Paints added within the failed transaction were rolled back too
+            self.__load_paints()
+            raise
+
+        count("store.walls_added", len(walls))
+        return [room_id for room_id, room in room_ids]
+
+    def __insert_rooms(self, rooms):
+        with self.__connection:
+            cursor = self.__connection.cursor()
+            room_ids = []
+            for room in rooms:
+                cursor.execute("INSERT INTO rooms (name) VALUES (?)", (room.get_name(),))
+                room_ids.append((cursor.lastrowid, room))
+
+            # Walls are given ids up front, so their obstacles can be inserted in bulk too
+            wall_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM walls").fetchone()[0]
+            walls = []
+            obstacles = []
+            for room_id, room in room_ids:
+                for wall in room.get_walls():
+                    wall_id += 1
+                    columns, vertices = core.split_dimensions(wall.get_shape(), wall.get_dimensions())
+                    walls.append((wall_id, room_id, wall.get_shape().code(), *columns, wall.area(),
+                                  self.__paint_id(wall.get_paint()), wall.get_coats(), wall.required_buckets(), _pack_vertices(vertices)))
+                    for obstacle in wall.get_obstacles():
+                        position = obstacle.get_position() or (None, None)
+                        columns, vertices = core.split_dimensions(obstacle.get_shape(), obstacle.get_dimensions())
+                        obstacles.append((wall_id, obstacle.get_shape().code(), *columns, *position, _pack_vertices(vertices)))
+
+            cursor.executemany("INSERT INTO walls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", walls)
+            cursor.executemany("INSERT INTO obstacles (wall_id, shape, dim1, dim2, dim3, x, y, vertices) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", obstacles)
+
+        return room_ids, walls
+
+    def add_document(self, document):
+        '''Adds the rooms of a project document (see core.load_project()), and returns the id given to each room.
+        '''
+        return self.add_rooms(core.load_project(document))
+
+    def remove_room(self, room_id):
+        '''Removes a room, along with its walls and their obstacles.
+        '''
+        with self.__connection:
+            self.__connection.execute("DELETE FROM rooms WHERE id = ?", (room_id,))
+
+    def get_rooms(self):
+        '''Returns a list of (id, name) for every room, in the order they were added.
+        '''
+        return self.__connection.execute("SELECT id, name FROM rooms ORDER BY id").fetchall()
+
+    def load_rooms(self, room_ids=None):
+        '''Builds Room() objects from the store, so rooms can be edited or shown in either front end.
+        If room_ids is not given, every room is loaded. A ValueError is raised if any id is unknown.
+        '''
+        if room_ids is None:
+            room_ids = [room_id for room_id, name in self.get_rooms()]
+
+        rooms = []
+        for room_id in room_ids:
+            row = self.__connection.execute("SELECT name FROM rooms WHERE id = ?", (room_id,)).fetchone()
+            if row is None:
+                raise ValueError("There is no room with id %r" % (room_id,))
+            name = row[0]
+            obstacles = {}
+            for wall_id, shape, dim1, dim2, dim3, x, y, vertices in self.__connection.execute(
+                    "SELECT obstacles.wall_id, obstacles.shape, obstacles.dim1, obstacles.dim2, obstacles.dim3, obstacles.x, obstacles.y, obstacles.vertices FROM obstacles "
+                    "JOIN walls ON walls.id = obstacles.wall_id WHERE walls.room_id = ? ORDER BY obstacles.id", (room_id,)):
+                position = None if x is None else (x, y)
+                obstacles.setdefault(wall_id, []).append(core.Obstacle(*_shape(shape, (dim1, dim2, dim3), vertices), position))
+
+            walls = []
+            for wall_id, shape, dim1, dim2, dim3, vertices, key, coats in self.__connection.execute(
+                    "SELECT walls.id, walls.shape, walls.dim1, walls.dim2, walls.dim3, walls.vertices, paints.key, walls.coats FROM walls "
+                    "JOIN paints ON paints.id = walls.paint_id WHERE walls.room_id = ? ORDER BY walls.id", (room_id,)):
+                walls.append(core.Wall(*_shape(shape, (dim1, dim2, dim3), vertices), self.__paints[key][1], coats, obstacles.get(wall_id, ())))
+            rooms.append(core.Room(name, walls))
+
+        return rooms
+
+    #########################################################################################
+    ############################## Aggregate Queries ########################################
+    #########################################################################################
+
+    def room_cost(self, room_id):
+        '''Returns the cost of painting a room. Matches Room.get_cost().
+        '''
+        rows = self.__connection.execute(
+            "SELECT SUM(walls.buckets), paints.price FROM walls JOIN paints ON paints.id = walls.paint_id "
+            "WHERE walls.room_id = ? GROUP BY walls.paint_id", (room_id,))
+        return math.fsum(buckets * price for buckets, price in rows)
+
+    def room_paint(self, room_id):
+        '''Returns a dict of {Paint : buckets} for a room. Matches Room.get_paint().
+        '''
+        rows = self.__connection.execute(
+            "SELECT paints.key, SUM(walls.buckets) FROM walls JOIN paints ON paints.id = walls.paint_id "
+            "WHERE walls.room_id = ? GROUP BY walls.paint_id", (room_id,))
+        return {self.__paints[key][1]: buckets for key, buckets in rows}
+
+    def room_area(self, room_id):
+        return self.__connection.execute("SELECT TOTAL(net_area) FROM walls WHERE room_id = ?", (room_id,)).fetchone()[0]
+
+    def total_cost(self):
+        '''Returns the cost of painting every room. Matches Project.get_cost().
+        '''
+        rows = self.__connection.execute(
+            "SELECT totals.buckets, paints.price FROM (SELECT paint_id, SUM(buckets) AS buckets FROM walls GROUP BY paint_id) AS totals "
+            "JOIN paints ON paints.id = totals.paint_id")
+        return math.fsum(buckets * price for buckets, price in rows)
+
+    def total_paint(self):
+        '''Returns a dict of {Paint : buckets} across every room. Matches Project.get_paint().
+        '''
+        rows = self.__connection.execute(
+            "SELECT paints.key, totals.buckets FROM (SELECT paint_id, SUM(buckets) AS buckets FROM walls GROUP BY paint_id) AS totals "
+            "JOIN paints ON paints.id = totals.paint_id")
+        return {self.__paints[key][1]: buckets for key, buckets in rows}
+
+    @timed("store.estimate")
+    def estimate(self):
+        '''Produces a full quote of the store, in the same form as core.estimate(). Every total comes from two grouped queries.
+        '''
+        rooms = {room_id: {"name": name, "cost": [], "paint": {}} for room_id, name in self.get_rooms()}
+        for room_id, key, buckets, price in self.__connection.execute(
+                "SELECT walls.room_id, paints.key, SUM(walls.buckets), paints.price FROM walls "
+                "JOIN paints ON paints.id = walls.paint_id GROUP BY walls.room_id, walls.paint_id"):
+            rooms[room_id]["cost"].append(buckets * price)
+            rooms[room_id]["paint"][key] = buckets
+
+        for room in rooms.values():
+            room["cost"] = math.fsum(room["cost"])
+
+        return {
+            "total_cost": self.total_cost(),
+            "total_paint": {core.paint_key(paint): buckets for paint, buckets in self.total_paint().items()},
+            "rooms": list(rooms.values())
+        }
+
+    #########################################################################################
+    ##################################### Paints ############################################
+    #########################################################################################
+
+    def refresh_paints(self):
+        '''Brings the stored price of every paint up to date.
+        If the litres per bucket or coverage of a paint has changed, then the buckets of every wall using it are worked out again.
+        '''
+        with self.__connection:
+            for key, (paint_id, paint) in self.__paints.items():
+                price, litres, coverage = self.__connection.execute(
+                    "SELECT price, litres, coverage FROM paints WHERE id = ?", (paint_id,)).fetchone()
+                if (price, litres, coverage) == (paint(0), paint(1), paint(2)):
+                    continue
+
+                self.__connection.execute("UPDATE paints SET name = ?, price = ?, litres = ?, coverage = ? WHERE id = ?",
+                                          (paint.name, paint(0), paint(1), paint(2), paint_id))
+                if (litres, coverage) != (paint(1), paint(2)):
+                    walls = self.__connection.execute("SELECT id, net_area, coats FROM walls WHERE paint_id = ?", (paint_id,)).fetchall()
+                    self.__connection.executemany("UPDATE walls SET buckets = ? WHERE id = ?",
+                                                  [(core.required_buckets(area, coats, paint), wall_id) for wall_id, area, coats in walls])
+
+    def _rebuild(self):
+        # Called by core.paints_changed()
+        self.refresh_paints()
+
+    def __load_paints(self):
+        self.__paints = {}
+        for paint_id, key in self.__connection.execute("SELECT id, key FROM paints"):
+            self.__paints[key] = (paint_id, core.paint_from_key(key))
+
+    def __paint_id(self, paint):
+        '''Returns the id of a paint, adding it to the paints table if it is not already there.
+        '''
+        key = core.paint_key(paint)
+        stored = self.__paints.get(key)
+        if stored is None:
+            cursor = self.__connection.execute("INSERT INTO paints (key, name, price, litres, coverage) VALUES (?, ?, ?, ?, ?)",
+                                               (key, paint.name, paint(0), paint(1), paint(2)))
+            stored = self.__paints[key] = (cursor.lastrowid, paint)
+
+        return stored[0]
+
+def _pack_vertices(vertices):
+    # The coordinates of a polygon are stored as little endian doubles, and every other shape has none
+    if not vertices:
+        return None
+    return struct.pack("<%dd" % len(vertices), *vertices)
+
+def _shape(code, columns, vertices):
+    shape = Shape.from_code(code)
+    return shape, core.join_dimensions(shape, columns, struct.unpack("<%dd" % (len(vertices) // 8), vertices) if vertices else ())
@@ -0,0 +1,301 @@
+"""Columnar storage for very large numbers of walls.
+Rather than one Wall() object per wall, a WallTable() stores each detail of every wall in its own array.
+Walls can still be used one at a time through WallView() objects, which have the same methods as a Wall().
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+from array import array
+import math
+
+import paint_calc_core as core
+from paint_calc_core import Paint, np
+from paint_calc_profile import count, timed
+
+#########################################################################################
+################################### Classes #############################################
+#########################################################################################
+
+class WallTable():
+    '''A table of walls, stored as columns. Each wall takes up 24 bytes, plus 8 bytes for each of its obstacles:
+    - area: The area of the wall, before obstacles are removed (8 bytes)
+    - coats: The number of coats of paint (2 bytes)
+    - paint: The code of the paint used, see core.register_paint() (2 bytes)
+    - room: The index of the room the wall is in (4 bytes)
+    - offsets: Where the wall's obstacles start in the obstacle column. The obstacles of wall i are obstacles[offsets[i]:offsets[i + 1]] (8 bytes)
+    '''
+    __slots__ = ("__area", "__coats", "__paint", "__room", "__offsets", "__obstacles", "__room_names")
+
+    def __init__(self):
+        self.__area = array('d')
+        self.__coats = array('H')
+        self.__paint = array('H')
+        self.__room = array('I')
+        self.__offsets = array('Q', [0])
+        self.__obstacles = array('d')
+        self.__room_names = []
+
+    @classmethod
+    def from_rooms(self, rooms):
+        '''Builds a table from a list of Room() objects.
+        '''
+        table = WallTable()
+        for room in rooms:
+            room_index = table.add_room(room.get_name())
+            for wall in room.get_walls():
+                table.add_wall(room_index, wall)
+
+        return table
+
+    def __len__(self):
+        return len(self.__area)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("wall index out of range")
+
+        return WallView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield WallView(self, index)
+
+    def nbytes(self):
+        '''Returns the number of bytes used by the columns of the table.
+        '''
+        columns = (self.__area, self.__coats, self.__paint, self.__room, self.__offsets, self.__obstacles)
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def add_room(self, name):
+        '''Adds a room to the table, and returns the index used to add walls to it.
+        '''
+        self.__room_names.append(name)
+        return len(self.__room_names) - 1
+
+    def get_room_names(self):
+        return self.__room_names
+
+    def append(self, room, area, paint, coats, obstacle_areas=()):
+        '''Adds a wall to a room, from the area of the wall and the areas of its obstacles.
+        '''
+        self.__area.append(area)
+        self.__coats.append(coats)
+        self.__paint.append(core.register_paint(paint))
+        self.__room.append(room)
+        self.__obstacles.extend(obstacle_areas)
+        self.__offsets.append(len(self.__obstacles))
+
+    def add_wall(self, room, wall):
+        '''Adds a Wall() object to a room.
+        A wall with positioned obstacles is added with its net area, as its obstacles may overlap. 
+        '''
+        if any(obstacle.get_position() is not None for obstacle in wall.get_obstacles()):
+            self.append(room, wall.area(), wall.get_paint(), wall.get_coats())
+            return
+        obstacle_areas = [obstacle._area() for obstacle in wall.get_obstacles()]
+        self.append(room, wall._area(), wall.get_paint(), wall.get_coats(), obstacle_areas)
+
+    def extend(self, rooms, areas, paints, coats, obstacle_counts=None, obstacle_areas=()):
+        '''Adds many walls at once, from columns of room indexes, areas, paint codes and coats.
+        Paints which are not built in must be given a code with core.register_paint() first.
+        Walls have no obstacles, unless obstacle_counts gives the number each wall has. obstacle_areas then holds the area of every obstacle, in the order of their walls.
+        '''
+        _extend(self.__area, areas)
+        _extend(self.__coats, coats)
+        _extend(self.__paint, paints)
+        _extend(self.__room, rooms)
+        if obstacle_counts is None:
+            self.__offsets.extend(array('Q', [len(self.__obstacles)]) * (len(self.__area) + 1 - len(self.__offsets)))
+            return
+
+        start = len(self.__obstacles)
+        _extend(self.__obstacles, obstacle_areas)
+        if np is not None:
+            _extend(self.__offsets, start + np.cumsum(obstacle_counts, dtype=np.uint64))
+        else:
+            for obstacle_count in obstacle_counts:
+                start += obstacle_count
+                self.__offsets.append(start)
+
+    @timed("table.aggregate")
+    def aggregate(self):
+        '''Totals every wall in the table. The result is in the same form as paint_calc_parallel.parallel_estimate().
+        With NumPy the columns are totalled in a handful of vectorised passes, rather than one wall at a time.
+        Costs and buckets always match those of the equivalent Wall() objects.
+        '''
+        count("table.walls", len(self))
+        if np is None or len(self) == 0:
+            return self.__aggregate_walls()
+
+        areas, coats, paint_codes, rooms = self.columns()
+        return aggregate_columns(self.__room_names, core.registered_paints(), areas, coats, paint_codes, rooms)
+
+    def columns(self):
+        '''Returns the net area, coats, paint code and room index of every wall, as NumPy arrays. 
+        The areas have obstacles removed in the same way as Wall.area(). 
+        '''
+        offsets = np.frombuffer(self.__offsets, dtype=np.uint64).astype(np.int64)
+        areas = net_areas(np.frombuffer(self.__area, dtype=np.float64), offsets[:-1], np.diff(offsets),
+                          np.frombuffer(self.__obstacles, dtype=np.float64))
+
+        return (areas, np.frombuffer(self.__coats, dtype=np.uint16), np.frombuffer(self.__paint, dtype=np.uint16),
+                np.frombuffer(self.__room, dtype=np.uint32))
+
+    def __aggregate_walls(self):
+        '''Totals the table one wall at a time. Used when NumPy is not installed.
+        '''
+        subtotals = [core.Subtotal() for name in self.__room_names]
+        for wall in self:
+            subtotals[wall.get_room()].add_wall(wall)
+
+        total = core.Subtotal()
+        results = []
+        for name, subtotal in zip(self.__room_names, subtotals):
+            total.merge(subtotal)
+            results.append({
+                "name": name,
+                "cost": subtotal.get_cost(),
+                "area": subtotal.get_area(),
+                "paint": {core.paint_key(paint): buckets for paint, buckets in subtotal.get_paint().items()}
+            })
+
+        return {
+            "total_cost": total.get_cost(),
+            "total_area": total.get_area(),
+            "total_paint": {core.paint_key(paint): buckets for paint, buckets in total.get_paint().items()},
+            "rooms": results
+        }
+
+    # Column access for WallView()
+    def _wall(self, index):
+        start = self.__offsets[index]
+        return (self.__area[index], self.__coats[index], self.__paint[index], self.__room[index],
+                self.__obstacles[start:self.__offsets[index + 1]])
+
+class WallView():
+    '''A single wall within a WallTable().
+    A view only holds the table and the index of the wall, and reads everything else from the table's columns.
+    '''
+    __slots__ = ("__table", "__index")
+
+    def __init__(self, table, index):
+        self.__table = table
+        self.__index = index
+
+    def area(self):
+        """Returns the area of the wall when accounting for obstacles.
+        """
+        surface_area, coats, paint, room, obstacles = self.__table._wall(self.__index)
+        for obstacle_area in obstacles:
+            surface_area -= obstacle_area
+
+        return max(surface_area, 0)
+
+    def required_buckets(self):
+        """Returns the amount of paint required to cover the wall.
+        """
+        return core.required_buckets(self.area(), self.get_coats(), self.get_paint())
+
+    def get_cost(self):
+        """Returns the cost of covering the wall.
+        """
+        return self.required_buckets() * self.get_paint()(0)
+
+    def get_paint(self):
+        return Paint.from_code(self.__table._wall(self.__index)[2])
+
+    def get_coats(self):
+        return self.__table._wall(self.__index)[1]
+
+    def get_room(self):
+        return self.__table._wall(self.__index)[3]
+
+#########################################################################################
+############################### Column Aggregation ######################################
+#########################################################################################
+# These work on NumPy columns from any source, such as a WallTable() or a memory mapped project file (see paint_calc_file). 
+
+def net_areas(areas, starts, counts, obstacles):
+    '''Returns the area of every wall with its obstacles removed. 
+    The obstacles of wall i are obstacles[starts[i]:starts[i] + counts[i]]. 
+    Obstacles are subtracted one at a time, in the same order as Wall.area(), so the results are identical.
+    '''
+    if not len(obstacles):
+        return np.maximum(areas, 0)
+    
+    areas = np.array(areas, dtype=np.float64)
+
+    # Pass k removes the kth obstacle of every wall that has one
+    for k in range(int(counts.max())):
+        has_obstacle = counts > k
+        areas[has_obstacle] -= obstacles[starts[has_obstacle] + k]
+
+    return np.maximum(areas, 0)
+
+def aggregate_columns(room_names, paints, areas, coats, paint_codes, rooms):
+    '''Totals walls stored as columns of net areas, coats, paint codes and room indexes. 
+    paints is the list of paints the codes refer to, and room_names the list of rooms the indexes refer to. 
+    The result is in the same form as paint_calc_parallel.parallel_estimate(). Costs and areas are summed exactly, as by a Subtotal(), 
+    so they are identical to those of the equivalent Room() objects. 
+    '''
+    # Price, litres per bucket and coverage per litre of every wall's paint
+    # These are read when the walls are totalled, so any changes to a paint are always used
+    values = np.array([(paint(0), paint(1), paint(2)) for paint in paints], dtype=np.float64).reshape(-1, 3)
+    prices, litres, coverage = (values[:, column].take(paint_codes) for column in range(3))
+
+    # The same steps as core.required_buckets(), applied to every wall at once
+    buckets = np.ceil(((areas * coats) / coverage) / litres)
+    buckets[buckets == 0] = 1
+    costs = buckets * prices
+
+    num_of_rooms = len(room_names)
+    num_of_paints = len(values)
+    (room_costs, total_cost), (room_areas, total_area) = exact_sums(rooms, num_of_rooms, costs, areas)
+    room_paints = np.bincount(rooms.astype(np.int64) * num_of_paints + paint_codes, weights=buckets,
+                              minlength=num_of_rooms * num_of_paints).reshape(num_of_rooms, num_of_paints).astype(np.int64)
+
+    results = []
+    for index, name in enumerate(room_names):
+        results.append({
+            "name": name,
+            "cost": room_costs[index],
+            "area": room_areas[index],
+            "paint": _paint_names(paints, room_paints[index])
+        })
+
+    return {
+        "total_cost": total_cost,
+        "total_area": total_area,
+        "total_paint": _paint_names(paints, room_paints.sum(axis=0)),
+        "rooms": results
+    }
+
+def exact_sums(keys, num_of_keys, *columns):
+    '''Sums each column by key, where keys are from 0 to num_of_keys - 1. Returns (sum of each key, total) for each column. 
+    Each sum is worked out with math.fsum(), so it is correctly rounded, and exactly matches the partial sums of a Subtotal(). 
+    '''
+    # The values of each key are put next to each other, so each key is summed from a single slice
+    order = np.argsort(keys, kind="stable")
+    bounds = np.searchsorted(keys[order], np.arange(num_of_keys + 1)).tolist()
+    results = []
+    for column in columns:
+        values = column[order].tolist()
+        results.append(([math.fsum(values[start:end]) for start, end in zip(bounds, bounds[1:])], math.fsum(values)))
+
+    return results
+
+def _extend(column, values):
+    '''Extends a column. NumPy arrays are copied across as raw bytes, rather than one value at a time.
+    '''
+    if np is not None and isinstance(values, np.ndarray):
+        column.frombytes(values.astype(column.typecode, copy=False).tobytes())
+    else:
+        column.extend(values)
+
+def _paint_names(paints, buckets):
+    '''Converts a row of buckets per paint code into a dict of {paint key : buckets} (see core.paint_key()), leaving out unused paints.
+    '''
+    return {core.paint_key(paints[code]): int(count) for code, count in enumerate(buckets) if count}
@@ -0,0 +1,205 @@
+"""Quoting developments made up of many identical walls.
+Wall specifications (shape, dimensions, paint, coats and obstacles) are interned, so each distinct specification is stored once, and its area and buckets are only worked out once.
+Walls are then counted rather than stored, so memory and quoting time grow with the number of distinct specifications, not the number of walls.
+
+A development document is a project document (see core.load_project()) where any room or wall may also have a "count":
+{"rooms": [{"name": "Bedroom", "count": 20000, "walls": [{"shape": "rectangle", "dimensions": [4, 2.5], "count": 4}]}]}
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import weakref
+
+import paint_calc_core as core
+from paint_calc_core import Paint, Shape
+from paint_calc_profile import count, timed
+
+#########################################################################################
+################################### Classes #############################################
+#########################################################################################
+
+class WallSpec():
+    '''The specification of a wall, which can be shared by any number of identical walls.
+    Specs are interned: creating a spec equal to an existing one returns the existing object, so they can be compared and hashed by identity.
+    A spec has the same area(), required_buckets() and get_cost() methods as a Wall(), and so can be added to a core.Subtotal().
+    '''
+    __slots__ = ("__shape", "__dimensions", "__paint", "__coats", "__obstacles", "__area", "__buckets", "__values", "__weakref__")
+
+    # Every spec in use, by its key
+    __specs = weakref.WeakValueDictionary()
+
+    def __new__(cls, shape=Shape.SQUARE, dimensions=(0,), paint=Paint.WHITE, coats=1, obstacles=()):
+        dimensions = tuple(float(value) for value in dimensions)
+        obstacles = tuple(_obstacle_key(*obstacle) for obstacle in obstacles)
+        key = (shape, dimensions, paint, coats, obstacles)
+
+        spec = cls.__specs.get(key)
+        if spec is None:
+            spec = super().__new__(cls)
+            spec.__shape = shape
+            spec.__dimensions = dimensions
+            spec.__paint = paint
+            spec.__coats = coats
+            spec.__obstacles = obstacles
+            # The area is worked out by a Wall(), so it is always identical to that of a wall built from the same values
+            spec.__area = core.Wall(shape, dimensions, paint, coats, [core.Obstacle(*obstacle) for obstacle in obstacles]).area()
+            spec.__buckets = None
+            spec.__values = None
+            cls.__specs[key] = spec
+
+        return spec
+
+    @classmethod
+    def from_wall(self, wall):
+        '''Returns the spec of a Wall() object.
+        '''
+        obstacles = [(obstacle.get_shape(), obstacle.get_dimensions(), obstacle.get_position()) for obstacle in wall.get_obstacles()]
+        return WallSpec(wall.get_shape(), wall.get_dimensions(), wall.get_paint(), wall.get_coats(), obstacles)
+
+    @classmethod
+    def num_of_specs(self):
+        '''Returns the number of distinct specs currently in use.
+        '''
+        return len(self.__specs)
+
+    def __repr__(self):
+        return "<WallSpec %s %r %s x%d, %d obstacles>" % (self.__shape.name.lower(), self.__dimensions, self.__paint.name.lower(),
+                                                         self.__coats, len(self.__obstacles))
+
+    def area(self):
+        """Returns the area of the wall when accounting for obstacles.
+        """
+        return self.__area
+
+    def required_buckets(self):
+        """Returns the amount of paint required to cover the wall.
+        This is only worked out again if the price, litres or coverage of the paint has changed.
+        """
+        values = (self.__paint(0), self.__paint(1), self.__paint(2))
+        if values != self.__values:
+            self.__buckets = core.required_buckets(self.__area, self.__coats, self.__paint)
+            self.__values = values
+
+        return self.__buckets
+
+    def get_cost(self):
+        """Returns the cost of covering the wall.
+        """
+        return self.required_buckets() * self.__paint(0)
+
+    def get_shape(self):
+        return self.__shape
+
+    def get_dimensions(self):
+        return self.__dimensions
+
+    def get_paint(self):
+        return self.__paint
+
+    def get_coats(self):
+        return self.__coats
+
+    def get_obstacles(self):
+        '''Returns the obstacles as a tuple of (shape, dimensions, position), where position is None for obstacles without one.
+        '''
+        return self.__obstacles
+
+def _obstacle_key(shape, dimensions, position=None):
+    return shape, tuple(float(value) for value in dimensions), None if position is None else tuple(float(value) for value in position)
+
+class Development():
+    '''The walls of a development, stored as a count of each distinct WallSpec() within each room.
+    Rooms are referred to by name, and rooms with the same name (such as the bedrooms of every flat) are counted together.
+    '''
+    def __init__(self):
+        self.__rooms = {}
+
+    def add_walls(self, room_name, spec, count=1):
+        '''Adds count walls of the given spec to a room.
+        '''
+        specs = self.__rooms.setdefault(room_name, {})
+        specs[spec] = specs.get(spec, 0) + count
+
+    def add_room(self, room, count=1):
+        '''Adds count copies of a Room() object. Every wall of the room is interned as a spec.
+        '''
+        specs = self.__rooms.setdefault(room.get_name(), {})
+        for wall in room.get_walls():
+            spec = WallSpec.from_wall(wall)
+            specs[spec] = specs.get(spec, 0) + count
+
+    def add_development(self, other, count=1):
+        '''Adds count copies of another development, such as one type of flat. Only its distinct specs are visited, whatever the count.
+        '''
+        for room_name, specs in other.__rooms.items():
+            for spec, spec_count in specs.items():
+                self.add_walls(room_name, spec, spec_count * count)
+
+    def get_room_names(self):
+        return list(self.__rooms)
+
+    def num_of_walls(self):
+        return sum(sum(specs.values()) for specs in self.__rooms.values())
+
+    def num_of_specs(self):
+        '''Returns the number of distinct specs within the development.
+        '''
+        return len({spec for specs in self.__rooms.values() for spec in specs})
+
+    def get_subtotal(self, room_name):
+        '''Returns a core.Subtotal() of a room. It is exactly the same as that of a Room() holding every wall individually.
+        '''
+        subtotal = core.Subtotal()
+        for spec, spec_count in self.__rooms.get(room_name, {}).items():
+            subtotal.add_wall(spec, spec_count)
+
+        return subtotal
+
+    @timed("templates.estimate")
+    def estimate(self):
+        '''Produces a full quote of the development, in the same form as core.estimate().
+        The time taken depends on the number of rooms and specs, not on the number of walls.
+        '''
+        total = core.Subtotal()
+        rooms = []
+        for room_name in self.__rooms:
+            subtotal = self.get_subtotal(room_name)
+            count("templates.specs", len(self.__rooms[room_name]))
+            total.merge(subtotal)
+            rooms.append({
+                "name": room_name,
+                "cost": subtotal.get_cost(),
+                "paint": {core.paint_key(paint): buckets for paint, buckets in subtotal.get_paint().items()}
+            })
+
+        return {
+            "total_cost": total.get_cost(),
+            "total_paint": {core.paint_key(paint): buckets for paint, buckets in total.get_paint().items()},
+            "rooms": rooms
+        }
+
+#########################################################################################
+############################# Development Documents #####################################
+#########################################################################################
+
+@timed("templates.load_development")
+def load_development(document):
+    '''Builds a Development() from a development document. Each distinct wall in the document is only read once, however large its count.
+    A ValueError is raised if any part of the document is invalid.
+    '''
+    development = Development()
+    for room in document.get("rooms", []):
+        room_count = _read_count(room)
+        room_name = room.get("name", "default room")
+        for wall in room.get("walls", []):
+            development.add_walls(room_name, WallSpec.from_wall(core.wall_from_dict(wall)), _read_count(wall) * room_count)
+
+    return development
+
+def _read_count(record):
+    value = record.get("count", 1)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or int(value) != value or value < 0:
+        raise ValueError("Count must be a positive whole number: %r" % (value,))
+
+    return int(value)
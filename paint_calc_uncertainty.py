@@ -0,0 +1,349 @@
+"""Monte Carlo estimates of how much paint a project might really need.
+Measurements are never exact, and the area a litre of paint covers depends on the surface it goes on. Each trial perturbs the dimensions of
+every wall and obstacle, and the coverage of the paint on every wall, by random errors within the given tolerances, and works out the buckets
+needed again. The spread of the trials gives a range the true number of buckets and cost are likely to fall within.
+
+With NumPy, a whole block of trials is run as a handful of array operations. Blocks can also be spread across a pool of processes.
+Every block has its own seed taken from the one given, so the same seed always gives the same results, however many processes are used.
+
+    python paint_calc_uncertainty.py survey.json --trials 20000 --dimensions 0.02 --coverage 0.1
+    python paint_calc_uncertainty.py survey.json --cache trials.sqlite      Only run the rooms which have changed since the last run
+"""
+
+#########################################################################################
+##################################### Imports ###########################################
+#########################################################################################
+import argparse
+from array import array
+import base64
+from concurrent.futures import ProcessPoolExecutor
+import json
+import math
+import random
+import sqlite3
+import sys
+
+import paint_calc_cache
+import paint_calc_core as core
+from paint_calc_core import Shape, np
+import paint_calc_geometry as geometry
+from paint_calc_profile import count, timed
+
+# The default standard deviation of each error, as a fraction of the measured value
+# Dimensions measured with a tape are usually within a few centimetres, whereas the coverage of a paint varies more with the surface
+DIMENSION_TOLERANCE = 0.02
+COVERAGE_TOLERANCE = 0.1
+
+# The most surfaces perturbed at once, over every trial of a block
+BLOCK_SIZE = 1 << 20
+
+#########################################################################################
+################################## Simulation ###########################################
+#########################################################################################
+
+@timed("uncertainty.simulate")
+def simulate(project, trials=10000, dimension_tolerance=DIMENSION_TOLERANCE, coverage_tolerance=COVERAGE_TOLERANCE, seed=0, workers=1,
+             percentiles=(5, 50, 95), progress=None, cache=None):
+    '''Runs a number of trials of a Project(), Room(), list of Room() objects or project document, and returns the given percentiles of each total.
+    The result is a dict of the form:
+    {"trials": 10000, "percentiles": [5, 50, 95], "total_cost": [610.0, 655.0, 700.0],
+     "paint": {"white": {"buckets": [11, 12, 13], "cost": [495.0, 540.0, 585.0]}}}
+    where each list holds the value of each percentile, in order. Every percentile is the total of one of the trials.
+    If workers is more than 1, then blocks of trials are run in a pool of that many processes.
+    If progress is given, it is called with the fraction of trials run so far, as each block finishes.
+    If a RoomCache() is given (see paint_calc_cache), the trials of each room are run on their own and kept in the cache, so only rooms which have changed
+    since the last call are run again. Each room then has its own seed, taken from the seed given and the content of the room, so results differ from
+    those without a cache, but are just as repeatable. workers is not used with a cache.
+    '''
+    tolerances = (dimension_tolerance, coverage_tolerance)
+    count("uncertainty.trials", trials)
+    if cache is not None:
+        paints, buckets = _cached_trials(_rooms(project), trials, seed, tolerances, cache, progress)
+    else:
+        surfaces = prepare(_rooms(project))
+        paints, buckets = surfaces["paints"], run_blocks(surfaces, trials, seed, tolerances, workers, progress)
+
+    return summarise(paints, buckets, percentiles)
+
+def run_blocks(surfaces, trials, seed, tolerances, workers=1, progress=None):
+    '''Runs trials of surfaces from prepare() in blocks, each with its own seed taken from the one given (an int, or a list of ints).
+    Returns a list with a row for every trial, holding the buckets of each paint.
+    '''
+    num_of_blocks = max(1, math.ceil(trials * max(1, len(surfaces["codes"])) / BLOCK_SIZE))
+    block_trials = [trials // num_of_blocks + (1 if index < trials % num_of_blocks else 0) for index in range(num_of_blocks)]
+    seeds = _block_seeds(seed, num_of_blocks)
+
+    if workers > 1 and num_of_blocks > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            blocks = _report(executor.map(run_block, [surfaces] * num_of_blocks, block_trials, seeds, [tolerances] * num_of_blocks), block_trials, progress)
+    else:
+        blocks = _report((run_block(surfaces, block, block_seed, tolerances) for block, block_seed in zip(block_trials, seeds)), block_trials, progress)
+
+    # One row per trial, with a column of buckets for each paint
+    return [row for block in blocks for row in block]
+
+def prepare(rooms):
+    '''Reduces rooms to the columns needed to run trials: every wall and unpositioned obstacle as a surface, and the paint and coats of every wall.
+    The part of each wall covered by positioned obstacles is kept as a fraction of the wall, so it grows and shrinks with the wall in each trial.
+    '''
+    paints = []
+    paint_indexes = {}
+    surfaces = {"codes": [], "dimensions": [], "areas": [], "owners": [], "walls": [], "covered": [], "paints": paints, "wall_paints": [], "coats": []}
+    for room in rooms:
+        for wall in room.get_walls():
+            wall_index = len(surfaces["walls"])
+            surfaces["walls"].append(len(surfaces["codes"]))
+            _add_surface(surfaces, wall, wall_index)
+
+            positioned = []
+            for obstacle in wall.get_obstacles():
+                if obstacle.get_position() is None:
+                    _add_surface(surfaces, obstacle, wall_index)
+                else:
+                    positioned.append((obstacle.get_outline(), obstacle._area()))
+            covered = geometry.covered_area(wall.get_outline(), positioned) if positioned else 0
+            surfaces["covered"].append(covered / wall._area() if wall._area() else 0)
+
+            paint = wall.get_paint()
+            if paint not in paint_indexes:
+                paint_indexes[paint] = len(paints)
+                paints.append(paint)
+            surfaces["wall_paints"].append(paint_indexes[paint])
+            surfaces["coats"].append(wall.get_coats())
+
+    return surfaces
+
+def _add_surface(surfaces, surface, wall_index):
+    shape = surface.get_shape()
+    surfaces["codes"].append(shape.code())
+    # Polygons are scaled as a whole, across and up, so only their area is needed
+    surfaces["dimensions"].append((0.0, 0.0, 0.0) if shape is Shape.POLYGON else tuple(surface.get_dimensions()) + (0.0,) * (3 - len(surface.get_dimensions())))
+    surfaces["areas"].append(surface._area())
+    surfaces["owners"].append(wall_index)
+
+@timed("uncertainty.block")
+def run_block(surfaces, trials, seed, tolerances):
+    '''Runs a block of trials. This is what runs within each worker.
+    Returns a list with a row for every trial, holding the buckets of each paint.
+    '''
+    if np is None:
+        return _run_trials(surfaces, trials, seed, tolerances)
+
+    dimension_tolerance, coverage_tolerance = tolerances
+    rand = np.random.default_rng(seed)
+    codes = np.array(surfaces["codes"], dtype=np.int64)
+    num_of_surfaces = len(codes)
+    num_of_walls = len(surfaces["walls"])
+    if num_of_walls == 0:
+        return [[0] * len(surfaces["paints"]) for trial in range(trials)]
+
+    # Every dimension of every surface in every trial gets its own error
+    errors = np.maximum(1 + rand.normal(0, dimension_tolerance, (trials, num_of_surfaces, 3)), 0)
+    dimensions = np.array(surfaces["dimensions"], dtype=np.float64).reshape(-1, 3) * errors
+    # Polygons are measured as squares with no sides, then scaled from their own area
+    polygons = codes == Shape.POLYGON.code()
+    area_codes = np.where(polygons, Shape.SQUARE.code(), codes)
+    areas = core.calc_areas(np.tile(area_codes, trials), [dimensions[:, :, column].ravel() for column in range(3)]).reshape(trials, num_of_surfaces)
+    if polygons.any():
+        areas[:, polygons] = np.array(surfaces["areas"])[polygons] * errors[:, polygons, 0] * errors[:, polygons, 1]
+
+    # Obstacles are taken away from the wall they are on
+    owners = np.array(surfaces["owners"], dtype=np.int64)
+    walls = np.array(surfaces["walls"], dtype=np.int64)
+    is_obstacle = np.ones(num_of_surfaces, dtype=bool)
+    is_obstacle[walls] = False
+    gross = areas[:, walls]
+    obstacles = np.zeros((trials, num_of_walls))
+    np.add.at(obstacles, (slice(None), owners[is_obstacle]), areas[:, is_obstacle])
+    net = np.maximum(gross * (1 - np.array(surfaces["covered"])) - obstacles, 0)
+
+    # The same steps as core.required_buckets(), with the coverage of the paint on each wall perturbed too
+    values = np.array([(paint(0), paint(1), paint(2)) for paint in surfaces["paints"]], dtype=np.float64).reshape(-1, 3)
+    wall_paints = np.array(surfaces["wall_paints"], dtype=np.int64)
+    coverage = values[wall_paints, 2] * np.maximum(1 + rand.normal(0, coverage_tolerance, (trials, num_of_walls)), 1e-9)
+    buckets = np.ceil(((net * np.array(surfaces["coats"], dtype=np.float64)) / coverage) / values[wall_paints, 1])
+    buckets[buckets == 0] = 1
+
+    # Each paint's buckets in each trial
+    paint_matrix = np.zeros((num_of_walls, len(values)))
+    paint_matrix[np.arange(num_of_walls), wall_paints] = 1
+    return (buckets @ paint_matrix).astype(np.int64).tolist()
+
+def _run_trials(surfaces, trials, seed, tolerances):
+    '''Runs a block of trials one surface at a time. Used when NumPy is not installed.
+    '''
+    dimension_tolerance, coverage_tolerance = tolerances
+    rand = random.Random(seed)
+    walls = set(surfaces["walls"])
+    rows = []
+    for trial in range(trials):
+        areas = []
+        for code, dimensions, area in zip(surfaces["codes"], surfaces["dimensions"], surfaces["areas"]):
+            errors = [max(1 + rand.gauss(0, dimension_tolerance), 0) for index in range(3)]
+            shape = Shape.from_code(code)
+            if shape is Shape.POLYGON:
+                areas.append(area * errors[0] * errors[1])
+            else:
+                areas.append(shape(*[value * error for value, error in zip(dimensions, errors)][:shape.num_of_dimensions()]))
+
+        net = [areas[index] * (1 - covered) for index, covered in zip(surfaces["walls"], surfaces["covered"])]
+        for index, owner in enumerate(surfaces["owners"]):
+            if index not in walls:
+                net[owner] -= areas[index]
+
+        row = [0] * len(surfaces["paints"])
+        for wall_index, area in enumerate(net):
+            paint = surfaces["paints"][surfaces["wall_paints"][wall_index]]
+            coverage = paint(2) * max(1 + rand.gauss(0, coverage_tolerance), 1e-9)
+            buckets = math.ceil(((max(area, 0) * surfaces["coats"][wall_index]) / coverage) / paint(1))
+            row[surfaces["wall_paints"][wall_index]] += buckets if buckets else 1
+        rows.append(row)
+
+    return rows
+
+def summarise(paints, buckets, percentiles):
+    '''Converts the buckets of each paint in every trial into percentiles of each total.
+    '''
+    percentiles = list(percentiles)
+    prices = [paint(0) for paint in paints]
+    costs = [sum(row_buckets * price for row_buckets, price in zip(row, prices)) for row in buckets]
+
+    paint_totals = {}
+    for index, paint in enumerate(paints):
+        column = sorted(row[index] for row in buckets)
+        paint_buckets = [_percentile(column, percentile) for percentile in percentiles]
+        paint_totals[core.paint_key(paint)] = {"buckets": paint_buckets, "cost": [value * prices[index] for value in paint_buckets]}
+
+    costs.sort()
+    return {
+        "trials": len(buckets),
+        "percentiles": percentiles,
+        "total_cost": [_percentile(costs, percentile) for percentile in percentiles],
+        "paint": paint_totals
+    }
+
+def _percentile(values, percentile):
+    # The nearest trial to the percentile, so every value is one a trial actually produced
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, round(percentile / 100 * (len(values) - 1))))]
+
+def _report(blocks, block_trials, progress):
+    # Collects the blocks as they finish, reporting the fraction of trials run after each
+    results = []
+    done = 0
+    for block, trials in zip(blocks, block_trials):
+        results.append(block)
+        done += trials
+        if progress is not None:
+            progress(done / max(1, sum(block_trials)))
+    return results
+
+def _cached_trials(rooms, trials, seed, tolerances, cache, progress):
+    '''Runs the trials of each room on its own, keeping the buckets of each paint in every trial in the cache, by the key of the room.
+    Returns the paints used and a row for every trial, holding the buckets of each paint, in the same form as run_blocks().
+    '''
+    paints = {}
+    totals = {}
+    occurrences = {}
+    for index, room in enumerate(rooms):
+        key = paint_calc_cache.room_key(room)
+        # Identical rooms are still measured separately, so each copy has its own errors
+        occurrence = occurrences.get(key, 0)
+        occurrences[key] = occurrence + 1
+        for wall in room.get_walls():
+            paints.setdefault(core.paint_key(wall.get_paint()), wall.get_paint())
+
+        columns = cache.lookup(json.dumps(["trials", key, occurrence, trials, seed, list(tolerances)]), 
+                               lambda: _room_columns(room, trials, [seed, int(key, 16), occurrence], tolerances))
+        for paint_key, column in columns.items():
+            column = _decode(column)
+            if paint_key not in totals:
+                totals[paint_key] = column
+            elif np is not None:
+                totals[paint_key] = totals[paint_key] + column
+            else:
+                totals[paint_key] = [total + value for total, value in zip(totals[paint_key], column)]
+        if progress is not None:
+            progress((index + 1) / len(rooms))
+
+    keys = list(totals)
+    if not keys:
+        return [], [[] for trial in range(trials)]
+    if np is not None:
+        return [paints[key] for key in keys], np.column_stack([totals[key] for key in keys]).tolist()
+    return [paints[key] for key in keys], [list(row) for row in zip(*[totals[key] for key in keys])]
+
+def _room_columns(room, trials, seed, tolerances):
+    # The buckets of each paint of a room in every trial, by the key of the paint, packed to be kept in a cache
+    surfaces = prepare([room])
+    rows = run_blocks(surfaces, trials, seed, tolerances)
+    return {core.paint_key(paint): _encode([row[index] for row in rows]) for index, paint in enumerate(surfaces["paints"])}
+
+def _encode(column):
+    return base64.b64encode(array("I", column).tobytes()).decode("ascii")
+
+def _decode(text):
+    data = base64.b64decode(text)
+    if np is not None:
+        return np.frombuffer(data, dtype=np.uint32).astype(np.int64)
+    column = array("I")
+    column.frombytes(data)
+    return column.tolist()
+
+def _block_seeds(seed, num_of_blocks):
+    if np is not None:
+        return np.random.SeedSequence(seed).spawn(num_of_blocks)
+    if not isinstance(seed, int):
+        # Hashes of tuples of ints are the same in every run
+        seed = hash(tuple(seed))
+    return [seed * 1000003 + index for index in range(num_of_blocks)]
+
+def _rooms(project):
+    if isinstance(project, dict):
+        project = core.Project(core.load_project(project), core.load_buildings(project))
+    if isinstance(project, (core.Group, core.Room)):
+        return project.get_rooms() if isinstance(project, core.Group) else [project]
+    return list(project)
+
+#########################################################################################
+##################################### Main ##############################################
+#########################################################################################
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Estimate the likely range of paint needed for a project document.")
+    parser.add_argument("document", help="JSON project document to simulate.")
+    parser.add_argument("--trials", type=int, default=10000, help="Number of trials to run.")
+    parser.add_argument("--dimensions", type=float, default=DIMENSION_TOLERANCE, help="Standard deviation of measuring errors, as a fraction.")
+    parser.add_argument("--coverage", type=float, default=COVERAGE_TOLERANCE, help="Standard deviation of the coverage of each paint, as a fraction.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random errors.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes to run trials in.")
+    parser.add_argument("--cache", help="SQLite file to keep the trials of each room in, so unchanged rooms are not run again.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args(args)
+
+    try:
+        with open(args.document) as file:
+            document = json.load(file)
+        if args.cache:
+            with paint_calc_cache.RoomCache(path=args.cache) as cache:
+                result = simulate(document, args.trials, args.dimensions, args.coverage, args.seed, args.workers, cache=cache)
+        else:
+            result = simulate(document, args.trials, args.dimensions, args.coverage, args.seed, args.workers)
+    except (OSError, ValueError, sqlite3.Error) as error:
+        print("Error: %s" % error, file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        low, middle, high = result["total_cost"]
+        print("Total Cost: %.2f (90%% likely between %.2f and %.2f)" % (middle, low, high))
+        for name, totals in result["paint"].items():
+            low, middle, high = totals["buckets"]
+            print("Total %s: %d buckets (90%% likely between %d and %d)" % (name.title(), middle, low, high))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,280 +1,186 @@
-from abc import abstractmethod
-from enum import Enum
-import math 
-
-##### Enums #####
-# Shapes
-class Shape(Enum):
-    SQUARE = lambda b: pow(b, 2)
-    RECTANGLE = lambda b, h: b * h
-    PARALLELOGRAM = lambda b, h: b * h
-    TRAPEZOID = lambda b, h, a: ((a + b) // 2) * h
-    TRIANGLE = lambda b, h: 0.5 * (b * h)
-    ELLIPSE = lambda b, a: math.pi * (a*b)
-    CIRCLE = lambda r: math.pi * pow(r, 2)
-    SEMICIRCLE = lambda r: (math.pi * pow(r, 2)) // 2
-    
-    def __call__(self, args):
-        return self.value[0](args)
-    
-    @classmethod
-    def to_shape(self, shape_name):
-        match shape_name:
-            case "square":
-                return Shape.SQUARE
-            case "rectangle":
-                return Shape.RECTANGLE
-            case "parallelogram":
-                return Shape.PARALLELOGRAM
-            case "trapezoid":
-                return Shape.TRAPEZOID
-            case "triangle":
-                return Shape.TRIANGLE
-            case "ellipse":
-                return Shape.ELLIPSE
-            case "circle":
-                return Shape.CIRCLE
-            case "semicircle":
-                return Shape.SEMICIRCLE
-            case _:
-                return None
-
-# Paints
-class Paint(Enum):
-    # name = [price per bucket, litres per bucket, coverage per litre]
-    RED = (1.00, 1.25, 0.75)
-    BLUE = (1.25, 1.25, 0.5)
-    GREEN = (2.75, 0.75, 1.34)
-    
-    def __call__(self, args):
-        return self.value[args]
-    
-    @classmethod
-    def to_paint(self, paint_name):
-        match paint_name:
-            case "red":
-                return Paint.RED
-            case "blue":
-                return Paint.BLUE
-            case "green":
-                return Paint.GREEN
-            case _:
-                return None
+import argparse
+import csv
+import json
+import sys
+import time
 
+import paint_calc_core as core
+from paint_calc_core import Shape, Paint
+from paint_calc_catalogue import Catalogue
+from paint_calc_profile import count, span, timed
 
 ##### Classes ##### 
-# Architecture (Walls, doors, windows, etc)
-class Architecture():
-    def __init__(self):
-        self.__surface_area = 0  
-        self.__index = 0
+# Prompts shared by walls and obstacles
+def get_shape(kind):
+    while True:
+        print("Square | Rectangle | Parallelogram | Trapezoid | Triangle | Ellipse | Circle | Semicircle | Polygon")
+        shape_name = input("Of the shapes listed above, which best describes the shape of this %s?: " % kind).lower()
 
-    def area(self):
-        return self.__surface_area
+        shape_type = Shape.to_shape(shape_name)
+        if shape_type is not None:
+            return shape_type
+        else:
+            print("Invalid Shape!")
+
+def get_paint(kind):
+    colours = " | ".join(paint.name.title() for paint in Paint)
     
-    @abstractmethod
-    def define(self):
-        pass
+    while True:
+        print(colours)
+        colour = input("Of the colours listed above, which do you want to use on your %s? " % kind).upper()
 
-    def __get_shape(self):
-        while True:
-            print("Square | Rectangle | Parallelogram | Trapezoid | Triangle | Ellipse | Circle | Semicircle")
-            wall_shape = input("Of the shapes listed above, which best describes the shape of this %s?: "% type(self).__name__.lower()).lower()
+        if colour in Paint.__members__:
+            return Paint[colour]
+        else:
+            print("Invalid colour!")
 
-            shape_type = Shape.to_shape(wall_shape)
-            if shape_type is not None:
-                wall_shape = shape_type
-                break
-            else:
-                print("Invalid Shape!")
+def get_yes_no(question):
+    return input(question + " (y/n): ").lower() in ("y", "yes")
+
+def get_dimensions(shape):
+    if shape is Shape.SQUARE:
+        return [get_float_input("Please enter the length of one side in metres: ")]
         
-        return wall_shape
-    
-    def _calc_area(self):
-        surface_area = None
-        shape = self.__get_shape()
+    elif shape is Shape.RECTANGLE or shape is Shape.PARALLELOGRAM or shape is Shape.TRIANGLE:
+        prompts = [
+            "Please enter the length of the base in metres: ",
+            "Please enter the the height in metres: "
+        ]
+        return get_multi_float(prompts)
         
-        if shape is Shape.SQUARE:
-            base_metres = get_float_input("Please enter the length of one side in metres: ")
-            wall_surface_area = shape(base_metres)
-            
-        elif shape is Shape.RECTANGLE or shape is Shape.PARALLELOGRAM or shape is Shape.TRIANGLE:
-            prompts = [
-                "Please enter the length of the base in metres: ",
-                "Please enter the the height in metres: "
-            ]
-            
-            answers = get_multi_float(prompts)
-            wall_surface_area = shape(answers[0], answers[1])
-            
-        elif shape is Shape.TRAPEZOID:
-            prompts = [
-                "Please enter the length of the base in metres: ",
-                "Please enter the length of the top in metres: ",
-                "Please enter the the height in metres: "
-            ]
-             
-            answers = get_multi_float(prompts)
-            wall_surface_area = shape(answers[0], answers[2], answers[1])
-            
-        elif shape is Shape.ELLIPSE:
-            vertical_metres = get_float_input("Please enter the vertical radius of in metres: ")
-            horizontal_metres = get_float_input("Please enter the horizontal radius in metres: ")
-            wall_surface_area = shape(horizontal_metres, vertical_metres)
-        elif shape is Shape.CIRCLE or shape is Shape.SEMICIRCLE:
-            radius_metres = get_float_input("Please enter the radius in metres: ")
-            wall_surface_area = shape(radius_metres)
-            
-        return wall_surface_area
+    elif shape is Shape.TRAPEZOID:
+        prompts = [
+            "Please enter the length of the base in metres: ",
+            "Please enter the the height in metres: ",
+            "Please enter the length of the top in metres: "
+        ]
+        return get_multi_float(prompts)
+        
+    elif shape is Shape.ELLIPSE:
+        prompts = [
+            "Please enter the horizontal radius in metres: ",
+            "Please enter the vertical radius of in metres: "
+        ]
+        return get_multi_float(prompts)
+    
+    elif shape is Shape.POLYGON:
+        # Each corner is measured from the same point, such as the bottom left of the wall, in order around the outline
+        num_of_vertices = 0
+        while num_of_vertices < 3:
+            num_of_vertices = get_int_input("Please enter the number of corners (at least 3): ")
+        prompts = []
+        for index in range(1, num_of_vertices + 1):
+            prompts.append("Please enter the distance across to corner %d in metres: " % index)
+            prompts.append("Please enter the height of corner %d in metres: " % index)
+        return get_multi_float(prompts)
+    
+    else:
+        return [get_float_input("Please enter the radius in metres: ")]
 
 # A wall
-class Wall(Architecture):
-    def __init__(self):
-        self.__paint = Paint.RED
-        self.__surface_area = 0.0
-        self.__coats = 1
-        self.__obstacles = []
-        self.__index = 0
-        
+class Wall(core.Wall):
     def define(self, index):
-        self.__index = index
-        self.__paint = self.__get_paint()
-        self.__coats = self.__get_coats()
-        clear_console()
-        
-        self.__get_obstacles = self.__get_obstacles()
-        clear_console()
-
-        print("Wall No.%d" % self.__index)
-        self.__surface_area = self._calc_area()
+        print("Wall No.%d" % index)
+        paint = get_paint("wall")
+        coats = get_int_input("How many coats of this paint do you plan to apply? ")
+        self.set_paint(paint, coats)
         clear_console()
         
-        if len(self.__obstacles) != 0:
-            self.__area_without_obstacles()
-    
-    def __get_coats(self):
-        return get_int_input("How many coats of this paint do you plan to apply? ")
-    
-    def required_buckets(self):
-        litres_required = (self.__surface_area * self.__coats) // self.__paint(2)
-        return  round(litres_required // self.__paint(1))
-    
-    def cost(self):
-        return self.required_buckets() * self.__paint(0)
-    
-    def __get_obstacles(self):
         num_of_obstacles = get_int_input("Please enter the number of obstacles (doors/windows) on this wall: ")
-        while True:
-            try:
-                obstacles = [Obstacle()] * num_of_obstacles
-                break
-            except: 
-                num_of_obstacles = get_int_input("Error! Please enter the number of obstacles (doors/windows) on this wall as a whole number: ")
-        
-        index = 0
-        for obstacle in obstacles:
-            print("Obstacle No.%d" % self.__index)
-            obstacle.define(index)
-            index += 1
+        for obstacle_index in range(1, num_of_obstacles + 1):
+            print("Obstacle No.%d" % obstacle_index)
+            obstacle = Obstacle()
+            obstacle.define(obstacle_index)
+            self.add_obstacle(obstacle)
             clear_console()
-        
-        return obstacles
-    
-    def __area_without_obstacles(self):
-        for obstacle in self.__obstacles:
-            self.__surface_area -= obstacle.area()
-        
-    def __get_paint(self): 
-        print("Wall No.%d" % self.__index)
-        
-        while True:
-            print("Red | Green | Blue")
-            colour = input("Of the colours listed above, which do you want to use on your wall? ").lower()
 
-            paint_colour = Paint.to_paint(colour)
-            if paint_colour is not None:
-                colour = paint_colour
-                break
-            else:
-                print("Invalid colour!")
-        
-        return colour
+        print("Wall No.%d" % index)
+        shape = get_shape("wall")
+        self.set_area(shape, get_dimensions(shape))
+        clear_console()
 
 # Windows, Doors, etc. 
-class Obstacle(Architecture): 
+class Obstacle(core.Obstacle): 
     def define(self, index):
-        self.__index = index
-        self.__surface_area = self._calc_area()
+        shape = get_shape("obstacle")
+        self.set_area(shape, get_dimensions(shape))
 
 # Rooms
-class Room():
-    def __init__(self):
-        self.__walls = []
-        self.__name = "default room"
-        self.__index = 0
-    
+class Room(core.Room):
     def define(self, room_index):
-        self.__index = room_index
-        
-        print("Room No.%d" % self.__index)
+        print("Room No.%d" % room_index)
         while True: 
-            self.__name = input("Please enter a name for this room: ")
-            temp_input = input("Are you sure you want this room to be called: '%s' (y/n): " % self.__name).lower()
+            name = input("Please enter a name for this room: ")
+            temp_input = input("Are you sure you want this room to be called: '%s' (y/n): " % name).lower()
             if  temp_input == 'y' or temp_input == 'yes':
                 break
-            
+        
+        self.set_name(name)
         clear_console()
         
-        print("Current Room: %s" % self.__name)  
-        num_of_walls = get_int_input("Please enter the number of walls for this room: ")
+        print("Current Room: %s" % name)  
+        if get_yes_no("Is this a rectangular room? Its walls, doors and windows can then be worked out from its floor"):
+            self.__define_plan(name)
+            return
         
-        while True:
-            try:
-                self.__walls = [Wall()] * num_of_walls
-                break
-            except: 
-                num_of_walls = get_int_input("Error! Please enter the number of walls for this room as a whole number: ")
+        num_of_walls = get_int_input("Please enter the number of walls for this room: ")
         
-        index = 1
-        for wall in self.__walls:
-            print("Current Room: %s" % self.__name) 
+        for index in range(1, num_of_walls + 1):
+            print("Current Room: %s" % name) 
+            wall = Wall()
             wall.define(index)
-            index += 1
+            self.add_wall(wall)
             clear_console()
-            
-    def walls(self):
-        return self.__walls
+    
+    def __define_plan(self, name):
+        # Every wall is generated from the size of the floor, rather than entered one at a time
+        import paint_calc_rooms
+        length, width, height = get_multi_float([
+            "Please enter the length of the floor in metres: ", 
+            "Please enter the width of the floor in metres: ", 
+            "Please enter the height of the ceiling in metres: "
+        ])
+        paint = get_paint("walls")
+        coats = get_int_input("How many coats of this paint do you plan to apply? ")
+        ceiling = paint if get_yes_no("Do you want to paint the ceiling the same colour") else None
+        doors = get_int_input("How many doors does this room have? ")
+        windows = get_int_input("How many windows does this room have? ")
+        
+        try:
+            plan = paint_calc_rooms.RoomPlan.rectangle(name, length, width, height=height, paint=paint, coats=coats, ceiling=ceiling, doors=doors, windows=windows)
+        except ValueError as error:
+            print("Error: %s" % error)
+            return self.__define_plan(name)
+        with span("cli.generate_plan"):
+            for wall in plan.walls():
+                self.add_wall(wall)
+        clear_console()
 
 # The Calculator
 class Calculator():
     def __init__(self):
-        self.__rooms = self.__get_rooms() 
+        # Only the work of the calculator is timed, not the time spent waiting for the user to type
+        rooms = self.__get_rooms()
+        with span("cli.build_project"):
+            self.__project = core.Project(rooms)
 
+    @timed("cli.calc_cost")
     def calc_cost(self):
-        cost = 0
-        for room in self.__rooms:
-            for wall in room.walls():
-                cost += wall.cost()
-        
-        return cost
+        return self.__project.get_cost()
+
+    @timed("cli.calc_paint")
+    def calc_paint(self):
+        return self.__project.get_paint()
 
     def __get_rooms(self):  
         num_of_rooms = get_int_input("How many rooms are you wanting to paint? ")
-        
-        while True:
-            try:
-                rooms = [Room()] * num_of_rooms
-                break
-            except: 
-                num_of_rooms = get_int_input("Error! number of rooms could not be generated. Program will now close!")
-                ## EDIT LATER
-        
         clear_console()
         
-        index = 1
-        for room in rooms:
+        rooms = []
+        for index in range(1, num_of_rooms + 1):
+            room = Room()
             room.define(index)
-            index += 1
+            rooms.append(room)
             clear_console()
             
         return rooms
@@ -320,7 +226,117 @@ def clear_console():
     import os
     clear = lambda: os.system('clear')
 
+##### Bulk Quoting ##### 
+# Records are streamed through a chain of generators, so only the current wall is ever held in memory. 
+# A record is either a wall (the default) or an obstacle, which belongs to the wall before it. 
+# CSV columns: room, kind, shape, dim1, dim2, dim3, paint, coats
+# JSONL keys: room, kind, shape, dimensions, paint, coats and, optionally, a list of obstacles for the wall. 
+def read_records(stream, file_format):
+    if file_format == "csv":
+        for row in csv.DictReader(stream):
+            yield csv_record(row)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+def csv_record(row):
+    record = {key: value for key, value in row.items() if value not in (None, "")}
+    record["dimensions"] = [record.pop(key) for key in ("dim1", "dim2", "dim3") if key in record]
+    return record
+
+def walls_from_records(records):
+    room = None
+    wall = None
+    for record in records:
+        if record.get("kind", "wall").lower() == "obstacle":
+            if wall is None:
+                raise ValueError("An obstacle must come after the wall it is on")
+            wall.add_obstacle(core.obstacle_from_dict(record))
+            continue
+        
+        if wall is not None:
+            yield room, wall
+        room = record.get("room", "default room")
+        wall = core.wall_from_dict(record)
+    
+    if wall is not None:
+        yield room, wall
+
+@timed("cli.bulk_quote")
+def bulk_quote(records):
+    # Totals are kept per room name and per paint, so memory grows with the number of rooms rather than walls
+    totals = {"rows": 0, "total_cost": 0, "total_paint": {}, "rooms": {}}
+    
+    def counted(records):
+        for record in records:
+            totals["rows"] += 1
+            yield record
+    
+    try:
+        for room, wall in walls_from_records(counted(records)):
+            paint = core.paint_key(wall.get_paint())
+            buckets = wall.required_buckets()
+            cost = wall.get_cost()
+            
+            room_totals = totals["rooms"].setdefault(room, {"name": room, "cost": 0, "paint": {}})
+            room_totals["cost"] += cost
+            room_totals["paint"][paint] = room_totals["paint"].get(paint, 0) + buckets
+            totals["total_cost"] += cost
+            totals["total_paint"][paint] = totals["total_paint"].get(paint, 0) + buckets
+    except (ValueError, KeyError, TypeError) as error:
+        raise ValueError("Record %d: %s" % (totals["rows"], error))
+    
+    totals["rooms"] = list(totals["rooms"].values())
+    count("cli.rows", totals["rows"])
+    return totals
+
+def bulk_main(args):
+    parser = argparse.ArgumentParser(description="Quote walls from a CSV or JSONL file without any prompts.")
+    parser.add_argument("file", nargs="?", default="-", help="CSV or JSONL file of wall/obstacle records. Reads stdin if omitted or '-'.")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Format of the records. Guessed from the file extension, or csv for stdin.")
+    parser.add_argument("--json", action="store_true", help="Print the totals as JSON.")
+    parser.add_argument("--catalogue", help="CSV or JSON paint catalogue to look up paints in, by name or SKU.")
+    args = parser.parse_args(args)
+    
+    if args.catalogue:
+        core.use_catalogue(Catalogue(args.catalogue))
+    
+    file_format = args.format
+    if file_format is None:
+        file_format = "jsonl" if args.file.lower().endswith((".jsonl", ".json")) else "csv"
+    
+    stream = sys.stdin if args.file == "-" else open(args.file, newline="")
+    start = time.perf_counter()
+    try:
+        totals = bulk_quote(read_records(stream, file_format))
+    except ValueError as error:
+        print("Error: %s" % error, file=sys.stderr)
+        return 1
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    
+    if args.json:
+        print(json.dumps(totals, indent=2))
+    else:
+        for room in totals["rooms"]:
+            print("Room %s: %.2f" % (room["name"], room["cost"]))
+            for paint, buckets in room["paint"].items():
+                print("    %s: %d buckets" % (paint.title(), buckets))
+        for paint, buckets in totals["total_paint"].items():
+            print("Total %s: %d buckets" % (paint.title(), buckets))
+        print("The total cost is: %.2f" % totals["total_cost"])
+    
+    print("Processed %d rows in %.2fs (%.0f rows/sec)" % (totals["rows"], elapsed, totals["rows"] / elapsed if elapsed else 0), file=sys.stderr)
+    return 0
+
 if __name__ == '__main__':
+    # Any arguments run a bulk quote instead of the interactive prompts
+    if len(sys.argv) > 1:
+        sys.exit(bulk_main(sys.argv[1:]))
+    
     # Create calculator object
     calculator = Calculator()
     
@@ -330,8 +346,9 @@ if __name__ == '__main__':
             # Cost per paint
             # Total buckets per paint required
         # Total Cost
-        input("The total cost is: %.2f" % calculator.calc_cost()).lower
-        if input == 'exit':
+        for paint, buckets in calculator.calc_paint().items():
+            print("Total %s: %d buckets" % (paint.name.title(), buckets))
+        if input("The total cost is: %.2f (type 'exit' to close) " % calculator.calc_cost()).lower() == 'exit':
             break
     
 
@@ -1,10 +1,48 @@
 import unittest
+from unittest import mock
 import math
-from enum import Enum
+import random
+
+import csv
+import io
+import json
+import os
+import pickle
+import sqlite3
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import paint_calc_core as core
+from paint_calc_core import Shape
+import paint_calculator
+import paint_calc_parallel
+import paint_calc_table
+import paint_calc_catalogue
+import benchmarks
+import paint_calc_profile
+import paint_calc_service
+import paint_calc_file
+import paint_calc_store
+import paint_calc_templates
+import paint_calc_gui
+import paint_calc_scenarios
+import paint_calc_geometry
+import paint_calc_uncertainty
+import paint_calc_cache
+import paint_calc_rooms
+import paint_calc_report
+import asyncio
 
 #########################################################################################
 ################################# Testing ###############################################
 #########################################################################################
+# Every shape with a fixed number of dimensions, for generating random walls
+FIXED_SHAPES = [shape for shape in core.Shape if shape is not core.Shape.POLYGON]
+
 class TestShapes(unittest.TestCase):
         ############### Shape-related tests ############### 
     def test_area_square(self):
@@ -41,7 +79,7 @@ class TestShapes(unittest.TestCase):
         for base in bases:
             for height in heights:
                 for top in tops:
-                    self.assertEqual(trap(base, height, top), ((top + base) // 2) * height)
+                    self.assertEqual(trap(base, height, top), ((top + base) / 2) * height)
     
     def test_area_triangle(self):
         bases = [1, 10, 100, 1000, 10000]   
@@ -64,7 +102,7 @@ class TestShapes(unittest.TestCase):
         scirc = Shape.SEMICIRCLE
   
         for radi in radis:
-            self.assertEqual(scirc(radi), (math.pi * pow(radi, 2)) // 2)
+            self.assertEqual(scirc(radi), (math.pi * pow(radi, 2)) / 2)
             
     def test_string_to_shape(self):
         self.assertEqual(Shape.to_shape('square'), Shape.SQUARE)
@@ -92,178 +130,1389 @@ class TestInputHandling(unittest.TestCase):
     def test_int_pos(self):
         pos_integers = ["1", "2", "10", "20", "250", "1050"]
         for i in pos_integers: 
-            self.assertEqual(get_int_input(i, True), "Valid Input")
-            self.assertEqual(get_int_input(i, False), "Valid Input")
+            self.assertIsNone(core.check_int_input(i, True))
+            self.assertIsNone(core.check_int_input(i, False))
     
     def test_int_negative(self):
         neg_integers = ["-1", "-2", '-10', "-20", "-250", "-1050"]
         for i in neg_integers: 
-            self.assertEqual(get_int_input(i, True), 'Error: Please enter a positive whole number: ')
-            self.assertEqual(get_int_input(i, False), 'Error: Please enter a positive, non zero, whole number: ')
+            self.assertEqual(core.check_int_input(i, True), 'Error: Please enter a positive whole number: ')
+            self.assertEqual(core.check_int_input(i, False), 'Error: Please enter a positive, non zero, whole number: ')
 
     def test_int_zero(self):
-        self.assertEqual(get_int_input("0", True), "Valid Input")
-        self.assertEqual(get_int_input("0", False), 'Error: Please enter a positive, non zero, whole number: ')
+        self.assertIsNone(core.check_int_input("0", True))
+        self.assertEqual(core.check_int_input("0", False), 'Error: Please enter a positive, non zero, whole number: ')
     
     def test_int_float(self):
         floats = ["1.0", "2.1", "10.21", "20.321", "250.4321", "1050.54321", "-1.0", "-2.1", "-10.21", "-20.321", "-250.4321", "-1050.54321"]
         for i in floats: 
-            self.assertEqual(get_int_input(i, True), 'Error: Please enter a positive whole number: ')
-            self.assertEqual(get_int_input(i, False), 'Error: Please enter a positive, non zero, whole number: ') 
+            self.assertEqual(core.check_int_input(i, True), 'Error: Please enter a positive whole number: ')
+            self.assertEqual(core.check_int_input(i, False), 'Error: Please enter a positive, non zero, whole number: ') 
     
     def test_int_string(self):
         strings = ["Test", "Wall", "Room", "La-Li-Lu-Le-Lo"]
         for i in strings:
-            self.assertEqual(get_int_input(i, True), 'Error: Please enter a positive whole number: ')
-            self.assertEqual(get_int_input(i, False), 'Error: Please enter a positive, non zero, whole number: ')  
+            self.assertEqual(core.check_int_input(i, True), 'Error: Please enter a positive whole number: ')
+            self.assertEqual(core.check_int_input(i, False), 'Error: Please enter a positive, non zero, whole number: ')  
 
     ############### Float-related tests ############### 
     def test_float_pos(self):
         pos_floats = ["1.0", "2.1", "10.21", "20.321", "250.4321", "1050.54321"]
         for i in pos_floats: 
-            self.assertEqual(get_float_input(i, True), "Valid Input")
-            self.assertEqual(get_float_input(i, False), "Valid Input")
+            self.assertIsNone(core.check_float_input(i, True))
+            self.assertIsNone(core.check_float_input(i, False))
     
     def test_float_negative(self):
         neg_floats = ["-1.0", "-2.1", "-10.21", "-20.321", "-250.4321", "-1050.54321"]
         for i in neg_floats: 
-            self.assertEqual(get_float_input(i, True), "Error: Please enter a positive number: ")
-            self.assertEqual(get_float_input(i, False), "Error: Please enter a positive, non zero, number: ")
+            self.assertEqual(core.check_float_input(i, True), "Error: Please enter a positive number: ")
+            self.assertEqual(core.check_float_input(i, False), "Error: Please enter a positive, non zero, number: ")
                
     def test_float_zero(self):
-        self.assertEqual(get_float_input("0", True), "Valid Input")
-        self.assertEqual(get_float_input("0", False), 'Error: Please enter a positive, non zero, number: ')
+        self.assertIsNone(core.check_float_input("0", True))
+        self.assertEqual(core.check_float_input("0", False), 'Error: Please enter a positive, non zero, number: ')
         
     def test_float_int(self):
         integers_pos = ["1", "2", "10", "20", "250", "1050"]
         integers_neg = ["-1", "-2", '-10', "-20", "-250", "-1050"]
         
         for i in integers_pos: 
-            self.assertEqual(get_float_input(i, True), 'Valid Input')
-            self.assertEqual(get_float_input(i, False), 'Valid Input') 
+            self.assertIsNone(core.check_float_input(i, True))
+            self.assertIsNone(core.check_float_input(i, False)) 
         
         for i in integers_neg: 
-            self.assertEqual(get_float_input(i, True), 'Error: Please enter a positive number: ')
-            self.assertEqual(get_float_input(i, False), 'Error: Please enter a positive, non zero, number: ')  
+            self.assertEqual(core.check_float_input(i, True), 'Error: Please enter a positive number: ')
+            self.assertEqual(core.check_float_input(i, False), 'Error: Please enter a positive, non zero, number: ')  
         
     def test_float_string(self):
         strings = ["Test", "Wall", "Room", "La-Li-Lu-Le-Lo"]
         for i in strings:
-            self.assertEqual(get_float_input(i, True), 'Error: Please enter a positive number: ')
-            self.assertEqual(get_float_input(i, False), 'Error: Please enter a positive, non zero, number: ')  
+            self.assertEqual(core.check_float_input(i, True), 'Error: Please enter a positive number: ')
+            self.assertEqual(core.check_float_input(i, False), 'Error: Please enter a positive, non zero, number: ')  
 
-#########################################################################################
-########################### Methods/Classes being tested ###############################
-#########################################################################################
-"""Methods have been altered to remove the GUI elements
-Now. they Just return a string used which reference "branch" has been addressed
-"""
-
-class Shape(Enum):
-    """Shapes store a lambda function used to evaluate their area
-    They can then be easily calculated if I store a shape object on a wall/obstacles/etc. 
-    """
-    SQUARE = lambda b: pow(b, 2)
-    RECTANGLE = lambda b, h: b * h
-    PARALLELOGRAM = lambda b, h: b * h
-    TRAPEZOID = lambda b, h, a: ((a + b) // 2) * h
-    TRIANGLE = lambda b, h: 0.5 * (b * h)
-    ELLIPSE = lambda b, a: math.pi * (a*b)
-    CIRCLE = lambda r: math.pi * pow(r, 2)
-    SEMICIRCLE = lambda r: (math.pi * pow(r, 2)) // 2
-    
-    def __call__(self, args):
-        """Override the usual call method to instead allow for the supplying of a variety of multiple args.
-        These args are then passed to the matching lambda function to calculate the respective area. 
-        """
-        return self.value[0](args)
-    
-    @classmethod
-    def to_shape(self, shape_name):
-        """This is a class method, meaning it does not need to be called on a Shape object.
-        The method is passed a string, which it will then attempt to return a matching shape for.  
-        Error handling is not needed, because the user will only ever select from a drop down. 
-        """
-        match shape_name:
-            case "square":
-                return Shape.SQUARE
-            case "rectangle":
-                return Shape.RECTANGLE
-            case "parallelogram":
-                return Shape.PARALLELOGRAM
-            case "trapezoid":
-                return Shape.TRAPEZOID
-            case "triangle":
-                return Shape.TRIANGLE
-            case "ellipse":
-                return Shape.ELLIPSE
-            case "circle":
-                return Shape.CIRCLE
-            case "semicircle":
-                return Shape.SEMICIRCLE
-            case _:
-                return None
-
-def get_float_input(usr_input, allow_zero):
-    """ Returns a provided string input as a float. 
-    When called, you can specify if you want the a valid input to be non-zero, or if zero can be included. 
-    """
-    # Temporary assignment of values
-    user_input = ""
-    valid_input = False
-    
-    # Loops until a valid input is given
-    # Attempt casting of string into float
-    try:
-        user_input = float(usr_input)
-        valid_input = True
-    except ValueError:
-        valid_input = False
-
-    # If the input is invalid, or if it's valid but less than 0, then:
-    if not valid_input or user_input < 0 or user_input == 0:
-        if allow_zero and user_input == 0:
-            return "Valid Input"
-        
-        text = "Error: Please enter a positive"
-        # Alter string if zero is not allowed as a valid input
-        if not allow_zero:
-            text += ", non zero,"
-        text += " number: "
-        
-        return text
-    elif valid_input:
-        return "Valid Input"
-
-def get_int_input(usr_input, allow_zero):
-    """ Returns a provided string input as a float. 
-    When called, you can specify if you want the a valid input to be non-zero, or if zero can be included. 
-    """
-    # Temporary assignment of values
-    user_input = ""
-    valid_input = False
-    
-    # Loops until a valid input is given
-    # Attempt casting of string into float
-    try:
-        user_input = int(usr_input)
-        valid_input = True
-    except ValueError:
-        valid_input = False
-
-    # If the input is invalid, or if it's valid but less than 0, then:
-    if not valid_input or user_input < 0 or user_input == 0:
-        if allow_zero and user_input == 0:
-            return "Valid Input"
-        
-        text = "Error: Please enter a positive"
-        # Alter string if zero is not allowed as a valid input
-        if not allow_zero:
-            text += ", non zero,"
-        text += " whole number: "
-        return text
-    elif valid_input:
-        return "Valid Input"
+class TestEstimate(unittest.TestCase):
+    ############### Headless estimation tests ############### 
+    def test_wall_buckets(self):
+        # 4m x 3m = 12m^2, 2 coats at 12m^2 per litre = 2 litres. One 2.5 litre bucket of white. 
+        wall = core.Wall(core.Shape.RECTANGLE, (4, 3), core.Paint.WHITE, 2)
+        self.assertEqual(wall.area(), 12)
+        self.assertEqual(wall.required_buckets(), 1)
+        self.assertEqual(wall.get_cost(), 45)
+    
+    def test_wall_obstacles(self):
+        door = core.Obstacle(core.Shape.RECTANGLE, (1, 2))
+        wall = core.Wall(core.Shape.SQUARE, (5,), core.Paint.COTTON, 1, [door])
+        self.assertEqual(wall.area(), 23)
+        
+        # Obstacles larger than the wall do not produce a negative area
+        wall = core.Wall(core.Shape.SQUARE, (1,), core.Paint.COTTON, 1, [door])
+        self.assertEqual(wall.area(), 0)
+        self.assertEqual(wall.required_buckets(), 1)
+    
+    def test_estimate_document(self):
+        document = {"rooms": [
+            {"name": "Kitchen", "walls": [
+                {"shape": "rectangle", "dimensions": [4, 3], "paint": "white", "coats": 2}, 
+                {"shape": "rectangle", "dimensions": [10, 3], "paint": "ivory", "coats": 3, 
+                 "obstacles": [{"shape": "rectangle", "dimensions": [1, 2]}]}
+            ]}, 
+            {"name": "Hall", "walls": [{"shape": "square", "dimensions": [3], "paint": "white"}]}
+        ]}
+        
+        result = core.estimate(document)
+        self.assertEqual(result["total_cost"], 45 + 20 + 45)
+        self.assertEqual(result["total_paint"], {"white": 2, "ivory": 2})
+        self.assertEqual(result["rooms"][0], {"name": "Kitchen", "cost": 65, "paint": {"white": 1, "ivory": 2}})
+        self.assertEqual(core.estimate(core.load_project(document)), result)
+    
+    def test_load_project_invalid(self):
+        invalid_walls = [
+            {"shape": "hexagon", "dimensions": [1]}, 
+            {"shape": "rectangle", "dimensions": [1]}, 
+            {"shape": "square", "dimensions": [-1]}, 
+            {"shape": "square", "dimensions": [1], "paint": "mauve"}, 
+            {"shape": "square", "dimensions": [1], "coats": -2}, 
+            {"shape": "square", "dimensions": ["nan"]}, 
+            {"shape": "rectangle", "dimensions": [2, math.inf]}, 
+            {"shape": "square", "dimensions": [1], "obstacles": [{"shape": "square", "dimensions": ["inf"]}]}, 
+            {"shape": "square", "dimensions": [1], "coats": 2.7}, 
+            {"shape": "square", "dimensions": [1], "coats": "two"}, 
+            {"shape": "square", "dimensions": [1], "coats": 0}, 
+            {"shape": "square", "dimensions": None}, 
+            {"shape": "polygon", "vertices": [1, 2, 3]}, 
+            {"shape": "square", "dimensions": [2], "obstacles": [{"shape": "square", "dimensions": [1], "position": 5}]}
+        ]
+        for wall in invalid_walls:
+            with self.assertRaises(ValueError):
+                core.load_project({"rooms": [{"name": "Bad", "walls": [wall]}]})
+            self.assertIsInstance(paint_calc_service.quote_batch([{"rooms": [{"name": "Bad", "walls": [wall]}]}])[0], ValueError)
+        
+        # Coats given as a whole float or a string are still read
+        for coats in (2.0, "2"):
+            self.assertEqual(core.wall_from_dict({"shape": "square", "dimensions": [1], "coats": coats}).get_coats(), 2)
+    
+    def test_read_rows(self):
+        rows = [
+            {"kind": "wall", "shape": "Rectangle", "dim1": "4", "dim2": "2.5", "dim3": "", "paint": "White", "coats": "2"}, 
+            {"kind": "obstacle", "shape": "Rectangle", "dim1": "0.9", "dim2": "2", "dim3": ""}, 
+            {"kind": "wall", "shape": "Square", "dim1": "3", "dim2": "ignored", "dim3": "", "paint": "Emerald", "coats": "1"}
+        ]
+        walls, errors = core.read_rows(rows)
+        self.assertEqual(errors, {})
+        self.assertEqual([wall.area() for wall in walls], [8.2, 9])
+        self.assertEqual(len(walls[0].get_obstacles()), 1)
+        
+        rows[0]["dim2"] = "tall"
+        rows[2]["coats"] = "0"
+        walls, errors = core.read_rows([rows[1]] + rows)
+        self.assertEqual(walls, [])
+        self.assertEqual(sorted(errors), [(0, "kind"), (1, "dim2"), (3, "coats")])
+
+class TestBatchAreas(unittest.TestCase):
+    ############### Batch area tests ############### 
+    def setUp(self):
+        rand = random.Random(7)
+        self.shapes = [rand.choice(FIXED_SHAPES) for i in range(500)]
+        self.rows = [[rand.uniform(0, 50) for n in range(shape.num_of_dimensions())] for shape in self.shapes]
+    
+    def check_areas(self, areas):
+        self.assertEqual(len(areas), len(self.shapes))
+        for shape, row, area in zip(self.shapes, self.rows, areas):
+            self.assertEqual(area, shape(*row))
+    
+    def test_shape_codes(self):
+        for shape in core.Shape:
+            self.assertIs(core.Shape.from_code(shape.code()), shape)
+    
+    def test_calc_areas(self):
+        columns = core.dimension_columns(self.rows)
+        self.check_areas(core.calc_areas(self.shapes, columns))
+        self.check_areas(core.calc_areas([shape.code() for shape in self.shapes], columns))
+    
+    def test_calc_areas_without_numpy(self):
+        with mock.patch.object(core, "np", None):
+            self.check_areas(core.calc_areas(self.shapes, core.dimension_columns(self.rows)))
+    
+    def test_calc_area_batch(self):
+        wall = core.Wall()
+        self.check_areas(wall._calc_area(self.shapes, self.rows))
+    
+    def test_polygons(self):
+        # A gable end: a 4m wide wall, 2.5m to the eaves and 3.5m to the ridge
+        gable = (0, 0, 4, 0, 4, 2.5, 2, 3.5, 0, 2.5)
+        self.assertEqual(core.Shape.POLYGON(*gable), 12)
+        self.assertEqual(core.Shape.POLYGON(0, 0, 0, 1, 1, 1, 1, 0), 1)
+        
+        polygons = benchmarks.generate_polygons(300) + [gable]
+        expected = [core.Shape.POLYGON(*polygon) for polygon in polygons]
+        packed = core.pack_polygons(polygons)
+        self.assertEqual(list(core.polygon_areas(*packed)), expected)
+        with mock.patch.object(core, "np", None):
+            self.assertEqual(list(core.polygon_areas(*packed)), expected)
+        
+        # Polygons are measured in the same batch as every other shape
+        shapes = self.shapes[:50] + [core.Shape.POLYGON] * len(polygons) + self.shapes[50:]
+        rows = self.rows[:50] + polygons + self.rows[50:]
+        areas = list(core.surface_areas(shapes, rows))
+        self.assertEqual(areas, [shape(*row) for shape, row in zip(shapes, rows)])
+        with self.assertRaises(ValueError):
+            core.calc_areas(shapes, core.dimension_columns(self.rows))
+    
+    def test_polygon_documents(self):
+        vertices = [[0, 0], [4, 0], [4, 2.5], [2, 3.5], [0, 2.5]]
+        document = {"rooms": [{"name": "Loft", "walls": [{"shape": "polygon", "vertices": vertices, "obstacles": [{"shape": "square", "dimensions": [1]}]}]}]}
+        wall = core.load_project(document)[0].get_walls()[0]
+        self.assertEqual(wall.area(), 11)
+        self.assertEqual(paint_calc_service.quote_batch([document])[0], core.estimate(document))
+        
+        for vertices in ([[0, 0], [1, 1]], [[0, 0, 1], [1, 1], [2, 0]], [[0, 0], [1, "inf"], [2, 0]]):
+            with self.assertRaises(ValueError):
+                core.load_project({"rooms": [{"walls": [{"shape": "polygon", "vertices": vertices}]}]})
+        self.assertEqual(wall._calc_area([core.Shape.SQUARE], [(3,)]), [9])
+        
+        # Polygon walls and obstacles keep their vertices when saved
+        document["rooms"][0]["walls"].append({"shape": "square", "dimensions": [3], "obstacles": [{"shape": "polygon", "vertices": [[0, 0], [1, 0], [0, 1]]}]})
+        rooms = core.load_project(document)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "polygon.pcalc")
+            paint_calc_file.save_project(path, rooms)
+            saved = paint_calc_file.load_project(path)
+            self.assertEqual(paint_calc_file.aggregate_file(path), paint_calc_table.WallTable.from_rooms(rooms).aggregate())
+        with paint_calc_store.ProjectStore() as store:
+            store.add_rooms(rooms)
+            stored = store.load_rooms()
+        for loaded in (saved, stored):
+            self.assertEqual([(wall.get_shape(), wall.get_dimensions(), [obstacle.get_dimensions() for obstacle in wall.get_obstacles()]) for wall in loaded[0].get_walls()], 
+                             [(wall.get_shape(), wall.get_dimensions(), [obstacle.get_dimensions() for obstacle in wall.get_obstacles()]) for wall in rooms[0].get_walls()])
+            self.assertEqual(core.estimate(loaded), core.estimate(rooms))
+
+class TestRunningTotals(unittest.TestCase):
+    ############### Incremental total tests ############### 
+    def check_totals(self, project):
+        # The running totals must always match the totals of every wall calculated from scratch 
+        for room in project.get_rooms():
+            self.assertAlmostEqual(room.get_cost(), sum(wall.get_cost() for wall in room.get_walls()))
+            self.assertAlmostEqual(room.get_area(), sum(wall.area() for wall in room.get_walls()))
+        walls = [wall for room in project.get_rooms() for wall in room.get_walls()]
+        self.assertAlmostEqual(project.get_cost(), sum(wall.get_cost() for wall in walls))
+        expected_paint = {}
+        for wall in walls:
+            expected_paint[wall.get_paint()] = expected_paint.get(wall.get_paint(), 0) + wall.required_buckets()
+        self.assertEqual(project.get_paint(), expected_paint)
+    
+    def test_edits(self):
+        door = core.Obstacle(core.Shape.RECTANGLE, (1, 2))
+        wall = core.Wall(core.Shape.RECTANGLE, (10, 3), core.Paint.IVORY, 3, [door])
+        kitchen = core.Room("Kitchen", [wall, core.Wall(core.Shape.SQUARE, (4,), core.Paint.WHITE, 2)])
+        project = core.Project([kitchen])
+        self.check_totals(project)
+        
+        # Walls and rooms added after the project was made
+        hall = core.Room("Hall")
+        project.add_room(hall)
+        hall.add_wall(core.Wall(core.Shape.TRIANGLE, (6, 2), core.Paint.COTTON, 1, [door]))
+        self.check_totals(project)
+        
+        # Editing walls and obstacles
+        wall.set_paint(core.Paint.PEBBLE, 5)
+        wall.set_area(core.Shape.RECTANGLE, (20, 3))
+        door.set_area(core.Shape.RECTANGLE, (2, 2.5))
+        wall.add_obstacle(core.Obstacle(core.Shape.CIRCLE, (0.5,)))
+        self.check_totals(project)
+        
+        # Removing obstacles, walls and rooms
+        wall.remove_obstacle(door)
+        kitchen.remove_wall(wall)
+        self.check_totals(project)
+        project.remove_room(hall)
+        self.check_totals(project)
+        self.assertEqual(project.get_paint(), {core.Paint.WHITE: 2})
+    
+    def test_single_owner(self):
+        wall = core.Wall()
+        core.Room("Kitchen", [wall])
+        with self.assertRaises(ValueError):
+            core.Room("Hall", [wall])
+
+class TestBulkQuote(unittest.TestCase):
+    ############### Streaming bulk quote tests ############### 
+    def test_csv(self):
+        stream = io.StringIO("room,kind,shape,dim1,dim2,dim3,paint,coats\n"
+                             "Kitchen,wall,rectangle,4,3,,white,2\n"
+                             "Kitchen,wall,rectangle,10,3,,ivory,3\n"
+                             "Kitchen,obstacle,rectangle,1,2,,,\n"
+                             "Hall,,square,3,,,white,\n")
+        totals = paint_calculator.bulk_quote(paint_calculator.read_records(stream, "csv"))
+        self.assertEqual(totals["rows"], 4)
+        self.assertEqual(totals["total_cost"], 110)
+        self.assertEqual(totals["total_paint"], {"white": 2, "ivory": 2})
+        self.assertEqual(totals["rooms"][0], {"name": "Kitchen", "cost": 65, "paint": {"white": 1, "ivory": 2}})
+    
+    def test_jsonl_matches_estimate(self):
+        walls = [
+            {"room": "Kitchen", "shape": "rectangle", "dimensions": [10, 3], "paint": "ivory", "coats": 3, 
+             "obstacles": [{"shape": "rectangle", "dimensions": [1, 2]}]}, 
+            {"room": "Hall", "shape": "trapezoid", "dimensions": [3, 2, 1], "paint": "cotton", "coats": 1}
+        ]
+        stream = io.StringIO("\n".join(json.dumps(wall) for wall in walls))
+        totals = paint_calculator.bulk_quote(paint_calculator.read_records(stream, "jsonl"))
+        
+        document = {"rooms": [{"name": wall["room"], "walls": [wall]} for wall in walls]}
+        result = core.estimate(document)
+        self.assertEqual(totals["total_cost"], result["total_cost"])
+        self.assertEqual(totals["total_paint"], result["total_paint"])
+    
+    def test_invalid_record(self):
+        stream = io.StringIO('{"kind": "obstacle", "shape": "square", "dimensions": [1]}\n')
+        with self.assertRaises(ValueError):
+            paint_calculator.bulk_quote(paint_calculator.read_records(stream, "jsonl"))
+
+class TestParallelEstimate(unittest.TestCase):
+    ############### Parallel estimation tests ############### 
+    def setUp(self):
+        rand = random.Random(11)
+        rooms = []
+        for index in range(40):
+            walls = []
+            for n in range(rand.randint(1, 12)):
+                shape = rand.choice(FIXED_SHAPES)
+                walls.append({"shape": shape.name.lower(), "paint": rand.choice(list(core.Paint)).name.lower(), "coats": rand.randint(1, 3), 
+                              "dimensions": [rand.uniform(0.5, 12) for i in range(shape.num_of_dimensions())]})
+            rooms.append({"name": "Room %d" % index, "walls": walls})
+        self.document = {"rooms": rooms}
+    
+    def test_matches_serial(self):
+        serial = paint_calc_parallel.parallel_estimate(self.document, workers=1)
+        parallel = paint_calc_parallel.parallel_estimate(self.document, workers=2, chunk_size=3)
+        self.assertEqual(parallel, serial)
+        
+        result = core.estimate(self.document)
+        self.assertEqual(parallel["total_cost"], result["total_cost"])
+        self.assertEqual(parallel["total_paint"], result["total_paint"])
+    
+    def test_merge_order(self):
+        # Totals are identical however the rooms are split into shards 
+        rooms = core.load_project(self.document)
+        expected = paint_calc_parallel.parallel_estimate(rooms, workers=1, chunk_size=len(rooms))
+        for chunk_size in (1, 7, 13):
+            result = paint_calc_parallel.parallel_estimate(rooms, workers=1, chunk_size=chunk_size)
+            self.assertEqual(result["total_area"], expected["total_area"])
+            self.assertEqual(result["total_cost"], expected["total_cost"])
+    
+    def test_detached_shards(self):
+        # Rooms within a project are sent to workers as plain values, rather than pickling the whole project with them
+        project = core.Project(core.load_project(self.document))
+        project.get_rooms()[0].get_walls()[0].add_obstacle(core.Obstacle(core.Shape.SQUARE, (0.5,), (0.1, 0.1)))
+        sent = []
+        class Executor():
+            def __init__(self, max_workers):
+                pass
+            def __enter__(self):
+                return self
+            def __exit__(self, *exc):
+                return False
+            def map(self, function, shards):
+                sent.extend(shards)
+                return map(function, shards)
+        
+        with mock.patch.object(paint_calc_parallel, "ProcessPoolExecutor", Executor):
+            result = paint_calc_parallel.parallel_estimate(project.get_rooms(), workers=2, chunk_size=7)
+        self.assertEqual(result, paint_calc_parallel.parallel_estimate(project.get_rooms(), workers=1, chunk_size=7))
+        self.assertFalse(any(isinstance(room, core.Room) for shard in sent for room in shard))
+        for shard in sent:
+            pickle.dumps(shard)
+        
+        # The real pool gives the same totals
+        self.assertEqual(paint_calc_parallel.parallel_estimate(project.get_rooms(), workers=2, chunk_size=7), result)
+    
+    def test_portfolio(self):
+        # Buildings are given as separate project documents 
+        rooms = self.document["rooms"]
+        portfolio = [{"rooms": rooms[:15]}, {"rooms": rooms[15:]}]
+        self.assertEqual(paint_calc_parallel.parallel_estimate(portfolio, workers=1), 
+                         paint_calc_parallel.parallel_estimate(self.document, workers=1))
+
+class TestWallTable(unittest.TestCase):
+    ############### Columnar storage tests ############### 
+    def setUp(self):
+        rand = random.Random(5)
+        self.rooms = []
+        for index in range(20):
+            walls = []
+            for n in range(rand.randint(0, 10)):
+                shape = rand.choice(FIXED_SHAPES)
+                obstacles = [core.Obstacle(core.Shape.RECTANGLE, (rand.uniform(0.5, 2), rand.uniform(0.5, 2.5))) for i in range(rand.randint(0, 3))]
+                walls.append(core.Wall(shape, [rand.uniform(1, 6) for i in range(shape.num_of_dimensions())], 
+                                       rand.choice(list(core.Paint)), rand.randint(1, 3), obstacles))
+            self.rooms.append(core.Room("Room %d" % index, walls))
+        self.table = paint_calc_table.WallTable.from_rooms(self.rooms)
+    
+    def test_views(self):
+        walls = [wall for room in self.rooms for wall in room.get_walls()]
+        self.assertEqual(len(self.table), len(walls))
+        for wall, view in zip(walls, self.table):
+            self.assertEqual(view.area(), wall.area())
+            self.assertEqual(view.required_buckets(), wall.required_buckets())
+            self.assertEqual(view.get_cost(), wall.get_cost())
+            self.assertIs(view.get_paint(), wall.get_paint())
+    
+    def test_aggregate(self):
+        expected = paint_calc_parallel.parallel_estimate(self.rooms, workers=1)
+        for result in (self.table.aggregate(), self.without_numpy()):
+            self.assertEqual(result["total_cost"], expected["total_cost"])
+            self.assertEqual(result["total_paint"], expected["total_paint"])
+            self.assertEqual(result["total_area"], expected["total_area"])
+            for room, expected_room in zip(result["rooms"], expected["rooms"]):
+                self.assertEqual(room["cost"], expected_room["cost"])
+                self.assertEqual(room["area"], expected_room["area"])
+                self.assertEqual(room["paint"], expected_room["paint"])
+    
+    def without_numpy(self):
+        with mock.patch.object(paint_calc_table, "np", None):
+            return self.table.aggregate()
+    
+    def test_bytes_per_wall(self):
+        table = paint_calc_table.WallTable()
+        room = table.add_room("Hall")
+        table.extend([room] * 1000, [10.0] * 1000, [core.Paint.WHITE.code()] * 1000, [2] * 1000)
+        self.assertLess(table.nbytes() / len(table), 64)
+        self.assertEqual(table.aggregate()["total_paint"], {"white": 1000})
+
+class TestCatalogue(unittest.TestCase):
+    ############### Paint catalogue tests ############### 
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "paints.csv")
+        self.write("sku,name,family,price,litres,coverage\n"
+                   "DX-001,Pure White,white,30,2.5,12\n"
+                   "DX-002,Chalk,white,15,1,10\n"
+                   "DX-003,Forest,green,25,5,13\n")
+        self.catalogue = paint_calc_catalogue.Catalogue(self.path)
+        self.addCleanup(core.use_catalogue, None)
+    
+    def write(self, text):
+        with open(self.path, "w") as file:
+            file.write(text)
+    
+    def test_lookup(self):
+        self.assertEqual(len(self.catalogue), 3)
+        self.assertEqual(self.catalogue.by_sku("DX-002").name, "Chalk")
+        self.assertIs(self.catalogue.get("pure white"), self.catalogue.by_sku("DX-001"))
+        self.assertEqual([paint.sku for paint in self.catalogue.by_family("White")], ["DX-001", "DX-002"])
+        self.assertIsNone(self.catalogue.get("Magnolia"))
+    
+    def test_wall_uses_entry(self):
+        # 10m x 3m, 2 coats at 10m^2 per litre = 6 litres. Six 1 litre buckets of chalk. 
+        wall = core.Wall(core.Shape.RECTANGLE, (10, 3), self.catalogue.get("DX-002"), 2)
+        self.assertEqual(wall.required_buckets(), 6)
+        self.assertEqual(wall.get_cost(), 90)
+        
+        core.use_catalogue(self.catalogue)
+        result = core.estimate({"rooms": [{"name": "Hall", "walls": [{"shape": "square", "dimensions": [3], "paint": "Forest"}]}]})
+        # Catalogue paints are keyed by SKU, as their names may be shared
+        self.assertEqual(result["total_paint"], {"DX-003": 1})
+    
+    def test_shared_names(self):
+        self.write("sku,name,family,price,litres,coverage\n"
+                   "WK-WHITE-1,White,white,55,2.5,12\n"
+                   "WK-WHITE-2,White,white,30,1,12\n")
+        self.catalogue.reload()
+        core.use_catalogue(self.catalogue)
+        walls = [{"shape": "square", "dimensions": [2], "paint": sku} for sku in ("WK-WHITE-1", "WK-WHITE-2")]
+        document = {"rooms": [{"name": "Hall", "walls": walls}]}
+        rooms = core.load_project(document)
+        store = paint_calc_store.ProjectStore()
+        self.addCleanup(store.close)
+        store.add_rooms(core.Project(core.load_project(document)))
+        records = [dict(wall, dimensions=[2], room="Hall") for wall in walls]
+        
+        expected = {"WK-WHITE-1": 1, "WK-WHITE-2": 1}
+        for result in (core.estimate(document), paint_calc_table.WallTable.from_rooms(rooms).aggregate(), paint_calc_parallel.parallel_estimate(rooms, workers=1), 
+                       store.estimate(), paint_calculator.bulk_quote(records), paint_calc_service.quote_batch([document])[0]):
+            self.assertEqual(result["total_paint"], expected)
+            self.assertEqual(result["total_cost"], 85)
+        self.assertEqual(set(paint_calc_uncertainty.simulate(rooms, 20)["paint"]), set(expected))
+        for source in (core.Project(rooms), paint_calc_table.WallTable.from_rooms(rooms)):
+            paints = {level: rows for level, rows in paint_calc_report.sections(source)}["paint"]
+            self.assertEqual({row[0]: row[3] for row in paints}, expected)
+    
+    def test_saved_keys(self):
+        # A built in paint saved before a catalogue is used is not swapped for a catalogue paint of the same name
+        path = os.path.join(os.path.dirname(self.path), "project.db")
+        rooms = [core.Room("Hall", [core.Wall(core.Shape.SQUARE, (2,), core.Paint.WHITE, 2)])]
+        with paint_calc_store.ProjectStore(path) as store:
+            store.add_rooms(rooms)
+        self.write("sku,name,family,price,litres,coverage\n"
+                   "WK-WHITE-1,White,white,55,2.5,12\n")
+        self.catalogue.reload()
+        core.use_catalogue(self.catalogue)
+        self.assertIs(core.paint_from_key("white"), core.Paint.WHITE)
+        self.assertIs(core.paint_from_key("WK-WHITE-1"), self.catalogue.get("WK-WHITE-1"))
+        with paint_calc_store.ProjectStore(path) as store:
+            self.assertIs(store.load_rooms()[0].get_walls()[0].get_paint(), core.Paint.WHITE)
+            store.add_rooms(rooms)
+            self.assertEqual(store.total_paint(), {core.Paint.WHITE: 2 * rooms[0].get_paint()[core.Paint.WHITE]})
+    
+    def test_reload(self):
+        chalk = self.catalogue.get("DX-002")
+        project = core.Project([core.Room("Hall", [core.Wall(core.Shape.RECTANGLE, (10, 3), chalk, 2)])])
+        table = paint_calc_table.WallTable.from_rooms(project.get_rooms())
+        store = paint_calc_store.ProjectStore()
+        self.addCleanup(store.close)
+        store.add_rooms(project)
+        self.assertEqual(project.get_cost(), 90)
+        
+        # Chalk now costs 40 per bucket, and comes in 2 litre buckets 
+        self.write("sku,name,family,price,litres,coverage\n"
+                   "DX-002,Chalk,white,40,2,10\n")
+        self.catalogue.reload()
+        self.assertIs(self.catalogue.get("DX-002"), chalk)
+        self.assertIsNone(self.catalogue.get("DX-001"))
+        self.assertEqual(project.get_cost(), 120)
+        self.assertEqual(project.get_paint(), {chalk: 3})
+        self.assertEqual(table.aggregate()["total_cost"], 120)
+        self.assertEqual(store.total_cost(), 120)
+        self.assertEqual(store.total_paint(), {chalk: 3})
+    
+    def test_invalid_file(self):
+        self.write("sku,name,family,price,litres,coverage\n"
+                   "DX-001,Pure White,white,thirty,2.5,12\n")
+        with self.assertRaises(ValueError):
+            self.catalogue.reload()
+        self.assertEqual(len(self.catalogue), 3)
+        
+        # A duplicate SKU is found before any paint is changed, so the running totals still match
+        chalk = self.catalogue.get("DX-002")
+        value = chalk.value
+        project = core.Project([core.Room("Hall", [core.Wall(core.Shape.RECTANGLE, (10, 3), chalk, 2)])])
+        self.write("sku,name,family,price,litres,coverage\n"
+                   "DX-002,Chalk,white,99,1,1\n"
+                   "DX-002,Chalk,white,40,2,10\n")
+        with self.assertRaises(ValueError):
+            self.catalogue.reload()
+        self.assertEqual(chalk.value, value)
+        self.assertEqual(project.get_cost(), project.get_rooms()[0].get_walls()[0].get_cost())
+
+class TestBenchmarks(unittest.TestCase):
+    ############### Benchmark suite tests ############### 
+    def test_generators(self):
+        document = benchmarks.generate_document(45, walls_per_room=20)
+        self.assertEqual([len(room["walls"]) for room in document["rooms"]], [20, 20, 5])
+        self.assertEqual(document, benchmarks.generate_document(45, walls_per_room=20))
+        self.assertEqual(len(benchmarks.generate_table(45)), 45)
+    
+    def test_compare(self):
+        baseline = {"a@10": 1.0, "b@10": 2.0}
+        results = {"a@10": 1.1, "b@10": 3.0, "c@10": 0.5}
+        lines, regressions = benchmarks.compare(results, baseline, 20)
+        self.assertEqual(regressions, ["b@10"])
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(benchmarks.compare(results, baseline, 60)[1], [])
+    
+    def test_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            options = ["--only", "shape_area", "--sizes", "10", "--repeat", "1", "--baseline", path]
+            # Comparing without a baseline fails, rather than passing with every benchmark new
+            with mock.patch("sys.stderr", io.StringIO()) as stderr:
+                self.assertEqual(benchmarks.main(options), 2)
+            self.assertIn("No baseline", stderr.getvalue())
+            with mock.patch("sys.stdout", io.StringIO()):
+                self.assertEqual(benchmarks.main(options + ["--save"]), 0)
+                self.assertEqual(benchmarks.main(options + ["--threshold", "1000000"]), 0)
+    
+    def test_run(self):
+        results = benchmarks.run_benchmarks([50], ["shape_area", "table_aggregate"], repeat=1)
+        self.assertEqual(sorted(results), ["shape_area@50", "table_aggregate@50"])
+        
+        # Start up is run exactly as many times as asked, and fewer than one run is an error
+        with mock.patch.object(benchmarks.subprocess, "run", return_value=mock.Mock(stdout="0.5")) as run:
+            self.assertEqual(benchmarks.measure_startup(2), 0.5)
+        self.assertEqual(run.call_count, 2)
+        with mock.patch("sys.stderr", io.StringIO()), self.assertRaises(SystemExit):
+            benchmarks.main(["--repeat", "0", "--save"])
+    
+    def test_lazy_imports(self):
+        # Neither front end, nor a quote of a few walls, should import NumPy or the GUI toolkit
+        code = ("import sys, paint_calc_core, paint_calc_gui, paint_calculator; "
+                "paint_calc_core.estimate({'rooms': [{'walls': [{'shape': 'square', 'dimensions': [3]}]}]}); "
+                "print([name for name in ('numpy', 'PySimpleGUI', 'tkinter') if name in sys.modules])")
+        result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+class TestProfile(unittest.TestCase):
+    ############### Instrumentation tests ############### 
+    def setUp(self):
+        paint_calc_profile.reset()
+        self.addCleanup(paint_calc_profile.reset)
+    
+    def test_disabled(self):
+        with mock.patch.object(paint_calc_profile, "_enabled", False):
+            func = lambda: 1
+            self.assertIs(paint_calc_profile.timed("test")(func), func)
+            with paint_calc_profile.span("test"):
+                paint_calc_profile.count("test.walls", 5)
+        self.assertEqual(paint_calc_profile.summary(), {"spans": {}, "counters": {}})
+    
+    def test_enabled(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        trace = os.path.join(directory.name, "trace.json")
+        
+        with mock.patch.object(paint_calc_profile, "_enabled", True), mock.patch.object(paint_calc_profile, "_trace_path", trace):
+            func = paint_calc_profile.timed("test.func")(lambda x: x * 2)
+            self.assertEqual(func(2), 4)
+            self.assertEqual(func(3), 6)
+            with paint_calc_profile.span("test.span"):
+                paint_calc_profile.count("test.walls", 5)
+            paint_calc_profile.write_trace(trace)
+        
+        summary = paint_calc_profile.summary()
+        self.assertEqual(summary["spans"]["test.func"]["calls"], 2)
+        self.assertGreaterEqual(summary["spans"]["test.func"]["total"], summary["spans"]["test.func"]["max"])
+        self.assertEqual(summary["counters"], {"test.walls": 5})
+        with open(trace) as file:
+            events = json.load(file)["traceEvents"]
+        self.assertEqual([event["name"] for event in events], ["test.func", "test.func", "test.span"])
+        self.assertEqual(events[0]["ph"], "X")
+
+    def test_cli_spans(self):
+        # Only the work of the calculator is timed, never the time spent waiting at a prompt
+        answers = iter(["1", "Hall", "y", "y", "4", "3", "2.4", "white", "1", "n", "0", "0"])
+        with mock.patch.object(paint_calc_profile, "_enabled", True), mock.patch("builtins.input", lambda prompt="": next(answers)), \
+             mock.patch("sys.stdout", io.StringIO()):
+            calculator = paint_calculator.Calculator()
+        self.assertEqual(calculator.calc_cost(), 180)
+        spans = paint_calc_profile.summary()["spans"]
+        self.assertLessEqual({"cli.generate_plan", "cli.build_project"}, set(spans))
+        self.assertFalse([name for name in spans if name.startswith("cli.get_")])
+
+class TestQuoteService(unittest.TestCase):
+    ############### Quoting service tests ############### 
+    def test_quote_batch(self):
+        documents = [benchmarks.generate_document(12, seed) for seed in range(5)]
+        documents.insert(2, {"rooms": [{"walls": [{"shape": "circle", "dimensions": [1, 2]}]}]})
+        results = paint_calc_service.quote_batch(documents)
+        
+        self.assertIsInstance(results[2], ValueError)
+        for document, result in zip(documents[:2] + documents[3:], results[:2] + results[3:]):
+            self.assertEqual(result, core.estimate(document))
+        
+        # Coats too large for the table only fail their own document
+        for wall in ({"shape": "square", "dimensions": [1], "coats": 70000}, 
+                     {"shape": "square", "dimensions": [1], "coats": 70000, "obstacles": [{"shape": "square", "dimensions": [0.5], "position": [0, 0]}]}):
+            results = paint_calc_service.quote_batch([{"rooms": [{"walls": [wall]}]}, documents[0]])
+            self.assertIsInstance(results[0], ValueError)
+            self.assertEqual(results[1], core.estimate(documents[0]))
+    
+    def test_server(self):
+        documents = [benchmarks.generate_document(6, seed) for seed in range(20)]
+        
+        async def run():
+            server = paint_calc_service.QuoteServer(port=0)
+            await server.start()
+            client = await paint_calc_service.QuoteClient.connect(*server.get_address()[:2])
+            try:
+                responses = await asyncio.gather(*(client.quote(document) for document in documents))
+                error = await client.quote({"id": 3, "rooms": [{"walls": [{"shape": "square", "dimensions": [1], "paint": "mauve"}]}]})
+            finally:
+                await client.close()
+                await server.close()
+            return responses, error
+        
+        responses, error = asyncio.run(run())
+        self.assertEqual(responses, [core.estimate(document) for document in documents])
+        self.assertEqual(error, {"id": 3, "error": "Unknown paint: 'mauve'"})
+    
+    def test_batch_failure(self):
+        # An unexpected error in one document of a batch is only sent to that request, and every connection stays open
+        quote_batch = paint_calc_service.quote_batch
+        def failing(documents):
+            if any(document.get("id") == "bad" for document in documents):
+                raise OverflowError("unsigned short is greater than maximum")
+            return quote_batch(documents)
+        document = benchmarks.generate_document(4)
+        
+        async def run():
+            server = paint_calc_service.QuoteServer(port=0, batcher=paint_calc_service.QuoteBatcher(max_delay=0.05))
+            await server.start()
+            clients = [await paint_calc_service.QuoteClient.connect(*server.get_address()[:2]) for index in range(2)]
+            try:
+                responses = await asyncio.gather(clients[0].quote(dict(document, id="bad")), clients[1].quote(dict(document, id="good")))
+                responses.append(await clients[0].quote(dict(document, id="after")))
+            finally:
+                for client in clients:
+                    await client.close()
+                await server.close()
+            return responses
+        
+        with mock.patch.object(paint_calc_service, "quote_batch", failing):
+            bad, good, after = asyncio.run(run())
+        self.assertEqual(bad, {"id": "bad", "error": "Could not quote the document: unsigned short is greater than maximum"})
+        self.assertEqual(good, dict(core.estimate(document), id="good"))
+        self.assertEqual(after, dict(core.estimate(document), id="after"))
+
+class TestProjectFile(unittest.TestCase):
+    ############### Project file tests ############### 
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "project" + paint_calc_file.EXTENSION)
+        self.rooms = core.load_project(benchmarks.generate_document(200))
+        paint_calc_file.save_project(self.path, core.Project(self.rooms))
+    
+    def test_round_trip(self):
+        rooms = paint_calc_file.load_project(self.path)
+        self.assertEqual([room.get_name() for room in rooms], [room.get_name() for room in self.rooms])
+        self.assertEqual(core.estimate(rooms), core.estimate(self.rooms))
+    
+    def test_aggregate(self):
+        expected = paint_calc_table.WallTable.from_rooms(self.rooms).aggregate()
+        self.assertEqual(paint_calc_file.aggregate_file(self.path), expected)
+        with paint_calc_file.ProjectFile(self.path) as project_file:
+            self.assertEqual(len(project_file), 200)
+            self.assertEqual(project_file.to_table().aggregate(), expected)
+    
+    def test_invalid(self):
+        with open(self.path, "rb") as file:
+            data = file.read()
+        
+        with open(self.path, "wb") as file:
+            file.write(data[:-1])
+        self.assertRaises(ValueError, paint_calc_file.ProjectFile, self.path)
+        
+        with open(self.path, "wb") as file:
+            file.write(data[:8] + b"\x09\x00" + data[10:])
+        self.assertRaises(ValueError, paint_calc_file.ProjectFile, self.path)
+        
+        # Records which refer past the end of the obstacles or paints of the file
+        start = paint_calc_file.HEADER.size
+        for offset, value in ((32, struct.pack("<Q", 10 ** 6)), (52, struct.pack("<H", 999))):
+            with open(self.path, "wb") as file:
+                file.write(data[:start + offset] + value + data[start + offset + len(value):])
+            for np in (core.np, None):
+                with mock.patch.object(paint_calc_file, "np", np), paint_calc_file.ProjectFile(self.path) as project_file:
+                    self.assertRaises(ValueError, project_file.aggregate)
+                    self.assertRaises(ValueError, project_file.to_table)
+                    self.assertRaises(ValueError, project_file.to_rooms)
+    
+    def test_out_of_range(self):
+        # Values which do not fit in a record are a ValueError, rather than an error from struct
+        rooms = [core.Room("Hall", [core.Wall(core.Shape.SQUARE, (2,), core.Paint.WHITE, 70000)])]
+        self.assertRaises(ValueError, paint_calc_file.save_project, self.path, rooms)
+        document = os.path.join(os.path.dirname(self.path), "document.json")
+        with open(document, "w") as file:
+            json.dump({"rooms": [{"walls": [{"shape": "square", "dimensions": [2], "coats": 70000}]}]}, file)
+        with mock.patch("sys.stderr", io.StringIO()) as stderr:
+            self.assertEqual(paint_calc_file.main([self.path, "--import", document]), 1)
+        self.assertIn("Coats must be at most 65535", stderr.getvalue())
+    
+    def test_hierarchy(self):
+        # Buildings and floors are saved, and each room is placed back within its floor
+        rooms = benchmarks.generate_document(12)["rooms"]
+        document = {"rooms": rooms[:2], "buildings": [{"name": "Block A", "floors": [{"name": "Ground", "rooms": rooms[2:5]}, {"name": "Empty"}, {"rooms": rooms[5:8]}]},
+                                                      {"name": "Block B", "floors": [{"name": "First", "rooms": rooms[8:]}]}, {"name": "Plot"}]}
+        project = core.Project(core.load_project(document), core.load_buildings(document))
+        paint_calc_file.save_project(self.path, project)
+        with paint_calc_file.ProjectFile(self.path) as project_file:
+            opened = project_file.to_project()
+        self.assertEqual(core.estimate(opened), core.estimate(document))
+        self.assertEqual([room.get_name() for room in opened.get_rooms()], [room.get_name() for room in project.get_rooms()])
+        self.assertEqual(paint_calc_file.aggregate_file(self.path), paint_calc_table.WallTable.from_rooms(project.get_rooms()).aggregate())
+        
+        # A list of rooms has no buildings
+        paint_calc_file.save_project(self.path, project.get_rooms())
+        with paint_calc_file.ProjectFile(self.path) as project_file:
+            self.assertEqual(project_file.to_project().get_buildings(), [])
+
+class TestProjectStore(unittest.TestCase):
+    ############### SQLite store tests ############### 
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "project.db")
+        self.project = core.Project(core.load_project(benchmarks.generate_document(100)))
+        self.store = paint_calc_store.ProjectStore(self.path)
+        self.addCleanup(self.store.close)
+        self.room_ids = self.store.add_rooms(self.project)
+    
+    def test_aggregates(self):
+        room = self.project.get_rooms()[2]
+        self.assertEqual(self.store.room_cost(self.room_ids[2]), room.get_cost())
+        self.assertEqual(self.store.room_paint(self.room_ids[2]), room.get_paint())
+        self.assertEqual(self.store.total_cost(), self.project.get_cost())
+        self.assertEqual(self.store.total_paint(), self.project.get_paint())
+        self.assertEqual(self.store.estimate(), core.estimate(self.project))
+    
+    def test_remove_and_reopen(self):
+        self.store.remove_room(self.room_ids[0])
+        self.store.close()
+        
+        self.store = paint_calc_store.ProjectStore(self.path)
+        rooms = self.project.get_rooms()[1:]
+        self.assertEqual(core.estimate(self.store.load_rooms()), core.estimate(rooms))
+        self.assertEqual(self.store.total_cost(), core.total_cost(rooms))
+        with self.assertRaises(ValueError):
+            self.store.load_rooms([self.room_ids[0]])
+    
+    def test_upgrade(self):
+        # A database from schema 2 is upgraded, and can then hold polygons
+        self.store.close()
+        with sqlite3.connect(self.path) as connection:
+            connection.executescript("ALTER TABLE walls DROP COLUMN vertices; ALTER TABLE obstacles DROP COLUMN vertices; PRAGMA user_version = 2;")
+        connection.close()
+        
+        self.store = paint_calc_store.ProjectStore(self.path)
+        room = core.Room("Loft", [core.Wall(core.Shape.POLYGON, (0, 0, 4, 0, 4, 2.5, 2, 3.5, 0, 2.5), core.Paint.WHITE, 2)])
+        room_id, = self.store.add_rooms([room])
+        self.assertEqual(self.store.load_rooms([room_id])[0].get_walls()[0].get_dimensions(), room.get_walls()[0].get_dimensions())
+        self.assertEqual(core.estimate(self.store.load_rooms()), core.estimate(self.project.get_rooms() + [room]))
+
+class TestTemplates(unittest.TestCase):
+    ############### Wall template tests ############### 
+    def test_interning(self):
+        spec = paint_calc_templates.WallSpec(core.Shape.RECTANGLE, (4, 2.5), core.Paint.WHITE, 2, [(core.Shape.SQUARE, (1,))])
+        self.assertIs(paint_calc_templates.WallSpec(core.Shape.RECTANGLE, [4.0, 2.5], core.Paint.WHITE, 2, [(core.Shape.SQUARE, [1])]), spec)
+        self.assertIsNot(paint_calc_templates.WallSpec(core.Shape.RECTANGLE, (4, 2.5), core.Paint.WHITE, 3), spec)
+        
+        wall = core.Wall(core.Shape.RECTANGLE, (4, 2.5), core.Paint.WHITE, 2, [core.Obstacle(core.Shape.SQUARE, (1,))])
+        self.assertIs(paint_calc_templates.WallSpec.from_wall(wall), spec)
+        self.assertEqual((spec.area(), spec.required_buckets(), spec.get_cost()), (wall.area(), wall.required_buckets(), wall.get_cost()))
+    
+    def test_development(self):
+        flat = benchmarks.generate_document(30, walls_per_room=6)
+        development = paint_calc_templates.load_development({"rooms": [dict(room, count=40) for room in flat["rooms"]]})
+        self.assertEqual(development.num_of_walls(), 1200)
+        self.assertLessEqual(development.num_of_specs(), 30)
+        
+        expected = core.estimate({"rooms": flat["rooms"] * 40})
+        result = development.estimate()
+        self.assertEqual(result["total_cost"], expected["total_cost"])
+        self.assertEqual(result["total_paint"], expected["total_paint"])
+        self.assertEqual(development.get_subtotal("Room 0").get_area(), core.Project(core.load_project({"rooms": [flat["rooms"][0]] * 40})).get_area())
+        
+        estate = paint_calc_templates.Development()
+        estate.add_development(development, 500)
+        self.assertEqual(estate.num_of_walls(), 600000)
+        self.assertEqual(estate.estimate()["total_paint"], {name: buckets * 500 for name, buckets in result["total_paint"].items()})
+    
+    def test_invalid_count(self):
+        for value in (-1, 1.5, "3", None):
+            with self.assertRaises(ValueError):
+                paint_calc_templates.load_development({"rooms": [{"count": value, "walls": [{"shape": "square", "dimensions": [1]}]}]})
+
+class TestHierarchy(unittest.TestCase):
+    ############### Building and floor tests ############### 
+    def make_rooms(self):
+        return [core.Room("Room %d" % index, [core.Wall(core.Shape.RECTANGLE, (3 + index, 2.5), paint, 2)]) 
+                for index, paint in enumerate([core.Paint.WHITE, core.Paint.IVORY, core.Paint.WHITE, core.Paint.PEBBLE])]
+    
+    def check_group(self, group):
+        walls = [wall for room in group.get_rooms() for wall in room.get_walls()]
+        self.assertAlmostEqual(group.get_cost(), sum(wall.get_cost() for wall in walls))
+        self.assertAlmostEqual(group.get_area(), sum(wall.area() for wall in walls))
+    
+    def test_totals(self):
+        rooms = self.make_rooms()
+        ground = core.Floor("Ground", rooms[:2])
+        first = core.Floor("First", rooms[2:3])
+        building = core.Building("Block A", [ground, first])
+        project = core.Project([rooms[3]], [building])
+        self.assertEqual(project.get_rooms(), [rooms[3]] + rooms[:3])
+        self.assertEqual(rooms[0].get_project(), project)
+        for group in (ground, first, building, project):
+            self.check_group(group)
+        
+        # A change to one wall is passed up through its floor and building to the project
+        rooms[0].get_walls()[0].set_area(core.Shape.RECTANGLE, (10, 3))
+        rooms[2].add_wall(core.Wall(core.Shape.SQUARE, (2,), core.Paint.COTTON, 1))
+        for group in (ground, first, building, project):
+            self.check_group(group)
+        self.assertEqual(project.get_paint()[core.Paint.COTTON], first.get_paint()[core.Paint.COTTON])
+        
+        # Moving a room, and removing a floor
+        ground.remove_room(rooms[1])
+        first.add_room(rooms[1])
+        building.remove_floor(ground)
+        for group in (ground, first, building, project):
+            self.check_group(group)
+        self.assertEqual(project.get_rooms(), [rooms[3], rooms[2], rooms[1]])
+        
+        with self.assertRaises(ValueError):
+            project.add_room(rooms[2])
+    
+    def test_rebuild(self):
+        rooms = self.make_rooms()
+        project = core.Project(buildings=[core.Building("Block A", [core.Floor("Ground", rooms)])])
+        with mock.patch.object(core.Paint, "__call__", lambda paint, index: paint.value[index] * 2 if index == 0 else paint.value[index]):
+            core.paints_changed()
+            self.check_group(project)
+            self.check_group(project.get_buildings()[0])
+        core.paints_changed()
+        self.check_group(project)
+    
+    def test_document(self):
+        document = benchmarks.generate_document(18, walls_per_room=3)
+        document["buildings"] = [{"name": "Block A", "floors": [{"name": "Ground", "rooms": document["rooms"][:2]}, {"rooms": document["rooms"][2:4]}]}]
+        result = core.estimate(document)
+        flat = core.estimate({"rooms": document["rooms"] + document["rooms"][:4]})
+        self.assertAlmostEqual(result["total_cost"], flat["total_cost"])
+        self.assertEqual(result["total_paint"], flat["total_paint"])
+        
+        building = result["buildings"][0]
+        self.assertEqual([floor["name"] for floor in building["floors"]], ["Ground", "default floor"])
+        self.assertAlmostEqual(building["cost"], sum(room["cost"] for room in flat["rooms"][6:]))
+        self.assertNotIn("buildings", core.estimate({"rooms": document["rooms"]}))
+    
+    def test_other_paths(self):
+        # The batch quotes of the service and the parallel estimate read buildings in the same way as core.estimate()
+        document = benchmarks.generate_document(18, walls_per_room=3)
+        rooms = document.pop("rooms")
+        for document in ({"buildings": [{"name": "Block A", "floors": [{"name": "Ground", "rooms": rooms[:4]}, {"rooms": rooms[4:6]}]}]},
+                         {"rooms": rooms[:5], "buildings": [{"floors": [{"rooms": rooms[5:9]}]}, {"name": "Block B", "floors": [{"name": "First", "rooms": rooms[9:]}]}]}):
+            expected = core.estimate(document)
+            self.assertGreater(expected["total_cost"], 0)
+            for result in (paint_calc_service.quote_batch([{"rooms": rooms[:1]}, document])[1], paint_calc_parallel.parallel_estimate(document, workers=1, chunk_size=4)):
+                self.assertAlmostEqual(result["total_cost"], expected["total_cost"])
+                self.assertEqual(result["total_paint"], expected["total_paint"])
+                self.assertEqual([room["name"] for room in result["rooms"]], [room["name"] for room in expected["rooms"]])
+                self.assertEqual(len(result["buildings"]), len(expected["buildings"]))
+                for building, expected_building in zip(result["buildings"], expected["buildings"]):
+                    self.assertEqual(building["name"], expected_building["name"])
+                    self.assertAlmostEqual(building["cost"], expected_building["cost"])
+                    self.assertEqual(building["paint"], expected_building["paint"])
+                    for floor, expected_floor in zip(building["floors"], expected_building["floors"], strict=True):
+                        self.assertEqual(floor["name"], expected_floor["name"])
+                        self.assertAlmostEqual(floor["cost"], expected_floor["cost"])
+                        self.assertEqual(floor["paint"], expected_floor["paint"])
+    
+        # A list of documents gives the buildings of each in turn
+        result = paint_calc_parallel.parallel_estimate([document, document], workers=1)
+        self.assertEqual(result["buildings"], paint_calc_parallel.parallel_estimate(document, workers=1)["buildings"] * 2)
+    
+    def test_place_rooms(self):
+        rooms = self.make_rooms()
+        project = core.Project(rooms)
+        paint_calc_gui.place_rooms(project, rooms, [("Block A", "Ground"), ("", ""), ("Block A", "First"), ("Block A", "Ground")])
+        building, = project.get_buildings()
+        self.assertEqual([floor.get_name() for floor in building.get_floors()], ["Ground", "First"])
+        self.assertEqual(building.get_floors()[0].get_rooms(), [rooms[0], rooms[3]])
+        self.assertEqual(rooms[1].get_parent(), project)
+        self.check_group(project)
+
+class TestScenarios(unittest.TestCase):
+    ############### Paint swap tests ############### 
+    def test_rank(self):
+        document = benchmarks.generate_document(300, walls_per_room=12)
+        matrix = paint_calc_scenarios.ScenarioMatrix.from_rooms(core.load_project(document))
+        results = matrix.rank()
+        self.assertEqual(len(results), len(list(core.Paint)))
+        self.assertEqual(results, sorted(results, key=lambda result: result["total_cost"]))
+        
+        # Each result must match painting every wall with that paint
+        for result in results:
+            expected = core.estimate({"rooms": [dict(room, walls=[dict(wall, paint=result["paint"]) for wall in room["walls"]]) for room in document["rooms"]]})
+            self.assertAlmostEqual(result["total_cost"], expected["total_cost"])
+            self.assertEqual(result["total_buckets"], expected["total_paint"][result["paint"]])
+            self.assertEqual([room["buckets"] for room in result["rooms"]], [room["paint"][result["paint"]] for room in expected["rooms"]])
+        
+        table = paint_calc_table.WallTable.from_rooms(core.load_project(document))
+        self.assertEqual(paint_calc_scenarios.ScenarioMatrix.from_table(table).rank(), results)
+    
+    def test_replace(self):
+        rooms = core.load_project(benchmarks.generate_document(200, walls_per_room=10))
+        matrix = paint_calc_scenarios.ScenarioMatrix.from_rooms(rooms)
+        results = matrix.rank([core.Paint.IVORY, core.Paint.PEBBLE], replace=core.Paint.WHITE)
+        
+        # Only the white walls are switched
+        for wall in [wall for room in rooms for wall in room.get_walls() if wall.get_paint() is core.Paint.WHITE]:
+            wall.set_paint(core.Paint.PEBBLE, wall.get_coats())
+        project = core.Project(rooms)
+        pebble, = [result for result in results if result["paint"] == "pebble"]
+        self.assertAlmostEqual(pebble["total_cost"], project.get_cost())
+        for result, room in zip(pebble["rooms"], rooms):
+            self.assertAlmostEqual(result["cost"], room.get_cost())
+        
+        # Costs are summed exactly, so the results do not depend on whether NumPy is installed
+        rooms = core.load_project(benchmarks.generate_document(200, walls_per_room=10))
+        with mock.patch.object(paint_calc_scenarios, "np", None):
+            expected = paint_calc_scenarios.ScenarioMatrix.from_rooms(rooms).rank(replace=core.Paint.WHITE)
+        self.assertEqual(paint_calc_scenarios.ScenarioMatrix.from_rooms(rooms).rank(replace=core.Paint.WHITE), expected)
+
+class TestObstacleGeometry(unittest.TestCase):
+    ############### Positioned obstacle tests ############### 
+    def test_overlaps(self):
+        door = core.Obstacle(core.Shape.RECTANGLE, (1, 2), (1, 0))
+        wall = core.Wall(core.Shape.RECTANGLE, (10, 3), core.Paint.WHITE, 1, [door])
+        self.assertEqual(wall.area(), 28)
+        
+        # Two windows which overlap by 0.5m x 1m, and one hanging 0.5m off the right hand side of the wall
+        wall.add_obstacle(core.Obstacle(core.Shape.RECTANGLE, (1, 1), (3, 1)))
+        wall.add_obstacle(core.Obstacle(core.Shape.RECTANGLE, (1, 1), (3.5, 1)))
+        wall.add_obstacle(core.Obstacle(core.Shape.SQUARE, (1,), (9.5, 1)))
+        self.assertAlmostEqual(wall.area(), 30 - 2 - 1.5 - 0.5)
+        
+        # Unpositioned obstacles are still subtracted in full
+        wall.add_obstacle(core.Obstacle(core.Shape.SQUARE, (1,)))
+        self.assertAlmostEqual(wall.area(), 30 - 2 - 1.5 - 0.5 - 1)
+        
+        # Obstacles wholly within the wall remove exactly their own area, whatever their shape
+        window = core.Obstacle(core.Shape.CIRCLE, (0.5,), (6, 1))
+        round_wall = core.Wall(core.Shape.RECTANGLE, (10, 3), core.Paint.WHITE, 1, [window])
+        self.assertEqual(round_wall.area(), 30 - core.Shape.CIRCLE(0.5))
+        window.set_position((9.5, 1))
+        self.assertAlmostEqual(round_wall.area(), 30 - core.Shape.CIRCLE(0.5) / 2, places=2)
+    
+    def test_shaped_walls(self):
+        # A window in the peak of a gable end is cut off by the slope of the roof
+        gable = core.Wall(core.Shape.TRIANGLE, (4, 2), core.Paint.WHITE, 1, [core.Obstacle(core.Shape.RECTANGLE, (2, 2), (1, 0))])
+        self.assertAlmostEqual(gable.area(), 4 - 3)
+        polygon = core.Wall(core.Shape.POLYGON, (0, 0, 4, 0, 4, 1, 1, 1, 1, 3, 0, 3), core.Paint.WHITE, 1, [core.Obstacle(core.Shape.SQUARE, (2,), (0, 0.5))])
+        self.assertAlmostEqual(polygon.area(), 6 - 2.5)
+    
+    def test_running_totals(self):
+        window = core.Obstacle(core.Shape.RECTANGLE, (1, 1), (1, 1))
+        room = core.Room("Hall", [core.Wall(core.Shape.RECTANGLE, (4, 2.5), core.Paint.WHITE, 1, [window, core.Obstacle(core.Shape.RECTANGLE, (1, 1), (1.5, 1))])])
+        self.assertAlmostEqual(room.get_area(), 10 - 1.5)
+        window.set_position((3.5, 1))
+        self.assertAlmostEqual(room.get_area(), 10 - 1.5)
+        window.set_position(None)
+        self.assertAlmostEqual(room.get_area(), 10 - 2)
+        window.set_position((0, 0))
+        self.assertAlmostEqual(room.get_area(), room.get_walls()[0].area())
+    
+    def test_documents(self):
+        document = {"rooms": [{"name": "Facade", "walls": [{"shape": "rectangle", "dimensions": [20, 6], "obstacles": 
+                        [{"shape": "rectangle", "dimensions": [1.5, 2], "position": [x, 1]} for x in range(0, 20, 1)]}]}]}
+        walls = core.load_project(document)[0].get_walls()
+        # The windows overlap, and the last hangs off the end of the wall
+        self.assertAlmostEqual(walls[0].area(), 120 - 20 * 2)
+        self.assertEqual(paint_calc_service.quote_batch([document])[0], core.estimate(document))
+        self.assertEqual(paint_calc_table.WallTable.from_rooms(core.load_project(document)).aggregate()["total_cost"], core.estimate(document)["total_cost"])
+        
+        spec = paint_calc_templates.WallSpec.from_wall(walls[0])
+        self.assertEqual(spec.area(), walls[0].area())
+        
+        with paint_calc_store.ProjectStore() as store:
+            store.add_document(document)
+            self.assertEqual(store.load_rooms()[0].get_walls()[0].area(), walls[0].area())
+        
+        # Project files keep the position of each obstacle, and total the wall from its net area
+        rooms = core.load_project(document)
+        rooms[0].add_wall(core.Wall(core.Shape.SQUARE, (3,), core.Paint.WHITE, 2, [core.Obstacle(core.Shape.SQUARE, (1,)), core.Obstacle(core.Shape.SQUARE, (1,), (0.5, 0.5))]))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "facade.pcalc")
+            paint_calc_file.save_project(path, rooms)
+            saved = paint_calc_file.load_project(path)
+            self.assertEqual(paint_calc_file.aggregate_file(path), paint_calc_table.WallTable.from_rooms(rooms).aggregate())
+            with paint_calc_file.ProjectFile(path) as project_file:
+                self.assertEqual(project_file.to_table().aggregate(), paint_calc_table.WallTable.from_rooms(rooms).aggregate())
+        self.assertEqual([[obstacle.get_position() for obstacle in wall.get_obstacles()] for wall in saved[0].get_walls()],
+                         [[obstacle.get_position() for obstacle in wall.get_obstacles()] for wall in rooms[0].get_walls()])
+        self.assertEqual(core.estimate(saved), core.estimate(rooms))
+        with self.assertRaises(ValueError):
+            core.load_project({"rooms": [{"walls": [{"shape": "square", "dimensions": [1], "obstacles": [{"shape": "square", "dimensions": [1], "position": [1]}]}]}]})
+    
+    def test_sweep_line(self):
+        boxes = [(0, 0, 1, 1), (0.5, 0.5, 2, 2), (1, 0, 2, 0.75), (5, 5, 6, 6)]
+        self.assertEqual(paint_calc_geometry.overlapping_pairs(boxes), [(0, 1), (1, 2)])
+        self.assertEqual(sorted(map(sorted, paint_calc_geometry.clusters(len(boxes), [(0, 1), (1, 2)]))), [[0, 1, 2], [3]])
+
+class TestUncertainty(unittest.TestCase):
+    ############### Monte Carlo tests ############### 
+    def setUp(self):
+        self.document = benchmarks.generate_document(60, walls_per_room=6)
+        self.document["rooms"][0]["walls"].append({"shape": "polygon", "vertices": [[0, 0], [4, 0], [4, 2.5], [2, 3.5], [0, 2.5]], 
+                                                   "obstacles": [{"shape": "rectangle", "dimensions": [1, 1], "position": [1.5, 2]}]})
+    
+    def check_exact(self, result, trials):
+        # Without any errors, every trial must match the estimate
+        expected = core.estimate(self.document)
+        self.assertEqual(result["trials"], trials)
+        self.assertEqual(result["total_cost"], [expected["total_cost"]] * 3)
+        self.assertEqual({name: totals["buckets"] for name, totals in result["paint"].items()}, 
+                         {name: [buckets] * 3 for name, buckets in expected["total_paint"].items()})
+    
+    def test_no_errors(self):
+        self.check_exact(paint_calc_uncertainty.simulate(self.document, 200, 0, 0), 200)
+        with mock.patch.object(paint_calc_uncertainty, "np", None):
+            self.check_exact(paint_calc_uncertainty.simulate(self.document, 20, 0, 0), 20)
+    
+    def test_ranges(self):
+        result = paint_calc_uncertainty.simulate(self.document, 2000, percentiles=(5, 50, 95))
+        self.assertEqual(result["percentiles"], [5, 50, 95])
+        low, middle, high = result["total_cost"]
+        self.assertLess(low, middle)
+        self.assertLess(middle, high)
+        self.assertAlmostEqual(middle, core.estimate(self.document)["total_cost"], delta=middle * 0.05)
+        for totals in result["paint"].values():
+            self.assertEqual(totals["buckets"], sorted(totals["buckets"]))
+    
+    def test_seeds(self):
+        # Results depend only on the seed, not on how many processes the blocks are run in
+        with mock.patch.object(paint_calc_uncertainty, "BLOCK_SIZE", 4096):
+            result = paint_calc_uncertainty.simulate(self.document, 500, seed=3)
+            self.assertEqual(paint_calc_uncertainty.simulate(self.document, 500, seed=3, workers=2), result)
+        self.assertNotEqual(paint_calc_uncertainty.simulate(self.document, 500, seed=4), result)
+
+class TestBackgroundTasks(unittest.TestCase):
+    ############### GUI worker tests ############### 
+    class Window():
+        # Stands in for a window, recording the events sent to it
+        def __init__(self):
+            self.events = []
+        
+        def write_event_value(self, key, value):
+            self.events.append((key, value))
+    
+    def run_task(self, function, *args):
+        window = self.Window()
+        task = paint_calc_gui.BackgroundTask(window, function, *args).start()
+        task.join(10)
+        return window.events
+    
+    def test_progress(self):
+        def work(steps, progress):
+            for step in range(steps):
+                progress(step / steps)
+            return steps
+        
+        events = self.run_task(work, 1000)
+        self.assertEqual(events[-1], ("done", 1000))
+        # Progress is only sent when it moves on by a whole step
+        self.assertEqual([value for key, value in events[:-1]], list(range(paint_calc_gui.PROGRESS_STEPS)))
+        
+        error = ValueError("bad")
+        def fail(progress):
+            raise error
+        self.assertEqual(self.run_task(fail), [("done", error)])
+    
+    def test_cancel(self):
+        started = threading.Event()
+        def work(progress):
+            started.set()
+            while True:
+                progress(0.5)
+                time.sleep(0.001)
+        
+        window = self.Window()
+        task = paint_calc_gui.BackgroundTask(window, work).start()
+        started.wait(10)
+        task.cancel()
+        task.join(10)
+        self.assertTrue(task.is_cancelled())
+        key, value = window.events[-1]
+        self.assertEqual(key, "done")
+        self.assertIsInstance(value, paint_calc_gui.Cancelled)
+    
+    def test_tasks(self):
+        document = benchmarks.generate_document(300, walls_per_room=10)
+        project = core.Project(core.load_project(document))
+        cache = paint_calc_cache.RoomCache()
+        events = self.run_task(paint_calc_gui.quote_group, project, cache)
+        key, quote = events[-1]
+        self.assertEqual(quote["cost"], project.get_cost())
+        self.assertEqual(quote["paint"], project.get_paint())
+        self.assertLessEqual(quote["ranges"]["total_cost"][0], quote["ranges"]["total_cost"][2])
+        # Quoting the same rooms again only reads them from the cache
+        self.assertEqual(self.run_task(paint_calc_gui.quote_group, project, cache)[-1], ("done", quote))
+        self.assertEqual(cache.get_stats()["misses"], len(project.get_rooms()))
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "project.pcalc")
+            self.assertEqual(self.run_task(paint_calc_gui.save_project, path, project), [("done", None)])
+            events = self.run_task(paint_calc_gui.open_project, path)
+        key, opened = events[-1]
+        self.assertEqual(key, "done")
+        self.assertEqual(opened.get_cost(), project.get_cost())
+        self.assertEqual(opened.get_paint(), project.get_paint())
+        self.assertEqual(events[0], ("progress", 0))
+
+class TestRoomCache(unittest.TestCase):
+    ############### Result cache tests ############### 
+    def setUp(self):
+        self.rooms = core.load_project(benchmarks.generate_document(60, walls_per_room=6))
+    
+    def test_keys(self):
+        first, second = core.load_project(benchmarks.generate_document(6, walls_per_room=6)) + core.load_project(benchmarks.generate_document(6, walls_per_room=6))
+        second.set_name("Renamed")
+        self.assertEqual(paint_calc_cache.room_key(first), paint_calc_cache.room_key(second))
+        
+        wall = second.get_walls()[0]
+        wall.set_paint(wall.get_paint(), wall.get_coats() + 1)
+        self.assertNotEqual(paint_calc_cache.room_key(first), paint_calc_cache.room_key(second))
+        wall.set_paint(wall.get_paint(), wall.get_coats() - 1)
+        wall.add_obstacle(core.Obstacle(Shape.SQUARE, (0.1,), (0.5, 0.5)))
+        self.assertNotEqual(paint_calc_cache.room_key(first), paint_calc_cache.room_key(second))
+    
+    def test_lru(self):
+        cache = paint_calc_cache.RoomCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        # b was used least recently
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c"), len(cache)), (1, 3, 2))
+        self.assertEqual(cache.lookup("b", lambda: 4), 4)
+        self.assertEqual(cache.get_stats(), {"hits": 3, "misses": 2})
+    
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            with paint_calc_cache.RoomCache(max_size=2, path=path) as cache:
+                for key in ("a", "b", "c"):
+                    cache.put(key, {"value": key})
+                cache.get("b")
+            with paint_calc_cache.RoomCache(max_size=1, path=path) as cache:
+                self.assertEqual(len(cache), 0)
+                self.assertEqual(cache.get("b"), {"value": "b"})
+                self.assertEqual(cache.get("c"), {"value": "c"})
+                self.assertIsNone(cache.get("a"))
+    
+    def test_simulate(self):
+        cache = paint_calc_cache.RoomCache()
+        project = core.Project(self.rooms)
+        result = paint_calc_uncertainty.simulate(project, 500, cache=cache)
+        self.assertEqual(cache.get_stats(), {"hits": 0, "misses": len(self.rooms)})
+        self.assertEqual(paint_calc_uncertainty.simulate(project, 500, cache=cache), result)
+        
+        # Only the room which has changed is run again
+        wall = self.rooms[3].get_walls()[0]
+        wall.set_paint(wall.get_paint(), wall.get_coats() + 1)
+        changed = paint_calc_uncertainty.simulate(project, 500, cache=cache)
+        self.assertEqual(cache.get_stats(), {"hits": 2 * len(self.rooms) - 1, "misses": len(self.rooms) + 1})
+        self.assertGreater(changed["total_cost"][1], result["total_cost"][1])
+        
+        # Without errors, the cached trials still match the estimate
+        exact = paint_calc_uncertainty.simulate(project, 50, 0, 0, cache=cache)
+        self.assertEqual(exact["total_cost"], [project.get_cost()] * 3)
+        with mock.patch.object(paint_calc_uncertainty, "np", None):
+            self.assertEqual(paint_calc_uncertainty.simulate(project, 50, 0, 0, cache=paint_calc_cache.RoomCache()), exact)
+
+class TestRoomPlans(unittest.TestCase):
+    ############### Room generation tests ############### 
+    def test_walls(self):
+        plan = paint_calc_rooms.RoomPlan.rectangle("Lounge", 5, 4, height=2.5, coats=2, ceiling=core.Paint.WHITE, doors=1, windows=2)
+        walls = plan.walls()
+        self.assertEqual([wall.get_dimensions() for wall in walls], [(5.0, 2.5), (4.0, 2.5), (5.0, 2.5), (4.0, 2.5), (5.0, 4.0)])
+        door, window = (core.Obstacle(*obstacle)._area() for obstacle in (paint_calc_rooms.DOOR, paint_calc_rooms.WINDOW))
+        # The door and windows go on the longest walls first
+        self.assertEqual([wall.area() for wall in walls], [12.5 - door, 10 - window, 12.5 - window, 10, 20])
+        
+        room = paint_calc_rooms.RoomPlan("Gable", [(0, 0), (6, 0), (6, 3), (3, 5), (0, 3)], ceiling=core.Paint.IVORY).to_room()
+        self.assertEqual(len(room.get_walls()), 6)
+        self.assertEqual(room.get_walls()[-1].area(), 24)
+        self.assertEqual(room.get_walls()[-1].get_paint(), core.Paint.IVORY)
+        
+        for outline in ([(0, 0), (1, 0)], [(0, 0), (1, 0), (1, 0), (0, 1)], [(0, 0), (1, math.nan), (0, 1)]):
+            self.assertRaises(ValueError, paint_calc_rooms.RoomPlan, "Bad", outline)
+        self.assertRaises(ValueError, paint_calc_rooms.RoomPlan.rectangle, "Bad", 2, 2, height=0)
+    
+    def test_table(self):
+        # The table is generated without Wall() objects, but must total exactly the same as the rooms
+        plans = benchmarks.generate_plans(600)
+        rooms = paint_calc_rooms.generate_rooms(plans)
+        paint = {paint.name.lower(): buckets for paint, buckets in core.Project(rooms).get_paint().items()}
+        for np in (core.np, None):
+            with mock.patch.object(paint_calc_rooms, "np", np), mock.patch.object(paint_calc_table, "np", np):
+                table = paint_calc_rooms.generate_table(plans)
+                totals = table.aggregate()
+            self.assertEqual([room["cost"] for room in totals["rooms"]], [room.get_cost() for room in rooms])
+            self.assertEqual(totals["total_paint"], paint)
+        self.assertEqual(len(table), sum(len(room.get_walls()) for room in rooms))
+    
+    def test_documents(self):
+        document = {"rooms": [
+            {"name": "Lounge", "floor": [5, 4], "height": 2.5, "coats": 2, "ceiling": "ivory", "doors": 1, "windows": 2},
+            {"name": "Gable", "outline": [[0, 0], [6, 0], [6, 3], [3, 5], [0, 3]], "walls": [{"shape": "square", "dimensions": [1]}]}
+        ]}
+        lounge, gable = core.load_project(document)
+        self.assertEqual([wall.area() for wall in lounge.get_walls()], [wall.area() for wall in paint_calc_rooms.RoomPlan.rectangle(
+            "Lounge", 5, 4, height=2.5, coats=2, ceiling=core.Paint.IVORY, doors=1, windows=2).walls()])
+        self.assertEqual(len(gable.get_walls()), 6)
+        self.assertEqual(paint_calc_service.quote_batch([document])[0], core.estimate(document))
+        
+        for room in ({"name": "Bad"}, {"floor": [5]}, {"floor": [5, 4], "doors": -1}, {"outline": [[0, 0], [1, 1]]}, {"floor": [5, 4], "ceiling": "gold"}):
+            self.assertRaises(ValueError, paint_calc_rooms.plan_from_dict, room)
+
+class TestPaintIndex(unittest.TestCase):
+    ############### Paint index tests ############### 
+    def make_project(self):
+        rooms = [core.Room("Room %d" % index, [core.Wall(core.Shape.RECTANGLE, (3 + index, 2.5), paint, 2), 
+                                               core.Wall(core.Shape.SQUARE, (2 + index,), core.Paint.WHITE, 1)])
+                 for index, paint in enumerate([core.Paint.WHITE, core.Paint.IVORY, core.Paint.PEBBLE, core.Paint.IVORY])]
+        ground = core.Floor("Ground", rooms[:2])
+        return core.Project(rooms[2:3], [core.Building("Block A", [ground])]), rooms
+    
+    def check_index(self, group):
+        # The index must match a scan of every wall, though walls which changed paint come last
+        walls = [wall for room in group.get_rooms() for wall in room.get_walls()] if isinstance(group, core.Group) else group.get_walls()
+        paints = {}
+        for wall in walls:
+            paints.setdefault(wall.get_paint(), []).append(wall)
+        self.assertEqual({paint: set(group.get_walls_by_paint(paint)) for paint in paints}, {paint: set(walls) for paint, walls in paints.items()})
+        self.assertEqual(group.get_paint_costs().keys(), paints.keys())
+        for paint, paint_walls in paints.items():
+            self.assertAlmostEqual(group.get_paint_costs()[paint], sum(wall.get_cost() for wall in paint_walls))
+            self.assertAlmostEqual(group.get_litres()[paint], sum(wall.area() * wall.get_coats() / paint(2) for wall in paint_walls))
+    
+    def test_index(self):
+        project, rooms = self.make_project()
+        for group in [project, project.get_buildings()[0]] + rooms:
+            self.check_index(group)
+        self.assertEqual(project.get_walls_by_paint(core.Paint.IVORY), [rooms[1].get_walls()[0]])
+        self.assertEqual(project.get_walls_by_paint(core.Paint.EMERALD), [])
+        
+        # Moving a wall to another paint moves it within the index of its room and every group above
+        wall = rooms[0].get_walls()[0]
+        wall.set_paint(core.Paint.IVORY, 3)
+        self.assertNotIn(wall, project.get_walls_by_paint(core.Paint.WHITE))
+        self.assertIn(wall, project.get_walls_by_paint(core.Paint.IVORY))
+        rooms[2].replace_paint(core.Paint.PEBBLE, core.Paint.EMERALD)
+        self.assertNotIn(core.Paint.PEBBLE, project.get_paint_costs())
+        for group in [project, project.get_buildings()[0]] + rooms:
+            self.check_index(group)
+        
+        # Moving, adding and removing rooms
+        project.get_buildings()[0].get_floors()[0].remove_room(rooms[1])
+        project.add_room(rooms[1])
+        project.add_room(rooms[3])
+        rooms[3].remove_wall(rooms[3].get_walls()[0])
+        project.replace_paint(core.Paint.WHITE, core.Paint.PEBBLE)
+        self.assertEqual(project.get_walls_by_paint(core.Paint.WHITE), [])
+        for group in [project, project.get_buildings()[0]] + rooms:
+            self.check_index(group)
+    
+    def test_rebuild(self):
+        project, rooms = self.make_project()
+        with mock.patch.object(core.Paint, "__call__", lambda paint, index: paint.value[index] * 2 if index == 0 else paint.value[index]):
+            core.paints_changed()
+            self.check_index(project)
+            self.check_index(rooms[0])
+        core.paints_changed()
+        self.check_index(project)
+
+class TestReports(unittest.TestCase):
+    ############### Report export tests ############### 
+    def make_project(self):
+        document = benchmarks.generate_document(30, walls_per_room=3)
+        document["rooms"][0]["name"] = "Lounge & <Hall>"
+        return core.Project(core.load_project(document))
+    
+    def write(self, writer, source, chunk_size=7):
+        stream = io.StringIO()
+        progress = []
+        writer(stream, source, chunk_size=chunk_size, progress=progress.append)
+        if progress:
+            self.assertEqual(progress[-1], 1)
+        return stream.getvalue()
+    
+    def test_formats(self):
+        project = self.make_project()
+        walls = [wall for room in project.get_rooms() for wall in room.get_walls()]
+        report = json.loads(self.write(paint_calc_report.write_json, project))
+        self.assertEqual(report["total"], {"area": project.get_area(), "cost": project.get_cost()})
+        self.assertEqual({row["paint"]: row["buckets"] for row in report["paints"]}, core.estimate(project)["total_paint"])
+        self.assertAlmostEqual(sum(row["cost"] for row in report["rooms"]), project.get_cost())
+        self.assertEqual([row["cost"] for row in report["walls"]], [wall.get_cost() for wall in walls])
+        self.assertEqual([row["wall"] for row in report["walls"][:3]], [1, 2, 3])
+        
+        rows = list(csv.DictReader(io.StringIO(self.write(paint_calc_report.write_csv, project))))
+        self.assertEqual([row["level"] for row in rows], ["total"] + ["paint"] * len(report["paints"]) + ["room"] * len(report["rooms"]) + ["wall"] * len(walls))
+        self.assertEqual([float(row["area"]) for row in rows if row["level"] == "wall"], [wall.area() for wall in walls])
+        
+        page = self.write(paint_calc_report.write_html, project)
+        self.assertEqual(page.count("<tr>"), len(rows) + 4)
+        self.assertIn("<td>Lounge &amp; &lt;Hall&gt;</td>", page)
+        
+        # Every level is still written for an empty project
+        self.assertEqual(json.loads(self.write(paint_calc_report.write_json, core.Project())), {"total": {"area": 0, "cost": 0}, "paints": [], "rooms": [], "walls": []})
+    
+    def test_table(self):
+        # A table is reported on without Wall() objects, but must give the same rows as the rooms, apart from the shape of each wall
+        project = self.make_project()
+        expected = json.loads(self.write(paint_calc_report.write_json, project))
+        for np in (core.np, None):
+            with mock.patch.object(paint_calc_report, "np", np), mock.patch.object(paint_calc_table, "np", np):
+                report = json.loads(self.write(paint_calc_report.write_json, paint_calc_table.WallTable.from_rooms(project.get_rooms())))
+            self.assertEqual([dict(row, shape="") for row in expected["walls"]], report["walls"])
+            for level in ("paints", "rooms"):
+                key = lambda row: (row.get("room", ""), row["paint"])
+                self.assertEqual(sorted(map(key, expected[level])), sorted(map(key, report[level])))
+                for row, other in zip(sorted(expected[level], key=key), sorted(report[level], key=key)):
+                    self.assertEqual(row, other)
+            self.assertEqual(report["total"], expected["total"])
+    
+    def test_export(self):
+        project = self.make_project()
+        with tempfile.TemporaryDirectory() as directory:
+            for file_format in paint_calc_report.FORMATS:
+                path = os.path.join(directory, "report." + file_format)
+                paint_calc_report.export(path, project)
+                with open(path, encoding="utf-8") as file:
+                    self.assertEqual(file.read(), self.write(paint_calc_report.WRITERS[file_format], project, paint_calc_report.CHUNK_SIZE).replace("\r\n", "\n"))
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
\ No newline at end of file